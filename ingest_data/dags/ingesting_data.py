@@ -18,6 +18,7 @@ from plugins.jobs.download import DATASETS, get_dataset_names
 from plugins.jobs.utils import check_src_data
 from plugins.jobs.load_and_chunk import LoadAndChunk
 from plugins.jobs.embed_and_store import DocumentEmbedder
+from plugins.jobs.collection_version import bump_collection_version
 from airflow.operators.empty import EmptyOperator
 
 
@@ -116,10 +117,19 @@ def embed_and_store_data():
     embedder = DocumentEmbedder()
     buffer = embedder.minio_loader.download_object_as_stream(MINIO_PATH)
     splits = pickle.load(buffer)
-    vectordb = embedder.document_embedding_vectorstore(
+    collection = embedder.document_embedding_vectorstore(
         splits, collection_name, directory_chromadb
     )  # Dynamic collection name
-    return {"status": "completed"}
+    return {"status": "completed", "count": collection.count()}
+
+
+@task()
+def bump_collection_version_task(result):
+    """Đổi build ID của collection để API bỏ các entry cache của bản cũ."""
+    build_id = bump_collection_version(
+        directory_chromadb, collection_name, count=result.get("count")
+    )
+    return {"status": "completed", "build_id": build_id}
 
 
 # Create DAG
@@ -137,10 +147,11 @@ with DAG(
     exists = class_already_exists()
     load_chunk = load_and_chunk_data()
     embed_store = embed_and_store_data()
+    bump_version = bump_collection_version_task(embed_store)
     end_task = EmptyOperator(task_id="end_task")
     # Task flow
     start >> branch
     branch >> [create, exists]  # Branching
     create >> load_chunk >> embed_store  # Process path
     exists >> embed_store  # Skip path
-    embed_store >> end_task
+    bump_version >> end_task
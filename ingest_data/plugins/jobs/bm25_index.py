@@ -0,0 +1,87 @@
+import json
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from plugins.jobs.utils import logger
+
+# Giữ nguyên các mã như "460/TB-BTNMT", "2022-21s19", "Điều 5.2" thành một token
+TOKEN_PATTERN = r"\w+(?:[./\-]\w+)*"
+SPLIT_PATTERN = r"[./\-]"
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+
+def tokenize(text: str, pattern: str = TOKEN_PATTERN) -> list[str]:
+    """Lowercase tokens; compound codes are kept whole and also split into parts."""
+    # NFC giống normalize_text phía API để query và index ra cùng token
+    text = unicodedata.normalize("NFC", text).lower()
+    tokens = []
+    for token in re.findall(pattern, text):
+        tokens.append(token)
+        parts = re.split(SPLIT_PATTERN, token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+def bm25_index_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, "bm25", f"{collection_name}.json")
+
+
+def build_bm25_index(ids: list[str], texts: list[str]) -> dict:
+    """
+    Build a sparse BM25 inverted index.
+
+    Postings map each term to ``[[doc_index, term_frequency], ...]``; the
+    tokenizer pattern is stored with the index so the API tokenizes queries
+    exactly the same way.
+    """
+    postings: dict[str, list[list[int]]] = defaultdict(list)
+    doc_lens = []
+    for doc_index, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lens.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            postings[term].append([doc_index, tf])
+
+    return {
+        "version": 1,
+        "token_pattern": TOKEN_PATTERN,
+        "split_pattern": SPLIT_PATTERN,
+        "k1": BM25_K1,
+        "b": BM25_B,
+        "doc_ids": ids,
+        "doc_lens": doc_lens,
+        "avgdl": sum(doc_lens) / max(len(doc_lens), 1),
+        "postings": postings,
+    }
+
+
+def build_and_save_from_collection(
+    collection, persist_directory: str, collection_name: str, page_size: int = 1000
+) -> str:
+    """Build the index over every chunk in the collection and persist it atomically."""
+    ids, texts = [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        texts.extend(doc or "" for doc in page["documents"])
+        offset += len(page["ids"])
+
+    index = build_bm25_index(ids, texts)
+    path = bm25_index_path(persist_directory, collection_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    logger.info(
+        f"BM25 index: {len(ids)} chunks, {len(index['postings'])} terms -> {path}"
+    )
+    return path
@@ -0,0 +1,36 @@
+import json
+import os
+import time
+import uuid
+
+from plugins.jobs.utils import logger
+
+
+def build_stamp_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, "versions", f"{collection_name}.json")
+
+
+def bump_collection_version(
+    persist_directory: str, collection_name: str, count: int | None = None
+) -> str:
+    """
+    Ghi build ID mới cho collection sau mỗi lần ingest. API đọc file này để
+    version hoá key cache: build ID đổi -> toàn bộ entry cũ không còn được match.
+    """
+    build_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    path = build_stamp_path(persist_directory, collection_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "collection": collection_name,
+                "build_id": build_id,
+                "count": count,
+                "built_at": time.time(),
+            },
+            f,
+        )
+    os.replace(tmp_path, path)
+    logger.info(f"Collection {collection_name} bumped to build {build_id} -> {path}")
+    return build_id
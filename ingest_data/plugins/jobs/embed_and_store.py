@@ -1,8 +1,10 @@
 import os
+import time
+import chromadb
 from langchain.schema import Document
-from langchain_chroma import Chroma
 from uuid import uuid4
-from plugins.jobs.utils import MinioLoader, get_embeddings
+from plugins.jobs.utils import MinioLoader, get_embeddings, get_tokenizer
+from plugins.jobs.bm25_index import build_and_save_from_collection
 from plugins.config.minio_config import (
     MINIO_ENDPOINT,
     MINIO_ACCESS_KEY,
@@ -10,38 +12,107 @@ from plugins.config.minio_config import (
 )
 from langchain_community.vectorstores.utils import filter_complex_metadata
 
+# Số chunk mỗi lần encode và mỗi lần ghi vào Chroma (có thể set qua env)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+CHROMA_WRITE_BATCH_SIZE = int(os.getenv("CHROMA_WRITE_BATCH_SIZE", "512"))
+
+# Tham số HNSW của collection, chọn theo report của plugins/jobs/hnsw_benchmark.py.
+# Để trống = mặc định của Chroma. Chỉ có hiệu lực khi collection được tạo mới.
+HNSW_ENV_PARAMS = {
+    "hnsw:space": ("HNSW_SPACE", str),
+    "hnsw:M": ("HNSW_M", int),
+    "hnsw:construction_ef": ("HNSW_CONSTRUCTION_EF", int),
+    "hnsw:search_ef": ("HNSW_SEARCH_EF", int),
+}
+
+
+def hnsw_collection_metadata() -> dict | None:
+    metadata = {
+        key: cast(os.environ[env])
+        for key, (env, cast) in HNSW_ENV_PARAMS.items()
+        if os.getenv(env)
+    }
+    return metadata or None
+
 
 class DocumentEmbedder:
-    def __init__(self):
+    def __init__(
+        self,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+        write_batch_size: int = CHROMA_WRITE_BATCH_SIZE,
+    ):
         print(
             "-> Đang khởi tạo embeddings cho model: sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
         )
         self.embeddings = get_embeddings()
+        self.tokenizer = get_tokenizer()
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = write_batch_size
         self.minio_loader = MinioLoader(
             MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY
         )
 
+    def _length_sorted_batches(self, texts: list[str]) -> list[list[int]]:
+        """
+        Sort chunk indices by token length and cut them into batches, so each
+        encode call pads to similar lengths instead of the longest chunk overall.
+        """
+        lengths = [
+            len(ids)
+            for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        ]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        return [
+            order[i : i + self.embed_batch_size]
+            for i in range(0, len(order), self.embed_batch_size)
+        ]
+
+    @staticmethod
+    def _write_batch(
+        collection: chromadb.Collection, ids, embeddings, documents, metadatas
+    ):
+        """Write pre-computed embeddings; Chroma rejects empty metadata dicts."""
+        with_meta = [i for i, m in enumerate(metadatas) if m]
+        without_meta = [i for i, m in enumerate(metadatas) if not m]
+        for group, has_meta in ((with_meta, True), (without_meta, False)):
+            if not group:
+                continue
+            collection.upsert(
+                ids=[ids[i] for i in group],
+                embeddings=[embeddings[i] for i in group],
+                documents=[documents[i] for i in group],
+                metadatas=[metadatas[i] for i in group] if has_meta else None,
+            )
+
     def document_embedding_vectorstore(
         self, splits: list[Document], collection_name: str, persist_directory: str
     ):
         """
         Generate embeddings for document splits and store them in a Chroma vector store.
 
+        Chunks are embedded in length-sorted batches of ``embed_batch_size`` and
+        written to Chroma in batches of ``write_batch_size`` so memory stays bounded.
+
         Args:
             splits (list[Document]): List of Document objects with page_content.
             collection_name (str): Name of the Chroma collection.
             persist_directory (str): Local directory to persist the vector store.
 
         Returns:
-            vectordb: The Chroma vector store instance.
+            collection: The Chroma collection the chunks were written to.
         """
         print("========= Initializing Chroma Vector Store =============")
 
         # 1. Create or load the Chroma collection
-        vectordb = Chroma(
-            collection_name=collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=persist_directory,
+        hnsw_metadata = hnsw_collection_metadata()
+        if hnsw_metadata:
+            print(f"HNSW parameters for new collection: {hnsw_metadata}")
+        # Embedding tự tính theo batch ở dưới nên collection không cần embedding_function
+        client = chromadb.PersistentClient(path=persist_directory)
+        collection = client.get_or_create_collection(
+            name=collection_name,
+            metadata=hnsw_metadata,
+            embedding_function=None,
         )
         # 2. Generate unique IDs for each document chunk
         uuids = [str(uuid4()) for _ in splits]
@@ -49,12 +120,49 @@ class DocumentEmbedder:
         # 2. Filter complex metadata from docling before storing
         print("Filtering complex metadata before storing...")
         filtered_splits = filter_complex_metadata(splits)
+        texts = [doc.page_content for doc in filtered_splits]
+
+        # 3. Embed theo batch đã sắp xếp theo độ dài token, ghi Chroma theo batch
+        print(
+            f"Adding {len(filtered_splits)} document chunks to vector store "
+            f"(embed batch={self.embed_batch_size}, write batch={self.write_batch_size})…"
+        )
+        start = time.perf_counter()
+        embed_seconds = 0.0
+        buffer = {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+        written = 0
+
+        for batch in self._length_sorted_batches(texts):
+            embed_start = time.perf_counter()
+            vectors = self.embeddings.embed_documents([texts[i] for i in batch])
+            embed_seconds += time.perf_counter() - embed_start
+
+            buffer["ids"].extend(uuids[i] for i in batch)
+            buffer["embeddings"].extend(vectors)
+            buffer["documents"].extend(texts[i] for i in batch)
+            buffer["metadatas"].extend(filtered_splits[i].metadata for i in batch)
+
+            if len(buffer["ids"]) >= self.write_batch_size:
+                self._write_batch(collection, **buffer)
+                written += len(buffer["ids"])
+                buffer = {k: [] for k in buffer}
+                print(f"  ... {written}/{len(texts)} chunks written")
+
+        if buffer["ids"]:
+            self._write_batch(collection, **buffer)
+            written += len(buffer["ids"])
+
+        total_seconds = time.perf_counter() - start
+        print(
+            f"==> Stored {written} chunks in {total_seconds:.1f}s "
+            f"({written / max(total_seconds, 1e-9):.1f} chunks/sec overall, "
+            f"{written / max(embed_seconds, 1e-9):.1f} chunks/sec embedding)"
+        )
 
-        # 3. Add documents to the vector store
-        print(f"Adding {len(filtered_splits)} document chunks to vector store…")
-        vectordb.add_documents(documents=filtered_splits, ids=uuids)
+        # 4. Build lại BM25 index trên toàn bộ collection cho hybrid search
+        build_and_save_from_collection(collection, persist_directory, collection_name)
 
-        return vectordb
+        return collection
 
 
 # --------------------------- TEST -------------------------------
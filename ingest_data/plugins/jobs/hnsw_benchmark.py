@@ -0,0 +1,263 @@
+"""Benchmark recall@k và latency của HNSW (Chroma) theo M / construction_ef / search_ef.
+
+    # Vector tổng hợp
+    python -m plugins.jobs.hnsw_benchmark --synthetic 20000 --dim 768
+
+    # Vector thật từ collection đã ingest
+    PERSIST_DIRECTORY=... python -m plugins.jobs.hnsw_benchmark \\
+        --collection rag-pipeline-environment_battery
+
+Mỗi tổ hợp tham số được build thành một collection tạm (in-memory). Query là
+các vector được giữ lại, không insert. Ground truth tính bằng brute force
+numpy. Report (markdown + JSON) ghi vào ``--out``. Tham số chọn được đưa vào
+ingest qua env HNSW_M, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF, HNSW_SPACE.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+
+import chromadb
+import numpy as np
+
+from plugins.jobs.utils import logger
+
+
+def load_collection_vectors(
+    persist_directory: str, collection_name: str, limit: int | None = None
+) -> tuple[np.ndarray, str]:
+    """Đọc embeddings (và distance space) của một collection đã ingest."""
+    client = chromadb.PersistentClient(path=persist_directory)
+    collection = client.get_collection(collection_name)
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+
+    vectors, offset = [], 0
+    while limit is None or offset < limit:
+        page_size = 1000 if limit is None else min(1000, limit - offset)
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+
+    if not vectors:
+        raise ValueError(f"Collection {collection_name} has no embeddings")
+    return np.concatenate(vectors), space
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Vector chuẩn hoá, gom cụm nhẹ để giống phân bố embedding thật hơn uniform."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(n // 200, 1), dim))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.normal(
+        size=(n, dim)
+    )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def exact_neighbors(
+    corpus: np.ndarray, queries: np.ndarray, k: int, space: str
+) -> np.ndarray:
+    """Top-k chính xác theo cùng distance với Chroma (l2 / cosine / ip)."""
+    sims = queries @ corpus.T
+    if space == "l2":
+        distances = (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            + np.einsum("ij,ij->i", corpus, corpus)[None, :]
+            - 2 * sims
+        )
+    elif space == "cosine":
+        norms = np.linalg.norm(queries, axis=1)[:, None] * np.linalg.norm(
+            corpus, axis=1
+        )
+        distances = 1 - sims / np.maximum(norms, 1e-12)
+    else:
+        distances = 1 - sims
+
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def run_config(
+    client,
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+    space: str,
+    m: int,
+    construction_ef: int,
+    search_ef: int,
+    batch_size: int = 1000,
+) -> dict:
+    name = f"hnsw-bench-{m}-{construction_ef}-{search_ef}"
+    collection = client.create_collection(
+        name,
+        metadata={
+            "hnsw:space": space,
+            "hnsw:M": m,
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:search_ef": search_ef,
+        },
+    )
+    try:
+        start = time.perf_counter()
+        for offset in range(0, len(corpus), batch_size):
+            batch = corpus[offset : offset + batch_size]
+            collection.add(
+                ids=[str(i) for i in range(offset, offset + len(batch))],
+                embeddings=batch.tolist(),
+            )
+        build_seconds = time.perf_counter() - start
+
+        # Warm-up để index được load trước khi đo
+        for query in queries[: min(10, len(queries))]:
+            collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+
+        latencies, recalls = [], []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = collection.query(
+                query_embeddings=[query.tolist()], n_results=k, include=[]
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = {int(i) for i in result["ids"][0]}
+            recalls.append(len(found & set(expected.tolist())) / k)
+    finally:
+        client.delete_collection(name)
+
+    return {
+        "M": m,
+        "construction_ef": construction_ef,
+        "search_ef": search_ef,
+        f"recall@{k}": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "build_seconds": build_seconds,
+    }
+
+
+def write_report(
+    results: list[dict], out_dir: str, k: int, target_recall: float, meta: dict
+) -> str:
+    recall_key = f"recall@{k}"
+    # Cấu hình nhanh nhất (p99) đạt recall mục tiêu
+    eligible = [r for r in results if r[recall_key] >= target_recall]
+    best = min(eligible, key=lambda r: r["p99_ms"]) if eligible else None
+
+    lines = [
+        "# HNSW benchmark",
+        "",
+        f"- corpus: {meta['corpus']} ({meta['n_vectors']} vectors, dim {meta['dim']}, "
+        f"space {meta['space']})",
+        f"- queries: {meta['n_queries']}, k = {k}",
+        "",
+        f"| M | construction_ef | search_ef | {recall_key} | p50 (ms) | p99 (ms) "
+        "| build (s) |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for r in sorted(
+        results, key=lambda r: (r["M"], r["construction_ef"], r["search_ef"])
+    ):
+        lines.append(
+            f"| {r['M']} | {r['construction_ef']} | {r['search_ef']} "
+            f"| {r[recall_key]:.4f} | {r['p50_ms']:.2f} | {r['p99_ms']:.2f} "
+            f"| {r['build_seconds']:.1f} |"
+        )
+    lines.append("")
+    if best:
+        lines.append(
+            f"Recommended (lowest p99 with {recall_key} >= {target_recall}): "
+            f"HNSW_M={best['M']} HNSW_CONSTRUCTION_EF={best['construction_ef']} "
+            f"HNSW_SEARCH_EF={best['search_ef']}"
+        )
+    else:
+        lines.append(f"No configuration reached {recall_key} >= {target_recall}.")
+
+    os.makedirs(out_dir, exist_ok=True)
+    report_path = os.path.join(out_dir, "hnsw_report.md")
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    with open(os.path.join(out_dir, "hnsw_results.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"meta": meta, "target_recall": target_recall, "results": results},
+            f,
+            indent=2,
+        )
+    print("\n".join(lines))
+    return report_path
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HNSW parameters")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, help="Số vector tổng hợp")
+    source.add_argument("--collection", help="Collection đã ingest để lấy vector")
+    parser.add_argument("--persist-dir", default=os.getenv("PERSIST_DIRECTORY"))
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--limit", type=int, help="Số vector tối đa lấy từ collection")
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", type=_int_list, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=_int_list, default=[100, 200])
+    parser.add_argument("--search-ef", type=_int_list, default=[10, 50, 100, 200])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--out", default="hnsw_benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors, space = synthetic_vectors(args.synthetic, args.dim, args.seed), "l2"
+        corpus_name = "synthetic"
+    else:
+        vectors, space = load_collection_vectors(
+            args.persist_dir, args.collection, args.limit
+        )
+        corpus_name = args.collection
+    space = args.space or space
+
+    if len(vectors) <= args.queries:
+        parser.error(f"Need more than {args.queries} vectors, got {len(vectors)}")
+
+    # Query là vector giữ lại (không nằm trong index)
+    rng = np.random.default_rng(args.seed)
+    perm = rng.permutation(len(vectors))
+    queries, corpus = vectors[perm[: args.queries]], vectors[perm[args.queries :]]
+    truth = exact_neighbors(corpus, queries, args.k, space)
+    logger.info(
+        f"Benchmarking {len(corpus)} vectors, {len(queries)} queries, space={space}"
+    )
+
+    client = chromadb.EphemeralClient()
+    results = []
+    for m, construction_ef, search_ef in itertools.product(
+        args.m, args.construction_ef, args.search_ef
+    ):
+        result = run_config(
+            client, corpus, queries, truth, args.k, space, m, construction_ef, search_ef
+        )
+        logger.info(f"{result}")
+        results.append(result)
+
+    meta = {
+        "corpus": corpus_name,
+        "n_vectors": len(corpus),
+        "dim": int(vectors.shape[1]),
+        "space": space,
+        "n_queries": len(queries),
+    }
+    report_path = write_report(results, args.out, args.k, args.target_recall, meta)
+    logger.info(f"Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import os
 import logging
 from io import BytesIO
+from typing import List
 from minio import Minio
 from minio.error import S3Error
 from transformers import AutoTokenizer
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 import torch
 
 
@@ -88,7 +90,48 @@ def get_tokenizer():
     return tokenizer
 
 
+# torch | onnx | onnx-int8 — phải khớp với EMBEDDING_BACKEND của API
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Cùng thư mục host với EMBEDDING_ONNX_DIR của API (infrastructure/storage/onnx)
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "/opt/onnx")
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings chạy model ONNX (fp32 hoặc int8) trên CPU. Encoder là
+    ``src/infrastructure/embeddings/onnx_model.py`` của API (mount qua
+    docker-compose) để vector lúc index và lúc query không lệch nhau.
+    """
+
+    def __init__(self, export_dir: str, quantized: bool = False, batch_size: int = 32):
+        from src.infrastructure.embeddings.onnx_model import OnnxEncoder
+
+        self.encoder = OnnxEncoder(
+            export_dir, quantized=quantized, batch_size=batch_size
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encoder.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
 def get_embeddings():
+    if EMBEDDING_BACKEND in ("onnx", "onnx-int8"):
+        from src.infrastructure.embeddings.onnx_model import (
+            export_onnx,
+            model_export_dir,
+        )
+
+        quantized = EMBEDDING_BACKEND == "onnx-int8"
+        # Chưa có bản export (API chưa chạy lần nào) thì tự export
+        export_dir = export_onnx(
+            model_name, model_export_dir(EMBEDDING_ONNX_DIR, model_name), quantized
+        )
+        print(f"--- Using ONNX backend: {EMBEDDING_BACKEND} ({export_dir}) ---")
+        return OnnxEmbeddings(str(export_dir), quantized=quantized)
+
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"--- Using device: {device.upper()} ---")
     embeddings = HuggingFaceEmbeddings(
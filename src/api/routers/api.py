@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from src.api.routers import rest_retrieval, sse_retrieval
+from src.api.routers import cache_stats, rest_retrieval, sse_retrieval
 
 api_router = APIRouter()
 api_router.include_router(
@@ -8,3 +8,4 @@ api_router.include_router(
 api_router.include_router(
     sse_retrieval.router, prefix="/sse-retrieve", tags=["SSE Retriever"]
 )
+api_router.include_router(cache_stats.router, prefix="/cache", tags=["Cache"])
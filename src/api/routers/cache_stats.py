@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, status
+from src.api.dependencies.rag import get_rag_service
+from src.cache.semantic_cache import semantic_cache_llms
+from src.infrastructure.embeddings.embeddings import embedding_service
+from src.services.application.rag import Rag
+
+router = APIRouter()
+
+
+@router.get(
+    "/stats",
+    status_code=status.HTTP_200_OK,
+)
+async def cache_stats(rag_service: Rag = Depends(get_rag_service)):
+    """Hit/miss metrics của các tầng cache trong worker hiện tại."""
+    retrieval_cache = rag_service.chroma_client.retrieval_cache
+    return {
+        "embedding": embedding_service.cache_stats(),
+        "retrieval": retrieval_cache.stats() if retrieval_cache else None,
+        "semantic": semantic_cache_llms.stats(),
+        "open_collections": rag_service.chroma_client.open_datasets(),
+    }
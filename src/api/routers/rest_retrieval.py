@@ -1,11 +1,14 @@
 import uuid
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from nemoguardrails import LLMRails
 from src.api.dependencies.rag import get_rag_service
 from src.api.dependencies.guarails import get_guardrails_restapi
+from src.infrastructure.embeddings.embeddings import embedding_service
+from src.infrastructure.vector_stores.chroma_client import DatasetNotFoundError
 from src.schemas.api.requests import UserInput
 from src.schemas.api.response import ResponseOutput
 from src.services.application.rag import Rag
+from src.utils.request_context import use_dataset
 
 router = APIRouter()
 
@@ -24,6 +27,16 @@ async def retrieve_restaurants(
     # ———— ID Normalization ————
     session_id = input.session_id or str(uuid.uuid4())
     user_id = input.user_id or f"user_{uuid.uuid4().hex[:8]}"
+    try:
+        dataset = use_dataset(input.dataset)
+        await rag_service.chroma_client.aopen(dataset)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except DatasetNotFoundError as e:
+        # Dataset được cấu hình nhưng chưa ingest: không tạo collection rỗng
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    # Mỗi câu hỏi chỉ embed một lần trong suốt request
+    embedding_service.begin_request_scope()
     response = await rag_service.get_response(
         question=input.user_input,
         session_id=session_id,
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from nemoguardrails import LLMRails
 from src.api.dependencies.rag import get_rag_service
 from src.api.dependencies.guarails import get_guardrails_sse
+from src.infrastructure.embeddings.embeddings import embedding_service
+from src.infrastructure.vector_stores.chroma_client import DatasetNotFoundError
 from src.schemas.api.requests import UserInput
 from src.services.application.rag import Rag
+from src.utils.request_context import use_dataset
 from fastapi.responses import StreamingResponse
 import asyncio
 import uuid
@@ -21,11 +24,23 @@ async def retrieve_restaurants(
     rag_service: Rag = Depends(get_rag_service),
     guardrails: LLMRails = Depends(get_guardrails_sse),
 ):
+    try:
+        dataset = use_dataset(input.dataset)
+        await rag_service.chroma_client.aopen(dataset)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except DatasetNotFoundError as e:
+        # Dataset được cấu hình nhưng chưa ingest: không tạo collection rỗng
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
     try:
         # Check và generate session_id/user_id ở router
         session_id = input.session_id or str(uuid.uuid4())
         user_id = input.user_id or f"user_{str(uuid.uuid4())[:8]}"
 
+        # Mỗi câu hỏi chỉ embed một lần trong suốt request
+        embedding_service.begin_request_scope()
+
         async def generate_response():
             # Gửi metadata trước
             metadata = {"session_id": session_id, "user_id": user_id}
@@ -0,0 +1,248 @@
+"""Hiệu chỉnh ngưỡng distance của semantic cache từ log câu hỏi.
+
+    SEMANTIC_CACHE_LOOKUP_LOG=logs/semcache.jsonl   # bật log ở API
+    python -m src.cache.calibrate --log logs/semcache.jsonl --plot
+
+Mỗi dòng JSONL cần ``question``; ``namespace`` (lọc theo ``--namespace``) và
+``label`` là tuỳ chọn. Câu hỏi được phát lại theo thứ tự vào một cache rỗng:
+mỗi câu so với mọi câu trước đó, distance tới câu gần nhất quyết định hit ở
+từng ngưỡng. Hai câu cùng ``label`` là cùng ý định; hit vào câu khác label là
+false hit. Không có label thì chỉ tính được hit rate, kèm ``pairs.csv`` (cặp
+gần nhất theo distance) để gán label bằng tay rồi chạy lại.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings.embeddings import embedding_service, normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def load_questions(path: str, namespace: Optional[str] = None) -> List[dict]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if not record.get("question"):
+                continue
+            if namespace and not str(record.get("namespace", namespace)).startswith(
+                namespace
+            ):
+                continue
+            records.append(record)
+    return records
+
+
+def nearest_previous(
+    vectors: np.ndarray, order: List[int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Với mỗi lượt ``order[i]`` (chỉ số vào ``vectors``), distance cosine và chỉ
+    số lượt trước đó gần nhất; lượt đầu tiên có distance = inf, match = -1.
+    """
+    distances = np.full(len(order), np.inf, dtype=np.float32)
+    matches = np.full(len(order), -1, dtype=np.int64)
+    seen_rows: List[int] = []
+    seen_turn: dict[int, int] = {}  # row -> lượt đầu tiên xuất hiện
+    for turn, row in enumerate(order):
+        if row in seen_turn:
+            distances[turn], matches[turn] = 0.0, seen_turn[row]
+            continue
+        if seen_rows:
+            sims = vectors[seen_rows] @ vectors[row]
+            best = int(np.argmax(sims))
+            distances[turn] = 1.0 - float(sims[best])
+            matches[turn] = seen_turn[seen_rows[best]]
+        seen_rows.append(row)
+        seen_turn[row] = turn
+    return distances, matches
+
+
+def threshold_curve(
+    distances: np.ndarray,
+    matches: np.ndarray,
+    labels: List[Optional[str]],
+    thresholds: List[float],
+) -> List[dict]:
+    has_previous = matches >= 0
+    labeled = np.array(
+        [
+            m >= 0 and labels[i] is not None and labels[m] is not None
+            for i, m in enumerate(matches)
+        ]
+    )
+    wrong = np.array(
+        [labeled[i] and labels[i] != labels[m] for i, m in enumerate(matches)]
+    )
+    curve = []
+    for threshold in thresholds:
+        hits = has_previous & (distances <= threshold)
+        false_hits = hits & wrong
+        n_hits = int(hits.sum())
+        curve.append(
+            {
+                "threshold": threshold,
+                "lookups": int(has_previous.sum()),
+                "hits": n_hits,
+                "hit_rate": n_hits / max(int(has_previous.sum()), 1),
+                "false_hits": int(false_hits.sum()),
+                "false_hit_rate": (
+                    int(false_hits.sum()) / max(int((hits & labeled).sum()), 1)
+                    if labeled.any()
+                    else None
+                ),
+            }
+        )
+    return curve
+
+
+def write_outputs(
+    out_dir: str,
+    curve: List[dict],
+    questions: List[str],
+    distances: np.ndarray,
+    matches: np.ndarray,
+    plot: bool = False,
+):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(
+        os.path.join(out_dir, "curve.csv"), "w", newline="", encoding="utf-8"
+    ) as f:
+        writer = csv.DictWriter(f, fieldnames=list(curve[0]))
+        writer.writeheader()
+        writer.writerows(curve)
+
+    # Cặp gần nhất (bỏ lặp lại y hệt) để soát / gán label bằng tay
+    with open(
+        os.path.join(out_dir, "pairs.csv"), "w", newline="", encoding="utf-8"
+    ) as f:
+        writer = csv.writer(f)
+        writer.writerow(["distance", "question", "matched_question"])
+        for turn in np.argsort(distances):
+            if matches[turn] < 0 or distances[turn] == 0.0:
+                continue
+            writer.writerow(
+                [
+                    f"{distances[turn]:.4f}",
+                    questions[turn],
+                    questions[matches[turn]],
+                ]
+            )
+
+    if not plot:
+        return
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        logger.warning("matplotlib not installed, skipping plot")
+        return
+
+    thresholds = [row["threshold"] for row in curve]
+    fig, ax = plt.subplots(figsize=(7, 4))
+    ax.plot(thresholds, [row["hit_rate"] for row in curve], label="hit rate")
+    if curve[0]["false_hit_rate"] is not None:
+        ax.plot(
+            thresholds,
+            [row["false_hit_rate"] for row in curve],
+            label="false-hit rate",
+        )
+    ax.axvline(
+        SETTINGS.SEMANTIC_CACHE_DISTANCE_THRESHOLD,
+        linestyle="--",
+        color="grey",
+        label="current threshold",
+    )
+    ax.set_xlabel("cosine distance threshold")
+    ax.set_ylabel("rate")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(os.path.join(out_dir, "curve.png"), dpi=120)
+
+
+def _thresholds(value: str) -> List[float]:
+    if ":" in value:
+        start, stop, step = (float(v) for v in value.split(":"))
+        return [round(t, 4) for t in np.arange(start, stop + step / 2, step)]
+    return [float(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate semantic cache threshold")
+    parser.add_argument("--log", required=True, help="File JSONL câu hỏi")
+    parser.add_argument("--namespace", default="pre-cache")
+    parser.add_argument(
+        "--thresholds", type=_thresholds, default=_thresholds("0.02:0.4:0.02")
+    )
+    parser.add_argument(
+        "--max-false-hit",
+        type=float,
+        default=0.01,
+        help="False-hit rate tối đa chấp nhận khi đề xuất ngưỡng",
+    )
+    parser.add_argument("--out", default="semantic_cache_calibration")
+    parser.add_argument("--plot", action="store_true", help="Vẽ curve.png (matplotlib)")
+    args = parser.parse_args()
+
+    records = load_questions(args.log, args.namespace)
+    if len(records) < 2:
+        parser.error(f"Need at least 2 questions, got {len(records)}")
+
+    # Chuẩn hoá giống L1 key; câu lặp lại chỉ embed một lần
+    questions = [r["question"] for r in records]
+    normalized = [normalize_text(q).casefold() for q in questions]
+    first_seen = dict(zip(reversed(normalized), reversed(questions)))
+    unique = list(dict.fromkeys(normalized))
+    row_of = {text: row for row, text in enumerate(unique)}
+    vectors = np.asarray(
+        embedding_service.embed_documents([first_seen[t] for t in unique]),
+        dtype=np.float32,
+    )
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    distances, matches = nearest_previous(vectors, [row_of[t] for t in normalized])
+    labels = [r.get("label") for r in records]
+    curve = threshold_curve(distances, matches, labels, args.thresholds)
+    write_outputs(args.out, curve, questions, distances, matches, plot=args.plot)
+
+    print(f"{'threshold':>9} {'hit_rate':>8} {'false_hit':>9}")
+    for row in curve:
+        false_hit = (
+            f"{row['false_hit_rate']:.4f}" if row["false_hit_rate"] is not None else "-"
+        )
+        print(f"{row['threshold']:>9.3f} {row['hit_rate']:>8.4f} {false_hit:>9}")
+
+    if curve[0]["false_hit_rate"] is None:
+        print("No labels: see pairs.csv to label near pairs, then re-run.")
+        return
+    eligible = [r for r in curve if r["false_hit_rate"] <= args.max_false_hit]
+    if eligible:
+        best = max(eligible, key=lambda r: r["threshold"])
+        print(
+            f"Recommended SEMANTIC_CACHE_DISTANCE_THRESHOLD={best['threshold']} "
+            f"(hit rate {best['hit_rate']:.4f}, false-hit rate "
+            f"{best['false_hit_rate']:.4f})"
+        )
+    else:
+        print(f"No threshold keeps false-hit rate <= {args.max_false_hit}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    main()
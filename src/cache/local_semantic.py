@@ -0,0 +1,241 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.cache.semantic_store import SemanticHit, SemanticStore
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSemanticStore(SemanticStore):
+    """
+    Semantic cache trong process, không cần Redis: vector đã chuẩn hoá nằm
+    trong một ma trận NumPy cấp phát sẵn ``capacity`` hàng, lookup là một phép
+    nhân ma trận-vector trên các hàng cùng namespace còn hạn. Đầy thì ghi đè
+    hàng hết hạn, không có thì hàng ít dùng nhất (LRU). Namespace (version cache)
+    bị bỏ cùng hàng cuối cùng của nó nên số namespace bị chặn bởi ``capacity``.
+
+    ``persist_path`` (tuỳ chọn): nạp lại khi khởi động, ghi ra khi ``close()``.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        *,
+        capacity: int = 10000,
+        distance_threshold: float = 0.2,
+        ttl: int = 20,
+        persist_path: Optional[str] = None,
+    ):
+        super().__init__(distance_threshold=distance_threshold, ttl=ttl)
+        self.capacity = capacity
+        self.persist_path = persist_path
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # Cấp phát khi biết dim
+        self._expires = np.full(capacity, np.inf)  # time.time(); inf = không hạn
+        self._last_used = np.zeros(capacity)
+        self._namespace_ids = np.full(capacity, -1, dtype=np.int32)  # -1 = trống
+        # Namespace chỉ sống khi còn hàng: version cũ bị bỏ khi hàng cuối bị ghi đè
+        self._namespaces: Dict[str, int] = {}
+        self._namespace_rows: Dict[str, int] = {}
+        self._next_namespace_id = 0
+        self._rows: Dict[tuple[str, str], int] = {}
+        self._entries: List[Optional[tuple[str, str, str]]] = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+        self._exact: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.evictions = 0
+        if persist_path and os.path.exists(f"{persist_path}.npz"):
+            try:
+                self._load(persist_path)
+            except Exception as e:
+                logger.warning("Could not load local semantic cache: %s", e)
+
+    def _expiry(self, ttl: Optional[int]) -> float:
+        return time.time() + ttl if ttl else np.inf
+
+    def _assign(self, row: int, namespace: str, prompt: str, response: str):
+        """Gắn hàng (mới cấp phát) cho namespace, tạo namespace nếu chưa có."""
+        namespace_id = self._namespaces.get(namespace)
+        if namespace_id is None:
+            namespace_id = self._namespaces[namespace] = self._next_namespace_id
+            self._next_namespace_id += 1
+        self._namespace_rows[namespace] = self._namespace_rows.get(namespace, 0) + 1
+        self._namespace_ids[row] = namespace_id
+        self._entries[row] = (namespace, prompt, response)
+        self._rows[(namespace, prompt)] = row
+
+    def _release(self, row: int):
+        entry = self._entries[row]
+        if entry is not None:
+            namespace = entry[0]
+            self._rows.pop((namespace, entry[1]), None)
+            self._namespace_rows[namespace] -= 1
+            if not self._namespace_rows[namespace]:
+                del self._namespace_rows[namespace]
+                del self._namespaces[namespace]
+        self._entries[row] = None
+        self._namespace_ids[row] = -1
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        expired = np.flatnonzero(self._expires <= time.time())
+        row = int(expired[0]) if len(expired) else int(np.argmin(self._last_used))
+        self._release(row)
+        self.evictions += 1
+        return row
+
+    async def nearest(
+        self, vector: List[float], namespace: str
+    ) -> Optional[SemanticHit]:
+        namespace_id = self._namespaces.get(namespace)
+        if self._vectors is None or namespace_id is None:
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        now = time.time()
+        with self._lock:
+            rows = np.flatnonzero(
+                (self._namespace_ids == namespace_id) & (self._expires > now)
+            )
+            if not len(rows):
+                return None
+            sims = self._vectors[rows] @ query
+            best = int(np.argmax(sims))
+            row = int(rows[best])
+            distance = 1.0 - float(sims[best])
+            if distance <= self.distance_threshold:
+                self._last_used[row] = now
+            _, _, response = self._entries[row]
+            expires = float(self._expires[row])
+        ttl_left = None if np.isinf(expires) else expires - now
+        return SemanticHit(response, distance, ttl_left)
+
+    async def update_many(self, entries: List[tuple[str, List[float], str, str]]):
+        if not entries:
+            return
+        now = time.time()
+        expires = self._expiry(self.ttl)
+        with self._lock:
+            if self._vectors is None:
+                dim = len(entries[0][1])
+                self._vectors = np.zeros((self.capacity, dim), dtype=np.float32)
+            for prompt, vector, namespace, response in entries:
+                row = self._rows.get((namespace, prompt))
+                if row is None:
+                    row = self._allocate()
+                    self._assign(row, namespace, prompt, response)
+                else:
+                    self._entries[row] = (namespace, prompt, response)
+                v = np.asarray(vector, dtype=np.float32)
+                self._vectors[row] = v / max(float(np.linalg.norm(v)), 1e-12)
+                self._expires[row] = expires
+                self._last_used[row] = now
+
+    async def get_exact(self, key: str) -> Optional[tuple[str, Optional[float]]]:
+        with self._lock:
+            item = self._exact.get(key)
+            if item is None:
+                return None
+            expires, text = item
+            now = time.time()
+            if expires <= now:
+                del self._exact[key]
+                return None
+            self._exact.move_to_end(key)
+        return text, (None if np.isinf(expires) else expires - now)
+
+    async def set_exact_many(self, entries: List[tuple[str, str]], ttl: int):
+        expires = self._expiry(ttl)
+        with self._lock:
+            for key, text in entries:
+                self._exact[key] = (expires, text)
+                self._exact.move_to_end(key)
+            while len(self._exact) > self.capacity:
+                self._exact.popitem(last=False)
+
+    async def clear(self):
+        with self._lock:
+            for row in list(self._rows.values()):
+                self._release(row)
+            self._free = list(range(self.capacity - 1, -1, -1))
+            self._expires[:] = np.inf
+            self._last_used[:] = 0
+            self._exact.clear()
+
+    def _save(self, path: str):
+        with self._lock:
+            used = np.flatnonzero(
+                (self._namespace_ids >= 0) & (self._expires > time.time())
+            )
+            vectors = (
+                self._vectors[used]
+                if self._vectors is not None
+                else np.zeros((0, 0), dtype=np.float32)
+            )
+            arrays = {
+                "vectors": vectors,
+                "expires": self._expires[used],
+                "last_used": self._last_used[used],
+            }
+            meta = {
+                "entries": [list(self._entries[r]) for r in used],
+                "exact": [
+                    [key, None if np.isinf(exp) else exp, text]
+                    for key, (exp, text) in self._exact.items()
+                ],
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(f"{path}.tmp.npz", **arrays)
+        with open(f"{path}.tmp.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp.npz", f"{path}.npz")
+        os.replace(f"{path}.tmp.json", f"{path}.json")
+        logger.info("Saved %d local semantic cache entries to %s", len(used), path)
+
+    def _load(self, path: str):
+        arrays = np.load(f"{path}.npz")
+        with open(f"{path}.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        now = time.time()
+        keep = [i for i, exp in enumerate(arrays["expires"]) if exp > now]
+        keep = keep[-self.capacity :]
+        if keep:
+            self._vectors = np.zeros(
+                (self.capacity, arrays["vectors"].shape[1]), dtype=np.float32
+            )
+        for i in keep:
+            namespace, prompt, response = meta["entries"][i]
+            row = self._free.pop()
+            self._vectors[row] = arrays["vectors"][i]
+            self._expires[row] = arrays["expires"][i]
+            self._last_used[row] = arrays["last_used"][i]
+            self._assign(row, namespace, prompt, response)
+        for key, expires, text in meta["exact"]:
+            expires = np.inf if expires is None else expires
+            if expires > now:
+                self._exact[key] = (expires, text)
+        logger.info("Loaded %d local semantic cache entries from %s", len(keep), path)
+
+    async def close(self):
+        if self.persist_path:
+            await asyncio.to_thread(self._save, self.persist_path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "entries": len(self._rows),
+            "exact_entries": len(self._exact),
+            "namespaces": len(self._namespaces),
+            "capacity": self.capacity,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.cache.write_behind import WriteBehindQueue
+
+# Cận trên của các bucket histogram distance (cosine distance, 0..2)
+DISTANCE_BUCKETS = [round(0.05 * i, 2) for i in range(1, 11)] + [0.75, 1.0, 2.0]
+
+
+class _NamespaceMetrics:
+    def __init__(self, ewma_alpha: float):
+        self.ewma_alpha = ewma_alpha
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.hit_distances = [0] * len(DISTANCE_BUCKETS)
+        self.miss_distances = [0] * len(DISTANCE_BUCKETS)
+        self.miss_latency_ms: Optional[float] = None  # EWMA thời gian chạy khi miss
+        self.latency_saved_ms = 0.0
+
+    def observe_distance(self, distance: float, hit: bool):
+        buckets = self.hit_distances if hit else self.miss_distances
+        for i, upper in enumerate(DISTANCE_BUCKETS):
+            if distance <= upper:
+                buckets[i] += 1
+                return
+        buckets[-1] += 1
+
+    def observe_miss_latency(self, latency_ms: float):
+        if self.miss_latency_ms is None:
+            self.miss_latency_ms = latency_ms
+        else:
+            self.miss_latency_ms += self.ewma_alpha * (
+                latency_ms - self.miss_latency_ms
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            "lookups": lookups,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "hit_rate": (self.l1_hits + self.l2_hits) / lookups if lookups else 0.0,
+            "distance_buckets": DISTANCE_BUCKETS,
+            "hit_distances": self.hit_distances,
+            "miss_distances": self.miss_distances,
+            "miss_latency_ms": self.miss_latency_ms,
+            "latency_saved_ms": self.latency_saved_ms,
+        }
+
+
+class SemanticCacheMetrics:
+    """
+    Metrics của semantic cache theo namespace (pre-cache / post-cache):
+    hit/miss theo tầng, histogram distance của hit và near-miss, latency tiết
+    kiệm được (mỗi hit cộng EWMA thời gian chạy của các lần miss).
+
+    Nếu có ``log_path``, mỗi lookup ở L2 được ghi một dòng JSONL (qua
+    write-behind, không chặn request) để dùng cho ``src.cache.calibrate``.
+    Log luôn có ``prompt_hash``; text (cắt còn ``max_chars``) chỉ được ghi cho
+    ``text_namespaces`` có key là câu hỏi, không ghi context tài liệu của
+    post-cache (có thể chứa dữ liệu cá nhân).
+    """
+
+    def __init__(
+        self,
+        log_path: Optional[str] = None,
+        ewma_alpha: float = 0.1,
+        text_namespaces: Iterable[str] = ("pre-cache",),
+        max_chars: int = 300,
+    ):
+        self.ewma_alpha = ewma_alpha
+        self.text_namespaces = frozenset(text_namespaces)
+        self.max_chars = max_chars
+        self._namespaces: Dict[str, _NamespaceMetrics] = defaultdict(
+            lambda: _NamespaceMetrics(self.ewma_alpha)
+        )
+        self.log_path = log_path
+        self._log_writer: Optional[WriteBehindQueue[dict]] = (
+            WriteBehindQueue(
+                self._append_log,
+                max_size=10000,
+                batch_size=256,
+                flush_interval_ms=1000,
+                max_retries=0,
+                name="semantic-cache-lookup-log",
+            )
+            if log_path
+            else None
+        )
+
+    @staticmethod
+    def base_namespace(namespace: str) -> str:
+        # "pre-cache:<dataset>:v<version>" -> "pre-cache"
+        return namespace.split(":", 1)[0]
+
+    def record_l1_hit(self, namespace: str):
+        metrics = self._namespaces[self.base_namespace(namespace)]
+        metrics.l1_hits += 1
+        metrics.latency_saved_ms += metrics.miss_latency_ms or 0.0
+
+    def record_lookup(
+        self,
+        namespace: str,
+        prompt: Optional[str],
+        hit: bool,
+        distance: Optional[float] = None,
+        threshold: Optional[float] = None,
+    ):
+        """Lookup ở L2; ``distance`` là của entry gần nhất, kể cả khi vượt ngưỡng."""
+        metrics = self._namespaces[self.base_namespace(namespace)]
+        if hit:
+            metrics.l2_hits += 1
+            metrics.latency_saved_ms += metrics.miss_latency_ms or 0.0
+        else:
+            metrics.misses += 1
+        if distance is not None:
+            metrics.observe_distance(distance, hit)
+        # Chỉ log lookup theo vector (exact cache không có distance để hiệu chỉnh)
+        if self._log_writer is not None and prompt is not None:
+            self._log_writer.submit(
+                self._log_record(namespace, prompt, hit, distance, threshold)
+            )
+
+    @staticmethod
+    def prompt_hash(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+    def describe(self, namespace: str, prompt: str) -> str:
+        """Dạng an toàn để ghi log: câu hỏi cắt ngắn, hoặc hash nếu key là context."""
+        if not prompt:
+            return ""
+        if self.base_namespace(namespace) in self.text_namespaces:
+            return prompt[: self.max_chars]
+        return f"sha256:{self.prompt_hash(prompt)}"
+
+    def _log_record(
+        self,
+        namespace: str,
+        prompt: str,
+        hit: bool,
+        distance: Optional[float],
+        threshold: Optional[float],
+    ) -> dict:
+        record = {
+            "ts": time.time(),
+            "namespace": namespace,
+            "prompt_hash": self.prompt_hash(prompt),
+            "distance": distance,
+            "threshold": threshold,
+            "hit": hit,
+        }
+        if self.base_namespace(namespace) in self.text_namespaces:
+            record["question"] = prompt[: self.max_chars]
+        return record
+
+    def record_miss_latency(self, namespace: str, latency_ms: float):
+        self._namespaces[self.base_namespace(namespace)].observe_miss_latency(
+            latency_ms
+        )
+
+    async def _append_log(self, records: List[dict]):
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+        def append():
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+        await asyncio.to_thread(append)
+
+    async def close(self):
+        if self._log_writer is not None:
+            await self._log_writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {ns: m.snapshot() for ns, m in self._namespaces.items()}
+        if self._log_writer is not None:
+            stats["lookup_log"] = {"path": self.log_path, **self._log_writer.stats()}
+        return stats
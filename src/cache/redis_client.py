@@ -0,0 +1,43 @@
+import logging
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from src.config.settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[aioredis.Redis] = None
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Client redis.asyncio dùng chung cho mọi tầng cache trong worker.
+
+    BlockingConnectionPool: khi hết connection, request chờ tối đa
+    REDIS_POOL_TIMEOUT thay vì mở thêm connection không giới hạn.
+    """
+    global _client
+    if _client is None:
+        pool = aioredis.BlockingConnectionPool.from_url(
+            f"redis://{SETTINGS.REDIS_URI}",
+            max_connections=SETTINGS.REDIS_MAX_CONNECTIONS,
+            timeout=SETTINGS.REDIS_POOL_TIMEOUT,
+            socket_timeout=SETTINGS.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=SETTINGS.REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=30,
+        )
+        _client = aioredis.Redis(connection_pool=pool)
+        logger.info(
+            "Async Redis pool for %s (max_connections=%d)",
+            SETTINGS.REDIS_URI,
+            SETTINGS.REDIS_MAX_CONNECTIONS,
+        )
+    return _client
+
+
+async def close_async_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+
+from src.cache.semantic_store import SemanticHit, SemanticStore
+
+logger = logging.getLogger(__name__)
+
+# Ký tự đặc biệt trong query TAG của RediSearch phải escape (vd: "pre-cache:ds")
+_TAG_SPECIAL = re.compile(r"([^A-Za-z0-9_])")
+
+
+def escape_tag(value: str) -> str:
+    return _TAG_SPECIAL.sub(r"\\\1", value)
+
+
+class AsyncRedisSemanticStore(SemanticStore):
+    """
+    Vector index (RediSearch) cho semantic cache, hoàn toàn trên redis.asyncio.
+
+    Mỗi entry là một hash ``{prefix}:{sha256(namespace, prompt)}`` gồm
+    namespace (TAG), prompt, response và prompt_vector (FLOAT32). Lookup là
+    một lệnh FT.SEARCH KNN trả luôn response + distance (một round trip);
+    update gửi HSET + EXPIRE trong một pipeline. Exact cache là key string
+    thường (GET / SET EX).
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        *,
+        index_name: str = "semantic_cache",
+        prefix: str = "semcache",
+        distance_threshold: float = 0.2,
+        ttl: int = 20,
+    ):
+        super().__init__(distance_threshold=distance_threshold, ttl=ttl)
+        self.redis = redis
+        self.index_name = index_name
+        self.prefix = prefix
+        self._index_ready = False
+        self._index_lock: Optional[asyncio.Lock] = None
+
+    def _key(self, prompt: str, namespace: str) -> str:
+        digest = hashlib.sha256(f"{namespace}\x00{prompt}".encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    async def ensure_index(self, dim: int):
+        if self._index_ready:
+            return
+        if self._index_lock is None:
+            self._index_lock = asyncio.Lock()
+        async with self._index_lock:
+            if self._index_ready:
+                return
+            try:
+                await self.redis.execute_command("FT.INFO", self.index_name)
+            except ResponseError:
+                await self.redis.execute_command(
+                    "FT.CREATE",
+                    self.index_name,
+                    "ON",
+                    "HASH",
+                    "PREFIX",
+                    1,
+                    f"{self.prefix}:",
+                    "SCHEMA",
+                    "namespace",
+                    "TAG",
+                    "prompt_vector",
+                    "VECTOR",
+                    "HNSW",
+                    6,
+                    "TYPE",
+                    "FLOAT32",
+                    "DIM",
+                    dim,
+                    "DISTANCE_METRIC",
+                    "COSINE",
+                )
+                logger.info(f"Created semantic cache index {self.index_name}")
+            self._index_ready = True
+
+    async def nearest(
+        self, vector: List[float], namespace: str
+    ) -> Optional[SemanticHit]:
+        """Entry gần nhất trong namespace, không áp ngưỡng (dùng cho metrics)."""
+        await self.ensure_index(len(vector))
+        query = (
+            f"(@namespace:{{{escape_tag(namespace)}}})"
+            "=>[KNN 1 @prompt_vector $vec AS distance]"
+        )
+        result = await self.redis.execute_command(
+            "FT.SEARCH",
+            self.index_name,
+            query,
+            "PARAMS",
+            2,
+            "vec",
+            np.asarray(vector, dtype=np.float32).tobytes(),
+            "SORTBY",
+            "distance",
+            "RETURN",
+            3,
+            "response",
+            "distance",
+            "created_at",
+            "LIMIT",
+            0,
+            1,
+            "DIALECT",
+            2,
+        )
+        # [total, key, [field, value, ...]]
+        if not result or result[0] == 0 or len(result) < 3:
+            return None
+        raw = result[2]
+        fields = {
+            (k.decode() if isinstance(k, bytes) else k): v
+            for k, v in zip(raw[::2], raw[1::2])
+        }
+        distance = float(fields["distance"])
+        response = fields["response"]
+        ttl_left = None
+        if self.ttl and fields.get("created_at") is not None:
+            ttl_left = self.ttl - (time.time() - float(fields["created_at"]))
+        return SemanticHit(
+            response.decode("utf-8") if isinstance(response, bytes) else response,
+            distance,
+            ttl_left,
+        )
+
+    async def update_many(self, entries: List[tuple[str, List[float], str, str]]):
+        """Ghi nhiều entry (prompt, vector, namespace, response) trong một pipeline."""
+        if not entries:
+            return
+        await self.ensure_index(len(entries[0][1]))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for prompt, vector, namespace, response in entries:
+                key = self._key(prompt, namespace)
+                pipe.hset(
+                    key,
+                    mapping={
+                        "namespace": namespace,
+                        "prompt": prompt,
+                        "response": response,
+                        "prompt_vector": np.asarray(vector, dtype=np.float32).tobytes(),
+                        "created_at": time.time(),
+                    },
+                )
+                if self.ttl:
+                    pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def get_exact(self, key: str) -> Optional[tuple[str, Optional[float]]]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.ttl(key)
+            cached, ttl = await pipe.execute()
+        if cached is None:
+            return None
+        text = cached.decode("utf-8") if isinstance(cached, bytes) else cached
+        return text, (ttl if ttl and ttl > 0 else None)
+
+    async def set_exact_many(self, entries: List[tuple[str, str]], ttl: int):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, text in entries:
+                pipe.set(key, text, ex=ttl or None)
+            await pipe.execute()
+
+    async def clear(self):
+        """Xoá index và toàn bộ entry (FT.DROPINDEX ... DD)."""
+        try:
+            await self.redis.execute_command("FT.DROPINDEX", self.index_name, "DD")
+        except ResponseError:
+            pass
+        self._index_ready = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "index": self.index_name}
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from src.cache.lru import TTLCache
+from src.cache.redis_client import get_async_redis
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings.embeddings import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalCache:
+    """
+    Exact-match cache cho kết quả retrieval: LRU trong process + Redis (tuỳ chọn).
+
+    Key gồm query đã chuẩn hoá, top_k, with_score, metadata_filter và version
+    của collection, nên re-ingest (version đổi) tự động vô hiệu hoá entry cũ.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 2048,
+        ttl: int = 3600,
+        use_redis: bool = False,
+    ):
+        self.ttl = ttl
+        self.local = TTLCache(max_size=max_size, ttl=ttl)
+        # Dùng chung pool redis.asyncio với semantic cache
+        self.redis = get_async_redis() if use_redis else None
+        self.redis_hits = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def make_key(
+        query: str,
+        top_k: int,
+        with_score: bool,
+        metadata_filter: Dict[str, Any] | None,
+        version: str,
+    ) -> str:
+        raw = json.dumps(
+            {
+                "query": normalize_text(query),
+                "top_k": top_k,
+                "with_score": with_score,
+                "filter": metadata_filter,
+                "version": version,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return f"retrieval:{SETTINGS.ENVIRONMENT}:{digest}"
+
+    async def get(self, key: str) -> Optional[List[dict]]:
+        value = self.local.get(key)
+        if value is not None or self.redis is None:
+            return value
+
+        try:
+            cached = await self.redis.get(key)
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Redis not available for retrieval cache: {e}")
+            return None
+        if cached is None:
+            return None
+
+        try:
+            value = json.loads(cached)
+            if not isinstance(value, list):
+                raise ValueError(f"expected a list, got {type(value).__name__}")
+        except ValueError as e:
+            # Entry hỏng (ghi dở, format cũ...): coi như miss và xoá để ghi lại
+            self.redis_errors += 1
+            logger.warning(f"Dropping corrupt retrieval cache entry {key}: {e}")
+            try:
+                await self.redis.delete(key)
+            except Exception as e:
+                logger.warning(f"Could not delete retrieval cache entry: {e}")
+            return None
+
+        self.redis_hits += 1
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: List[dict]):
+        self.local.set(key, value)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(key, json.dumps(value), ex=self.ttl)
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Could not store retrieval cache in Redis: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.local.stats(),
+            "redis_enabled": self.redis is not None,
+            "redis_hits": self.redis_hits,
+            "redis_errors": self.redis_errors,
+        }
@@ -1,40 +1,350 @@
-import inspect
 import asyncio
+import hashlib
+import inspect
 import logging
-from functools import wraps
-from typing import List, Any, Optional
-from langchain_redis import RedisSemanticCache
-from src.infrastructure.embeddings.embeddings import embedding_service
-from src.utils.text_processing import build_context
-from langchain_core.outputs import Generation
+import time
+from contextvars import Context, ContextVar
+from functools import partial, wraps
+from typing import Any, Optional
+import redis.asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+from src.cache.lru import TTLCache
+from src.cache.metrics import SemanticCacheMetrics
+from src.cache.redis_client import get_async_redis
+from src.cache.local_semantic import LocalSemanticStore
+from src.cache.redis_semantic import AsyncRedisSemanticStore
+from src.cache.semantic_store import (
+    FallbackSemanticStore,
+    SemanticHit,
+    SemanticStore,
+)
+from src.cache.single_flight import SingleFlight
+from src.cache.versioning import cache_version
+from src.cache.write_behind import WriteBehindQueue
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings.embeddings import embedding_service, normalize_text
+from src.utils.request_context import current_dataset
+from src.utils.text_processing import build_context, is_blocked_response
+from langchain_core.messages import ToolMessage
 import json
 
 logger = logging.getLogger(__name__)
 
+# True trong task revalidation: mọi tầng cache lồng bên trong (vd: post-cache)
+# bỏ qua lookup, nếu không sẽ trả lại chính entry stale ghi cùng lúc
+_revalidating: ContextVar[bool] = ContextVar(
+    "semantic_cache_revalidating", default=False
+)
+
+# Revalidation không thuộc về user nào: không session (không đọc/ghi chat
+# history của ai), trace và chi phí LLM ghi cho user hệ thống
+REVALIDATION_ATTRIBUTION = {"session_id": None, "user_id": "system:cache-revalidation"}
+
+
+def retrieved_chunk_ids(messages: list) -> list[str]:
+    """ID của chunk đã retrieve, theo thứ tự ToolMessage (hash nội dung nếu không có)."""
+    ids = []
+    for m in messages:
+        if not isinstance(m, ToolMessage):
+            continue
+        if isinstance(m.artifact, list):
+            ids.extend(str(getattr(chunk, "id", chunk)) for chunk in m.artifact)
+        else:
+            content = str(m.content).encode("utf-8")
+            ids.append(f"sha1:{hashlib.sha1(content).hexdigest()}")
+    return ids
+
+
+def decode_sse_frame(chunk: Any) -> tuple[str, bool]:
+    """(text, is_frame): frame ``json.dumps(text) + "\\n\\n"`` -> text gốc."""
+    if isinstance(chunk, str) and chunk.endswith("\n\n") and chunk.startswith('"'):
+        try:
+            text = json.loads(chunk[:-2])
+        except json.JSONDecodeError:
+            return chunk, False
+        if isinstance(text, str):
+            return text, True
+    return str(chunk), False
+
+
+def create_semantic_store(
+    backend: str,
+    *,
+    redis: Optional[aioredis.Redis] = None,
+    distance_threshold: float = 0.2,
+    ttl: int = 20,
+) -> SemanticStore:
+    """
+    backend="redis": RediSearch trên pool dùng chung.
+    backend="local": NumPy trong process, không cần Redis (single node, CI).
+    backend="redis+local": Redis, Redis không kết nối được thì dùng local.
+    """
+
+    def local() -> LocalSemanticStore:
+        return LocalSemanticStore(
+            capacity=SETTINGS.SEMANTIC_CACHE_LOCAL_CAPACITY,
+            distance_threshold=distance_threshold,
+            ttl=ttl,
+            persist_path=SETTINGS.SEMANTIC_CACHE_LOCAL_PATH,
+        )
+
+    def remote() -> AsyncRedisSemanticStore:
+        return AsyncRedisSemanticStore(
+            redis or get_async_redis(),
+            distance_threshold=distance_threshold,
+            ttl=ttl,
+        )
+
+    if backend == "local":
+        return local()
+    if backend == "redis":
+        return remote()
+    if backend == "redis+local":
+        return FallbackSemanticStore(
+            remote(), local(), retry_after=SETTINGS.SEMANTIC_CACHE_RETRY_AFTER
+        )
+    raise ValueError(f"Unknown semantic cache backend '{backend}'")
+
 
 class SemanticCacheLLMs:
     def __init__(
         self,
-        redis_url: str = "redis://localhost:6378",
+        redis: Optional[aioredis.Redis] = None,
         *,
+        store: Optional[SemanticStore] = None,
         embeddings: Optional[Any] = None,
-        distance_threshold: float = 0.2,
+        distance_threshold: Optional[float] = None,
         ttl: int = 20,
     ):
-        self._cache = RedisSemanticCache(
-            embeddings=embeddings or embedding_service,
-            redis_url=redis_url,
+        if distance_threshold is None:
+            distance_threshold = SETTINGS.SEMANTIC_CACHE_DISTANCE_THRESHOLD
+        self.distance_threshold = distance_threshold
+        self._embeddings = embeddings or embedding_service
+        # Lookup/update đều async, không chặn event loop
+        self._cache = store or create_semantic_store(
+            "redis" if redis is not None else SETTINGS.SEMANTIC_CACHE_BACKEND,
+            redis=redis,
             distance_threshold=distance_threshold,
             ttl=ttl,
-            name="llm_cache",
-            prefix="llmcache",
         )
+        # Ghi cache ở background: response không chờ embed + ghi Redis
+        self._writer: WriteBehindQueue[tuple[str, str, str]] = WriteBehindQueue(
+            self._write_entries,
+            max_size=SETTINGS.CACHE_WRITE_QUEUE_SIZE,
+            batch_size=SETTINGS.CACHE_WRITE_BATCH_SIZE,
+            flush_interval_ms=SETTINGS.CACHE_WRITE_FLUSH_MS,
+            max_retries=SETTINGS.CACHE_WRITE_MAX_RETRIES,
+            retry_on=(RedisConnectionError, RedisTimeoutError),
+            name="semantic-cache-writer",
+        )
+        # Exact cache (key là hash, không embed): GET/SET thẳng Redis
+        self._exact_writer: WriteBehindQueue[tuple[str, str]] = WriteBehindQueue(
+            self._write_exact_entries,
+            max_size=SETTINGS.CACHE_WRITE_QUEUE_SIZE,
+            batch_size=SETTINGS.CACHE_WRITE_BATCH_SIZE,
+            flush_interval_ms=SETTINGS.CACHE_WRITE_FLUSH_MS,
+            max_retries=SETTINGS.CACHE_WRITE_MAX_RETRIES,
+            retry_on=(RedisConnectionError, RedisTimeoutError),
+            name="exact-cache-writer",
+        )
+        # L1 trong process: câu hỏi lặp lại y hệt trả ngay, không embed/không Redis
+        self._l1: Optional[TTLCache] = (
+            TTLCache(
+                max_size=SETTINGS.CACHE_L1_MAX_ENTRIES,
+                max_bytes=SETTINGS.CACHE_L1_MAX_BYTES,
+                sizeof=lambda text: len(text.encode("utf-8")),
+            )
+            if SETTINGS.CACHE_L1_ENABLED
+            else None
+        )
+        # Miss trùng key đang chạy -> chờ chung một lần generate
+        self._flights: Optional[SingleFlight] = (
+            SingleFlight() if SETTINGS.SINGLE_FLIGHT_ENABLED else None
+        )
+        self.metrics = SemanticCacheMetrics(
+            log_path=SETTINGS.SEMANTIC_CACHE_LOOKUP_LOG,
+            text_namespaces=SETTINGS.SEMANTIC_CACHE_LOG_TEXT_NAMESPACES,
+            max_chars=SETTINGS.SEMANTIC_CACHE_LOG_MAX_CHARS,
+        )
+        # Stale-while-revalidate: hit quá soft expiry vẫn trả ngay, làm mới ở background
+        self._revalidations: dict[str, asyncio.Task] = {}
+        self.stale_hits = 0
+        self.revalidated = 0
+        self.revalidate_failed = 0
+        self.errors = 0
         logger.info(
-            "SemanticCacheLLMs init (threshold=%s, ttl=%s)",
+            "SemanticCacheLLMs init (backend=%s, threshold=%s, ttl=%s)",
+            self._cache.name,
             distance_threshold,
             ttl,
         )
 
+    async def _semantic_lookup(
+        self, prompt: str, namespace: str
+    ) -> Optional[SemanticHit]:
+        if not prompt:
+            return None
+        try:
+            vector = await self._embeddings.aembed_query(prompt)
+            # Lấy entry gần nhất không áp ngưỡng để ghi nhận distance near-miss
+            return await self._cache.nearest(vector, namespace)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Semantic cache lookup failed [%s]: %s", namespace, e)
+            return None
+
+    async def alookup(self, prompt: str, namespace: str) -> Optional[str]:
+        """Cached text gần nhất trong ngưỡng; Redis lỗi -> coi như miss."""
+        hit = await self._semantic_lookup(prompt, namespace)
+        if hit is None or hit.distance > self.distance_threshold:
+            return None
+        return hit.response
+
+    def enqueue_update(self, prompt: str, namespace: str, text: str):
+        """Đưa entry vào write-behind queue, trả về ngay."""
+        if prompt:
+            self._writer.submit((prompt, namespace, text))
+
+    async def _write_entries(self, entries: list[tuple[str, str, str]]):
+        # Embed cả batch một lần (thường trúng memo vì lookup vừa embed xong)
+        vectors = await self._embeddings.aembed_documents([p for p, _, _ in entries])
+        await self._cache.update_many(
+            [
+                (prompt, vector, namespace, text)
+                for (prompt, namespace, text), vector in zip(entries, vectors)
+            ]
+        )
+
+    async def _write_exact_entries(self, entries: list[tuple[str, str]]):
+        await self._cache.set_exact_many(entries, SETTINGS.CACHE_TTL)
+
+    async def _exact_lookup(self, key: str) -> Optional[tuple[str, Optional[float]]]:
+        """(text, số giây còn lại) của key exact, hoặc None."""
+        try:
+            return await self._cache.get_exact(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Exact cache lookup failed: %s", e)
+            return None
+
+    @staticmethod
+    def _l1_key(key: str, namespace: str, exact: bool) -> str:
+        if exact:
+            return key  # Đã là hash
+        normalized = normalize_text(key).casefold()
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def _l1_set(self, l1_key: str, text: str, ttl: Optional[float]):
+        # Không giữ lâu hơn bản trên Redis; entry đã/sắp hết hạn thì bỏ qua
+        if self._l1 is not None and (ttl is None or ttl > 0):
+            self._l1.set(l1_key, text, ttl=ttl)
+
+    async def _lookup(self, key: str, namespace: str, exact: bool) -> Optional[str]:
+        """L1 (process) -> L2 (Redis exact GET hoặc vector search)."""
+        if not key or _revalidating.get():
+            return None
+        l1_key = self._l1_key(key, namespace, exact)
+        if self._l1 is not None:
+            text = self._l1.get(l1_key)
+            if text is not None:
+                self.metrics.record_l1_hit(namespace)
+                return text
+
+        if exact:
+            hit = await self._exact_lookup(key)
+            self.metrics.record_lookup(namespace, None, hit is not None)
+        else:
+            nearest = await self._semantic_lookup(key, namespace)
+            hit = None
+            if nearest is not None and nearest.distance <= self.distance_threshold:
+                hit = (nearest.response, nearest.ttl_left)
+            self.metrics.record_lookup(
+                namespace,
+                key,
+                hit is not None,
+                distance=nearest.distance if nearest is not None else None,
+                threshold=self.distance_threshold,
+            )
+        if hit is None:
+            return None
+
+        text, ttl_left = hit
+        self._l1_set(l1_key, text, ttl_left)
+        return text
+
+    def _store(self, key: str, namespace: str, text: str, exact: bool):
+        if not key:
+            return
+        if exact:
+            self._exact_writer.submit((key, text))
+            self._l1_set(self._l1_key(key, namespace, exact), text, SETTINGS.CACHE_TTL)
+        else:
+            self.enqueue_update(key, namespace, text)
+            self._l1_set(
+                self._l1_key(key, namespace, exact), text, self._cache.ttl or None
+            )
+
+    async def close(self):
+        """Flush các entry đang chờ ghi (gọi khi shutdown)."""
+        for task in list(self._revalidations.values()):
+            task.cancel()
+        await self._writer.close()
+        await self._exact_writer.close()
+        await self.metrics.close()
+        await self._cache.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self._cache.stats(),
+            "distance_threshold": self.distance_threshold,
+            "revalidation": {
+                "stale_hits": self.stale_hits,
+                "in_flight": len(self._revalidations),
+                "completed": self.revalidated,
+                "failed": self.revalidate_failed,
+            },
+            "namespaces": self.metrics.stats(),
+            "l1": self._l1.stats() if self._l1 is not None else None,
+            "single_flight": (
+                self._flights.stats() if self._flights is not None else None
+            ),
+            "version": cache_version.components(),
+            "errors": self.errors,
+            "writer": self._writer.stats(),
+            "exact_writer": self._exact_writer.stats(),
+        }
+
+    @staticmethod
+    def _scoped_namespace(namespace: str) -> str:
+        """
+        Namespace kèm dataset + version (build collection, prompt, model): câu hỏi
+        giống nhau ở hai dataset không lẫn cache, và re-ingest / đổi prompt /
+        đổi model làm mọi entry cũ (Redis lẫn L1) ngừng được match.
+        """
+        return f"{namespace}:{cache_version.current()}"
+
+    @staticmethod
+    def _get_exact_key(namespace: str, args: tuple, kwargs: dict) -> str:
+        """
+        Key exact cho post-cache: hash của (câu hỏi đã chuẩn hoá, chunk ID theo
+        thứ tự, version của prompt RAG, model). Không cần embed context.
+        """
+        service = args[0] if args else None
+        prompt = getattr(service, "prompt_rag", None)
+        raw = json.dumps(
+            {
+                "question": normalize_text(kwargs.get("question") or "").lower(),
+                "chunk_ids": retrieved_chunk_ids(kwargs.get("messages") or []),
+                "prompt_version": getattr(prompt, "version", None),
+                "model": SETTINGS.LITELLM_MODEL,
+            },
+            ensure_ascii=False,
+        )
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return f"exactcache:{SETTINGS.ENVIRONMENT}:{namespace}:{digest}"
+
     def _get_context_str(self, **kwargs: Any) -> Optional[str]:
         """Extracts context string from keyword arguments."""
         question = kwargs.get("question")
@@ -43,88 +353,287 @@ class SemanticCacheLLMs:
             return build_context(messages)
         return question  # pre-cache
 
-    async def _handle_sse_cache_hit(self, hit: Generation):
-        """Handles an SSE cache hit by streaming the cached response."""
+    @staticmethod
+    def _parse_hit(hit: Optional[str]) -> Optional[dict]:
+        """Entry đã cache -> dict; entry hỏng coi như miss."""
+        if hit is None:
+            return None
         try:
-            cached_data = json.loads(hit.text)
-            response_to_yield = cached_data.get("response", "")
-            if response_to_yield and isinstance(response_to_yield, str):
-                words = response_to_yield.split(" ")
-                for i, word in enumerate(words):
-                    chunk = word + (" " if i < len(words) - 1 else "")
-                    yield f"{json.dumps(chunk)}\n\n"
+            cached_data = json.loads(hit)
+        except json.JSONDecodeError:
+            logger.warning("Dropping unreadable cache entry")
+            return None
+        return cached_data if isinstance(cached_data, dict) else None
+
+    def _soft_expiry(self, exact: bool) -> Optional[float]:
+        """Mốc soft expiry (time.time()) cho entry mới; hard expiry là TTL của store."""
+        if not SETTINGS.CACHE_SWR_ENABLED:
+            return None
+        hard_ttl = SETTINGS.CACHE_TTL if exact else self._cache.ttl
+        soft_ttl = (
+            min(SETTINGS.CACHE_SOFT_TTL, hard_ttl)
+            if hard_ttl
+            else SETTINGS.CACHE_SOFT_TTL
+        )
+        return time.time() + soft_ttl
+
+    @staticmethod
+    def _is_stale(cached_data: dict) -> bool:
+        soft_expires_at = cached_data.get("soft_expires_at")
+        return soft_expires_at is not None and time.time() >= soft_expires_at
+
+    async def _run_once(self, flight_key: Optional[str], call):
+        if self._flights is not None and flight_key:
+            return await self._flights.do(flight_key, call)
+        return await call()
+
+    async def _stream_once(self, flight_key: Optional[str], stream):
+        source = (
+            self._flights.stream(flight_key, stream)
+            if self._flights is not None and flight_key
+            else stream()
+        )
+        async for chunk in source:
+            yield chunk
+
+    @staticmethod
+    def _revalidation_call(execute, func, namespace, key, exact, args, kwargs):
+        """Call của request gốc, thay session/user bằng REVALIDATION_ATTRIBUTION."""
+        signature = inspect.signature(func)
+        bound = signature.bind_partial(*args, **kwargs)
+        for name, value in REVALIDATION_ATTRIBUTION.items():
+            if name in signature.parameters:
+                bound.arguments[name] = value
+        return partial(
+            execute, func, namespace, key, exact, *bound.args, **bound.kwargs
+        )
+
+    def _revalidate(self, flight_key: Optional[str], fn, streaming: bool):
+        """
+        Chạy lại generate một lần ở background để làm mới entry đã stale. Đi qua
+        single-flight nên miss đồng thời cùng key chờ chung lần chạy này.
+
+        Task chạy trong context rỗng (không kế thừa trace Langfuse, memo
+        embedding... của request kích hoạt), chỉ mang theo dataset.
+        """
+        self.stale_hits += 1
+        if not flight_key or flight_key in self._revalidations:
+            return
+        dataset = current_dataset.get()
+
+        async def run():
+            current_dataset.set(dataset)
+            _revalidating.set(True)
+            if streaming:
+                async for _ in self._stream_once(flight_key, fn):
+                    pass
+            else:
+                await self._run_once(flight_key, fn)
+
+        def done(task: asyncio.Task):
+            self._revalidations.pop(flight_key, None)
+            if task.cancelled():
                 return
-        except (json.JSONDecodeError, KeyError):
-            yield f'{json.dumps("Error loading from cache")}\n\n'
+            if task.exception() is not None:
+                self.revalidate_failed += 1
+                logger.warning("Revalidation failed: %s", task.exception())
+            else:
+                self.revalidated += 1
+
+        task = Context().run(asyncio.create_task, run())
+        self._revalidations[flight_key] = task
+        task.add_done_callback(done)
+
+    @staticmethod
+    def _is_replayable(text: Any) -> bool:
+        """Chỉ cache / phát lại câu trả lời có nội dung và không bị guardrails chặn."""
+        return (
+            isinstance(text, str)
+            and bool(text.strip())
+            and not (is_blocked_response(text))
+        )
+
+    async def _handle_sse_cache_hit(self, cached_data: dict):
+        """
+        Phát lại câu trả lời SSE đã cache theo SSE_CACHE_REPLAY_MODE:
+        "single" (một frame), "coalesced" (gộp chunk gốc tới ~N bytes/frame),
+        "paced" (đúng ranh giới chunk gốc, giãn cách như lúc stream thật).
+        Frame chỉ được bọc json.dumps nếu stream gốc cũng đã bọc.
+        """
+        text = cached_data.get("response", "")
+        if not text or not isinstance(text, str):
+            return
+
+        framed = cached_data.get("framed", True)
+        offsets = cached_data.get("offsets") or [len(text)]
+        if offsets[-1] != len(text):
+            offsets = [len(text)]  # Entry cũ / hỏng: phát cả đoạn
+        pieces = [text[start:end] for start, end in zip([0] + offsets[:-1], offsets)]
+
+        def emit(piece: str) -> str:
+            return f"{json.dumps(piece)}\n\n" if framed else piece
+
+        mode = SETTINGS.SSE_CACHE_REPLAY_MODE
+        if mode == "single" or len(pieces) == 1:
+            yield emit(text)
+        elif mode == "paced":
+            gaps = cached_data.get("gaps_ms") or []
+            max_gap = SETTINGS.SSE_CACHE_REPLAY_MAX_GAP_MS
+            for i, piece in enumerate(pieces):
+                gap = min(gaps[i], max_gap) if 0 < i < len(gaps) else 0
+                if gap > 0:
+                    await asyncio.sleep(gap / 1000)
+                yield emit(piece)
+        else:  # coalesced
+            frame_bytes = SETTINGS.SSE_CACHE_REPLAY_FRAME_BYTES
+            buffer, size = [], 0
+            for piece in pieces:
+                buffer.append(piece)
+                size += len(piece.encode("utf-8"))
+                if size >= frame_bytes:
+                    yield emit("".join(buffer))
+                    buffer, size = [], 0
+            if buffer:
+                yield emit("".join(buffer))
 
     async def _execute_and_cache_sse(
-        self, func, namespace: str, context_str: str, *args, **kwargs
+        self, func, namespace: str, context_str: str, exact: bool, *args, **kwargs
     ):
         """Executes the function for an SSE cache miss and caches the result."""
-        full_response = ""
+        # Giữ ranh giới chunk (end offset) và khoảng cách giữa các chunk (ms)
+        raw_chunks, texts, gaps_ms = [], [], []
+        framed = True
+        started = last = time.monotonic()
         async for chunk in func(*args, **kwargs):
-            clean_chunk = chunk.replace("\n\n", "")
-            try:
-                # Try to decode JSON if it looks like JSON (starts and ends with quotes)
-                if clean_chunk.strip().startswith('"') and clean_chunk.strip().endswith(
-                    '"'
-                ):
-                    decoded_chunk = json.loads(clean_chunk)
-                    full_response += decoded_chunk
-                else:
-                    full_response += clean_chunk
-            except json.JSONDecodeError:
-                full_response += clean_chunk  # Append as is if not valid JSON
+            now = time.monotonic()
+            gaps_ms.append(round((now - last) * 1000))
+            last = now
+            text, is_frame = decode_sse_frame(chunk)
+            framed = framed and is_frame
+            raw_chunks.append(str(chunk))
+            texts.append(text)
             yield chunk
 
+        self.metrics.record_miss_latency(namespace, (time.monotonic() - started) * 1000)
+        if not self._is_replayable("".join(texts)):
+            # Stream rỗng hoặc bị chặn: cache lại sẽ phát lỗi đó cho mọi câu hỏi giống
+            logger.info("SSE response not cached [%s]: empty or blocked", namespace)
+            return
+        pieces = texts if framed else raw_chunks
+        offsets, end = [], 0
+        for piece in pieces:
+            end += len(piece)
+            offsets.append(end)
         cache_data = {
             "type": "sse_response",
-            "response": full_response.strip(),
+            "response": "".join(pieces),
+            "framed": framed,
+            "offsets": offsets,
+            "gaps_ms": gaps_ms,
+            "soft_expires_at": self._soft_expiry(exact),
         }
-        self._cache.update(
-            context_str,
+        self._store(context_str, namespace, json.dumps(cache_data), exact)
+        logger.info(
+            "SSE Cache-miss [%s]: %s",
             namespace,
-            [Generation(text=json.dumps(cache_data))],
+            self.metrics.describe(namespace, context_str),
         )
-        logger.info("SSE Cache-miss [%s]: %s", namespace, context_str)
 
-    def _handle_rest_cache_hit(self, hit: Generation) -> Any:
+    def _handle_rest_cache_hit(self, cached_data: dict) -> Any:
         """Handles a REST API cache hit."""
-        cached_data = json.loads(hit.text)
-        return cached_data["response"]
+        return cached_data.get("response")
 
     async def _execute_and_cache_rest(
-        self, func, namespace: str, context_str: str, *args, **kwargs
+        self, func, namespace: str, context_str: str, exact: bool, *args, **kwargs
     ):
         """Executes the function for a REST API cache miss and caches the result."""
+        started = time.monotonic()
         result = await func(*args, **kwargs)
-        cache_data = {"type": "rest_response", "response": result}
-        self._cache.update(
-            context_str,
+        self.metrics.record_miss_latency(namespace, (time.monotonic() - started) * 1000)
+        cache_data = {
+            "type": "rest_response",
+            "response": result,
+            "soft_expires_at": self._soft_expiry(exact),
+        }
+        self._store(context_str, namespace, json.dumps(cache_data), exact)
+        logger.debug(
+            "Cache-miss → queued [%s]: %s",
             namespace,
-            [Generation(text=json.dumps(cache_data))],
+            self.metrics.describe(namespace, context_str),
         )
-        logger.debug("Cache-miss → stored [%s]: %s", namespace, context_str)
         return result
 
-    def cache(self, *, namespace: str):
+    def cache(self, *, namespace: str, mode: str = "semantic"):
+        """
+        mode="semantic": key là câu hỏi / context, lookup theo vector.
+        mode="exact": key là hash (xem _get_exact_key), lookup GET, không embed.
+        """
+        if mode not in ("semantic", "exact"):
+            # Gõ sai POST_CACHE_MODE không được âm thầm thành semantic
+            raise ValueError(f"Unknown cache mode '{mode}' (semantic | exact)")
+        base_namespace = namespace
+        exact = mode == "exact"
+
+        def cache_key(namespace: str, args: tuple, kwargs: dict) -> Optional[str]:
+            if exact:
+                return self._get_exact_key(namespace, args, kwargs)
+            return self._get_context_str(**kwargs)
+
         def inner(func):
             if inspect.isasyncgenfunction(func):
 
                 @wraps(func)
                 async def sse_wrapper(*args, **kwargs):
-                    context_str = self._get_context_str(**kwargs)
+                    namespace = self._scoped_namespace(base_namespace)
+                    context_str = cache_key(namespace, args, kwargs)
 
-                    hits: List[Generation] = self._cache.lookup(context_str, namespace)
+                    flight_key = (
+                        self._l1_key(context_str, namespace, exact)
+                        if context_str
+                        else None
+                    )
+                    stream = partial(
+                        self._execute_and_cache_sse,
+                        func,
+                        namespace,
+                        context_str,
+                        exact,
+                        *args,
+                        **kwargs,
+                    )
 
-                    if hits:
-                        logger.info("SSE Cache-hit [%s]: %s", namespace, context_str)
-                        async for chunk in self._handle_sse_cache_hit(hits[0]):
+                    cached = self._parse_hit(
+                        await self._lookup(context_str, namespace, exact)
+                    )
+                    if cached is not None and not self._is_replayable(
+                        cached.get("response")
+                    ):
+                        cached = None  # Entry ghi trước khi có kiểm tra: coi như miss
+
+                    if cached is not None:
+                        logger.info(
+                            "SSE Cache-hit [%s]: %s",
+                            namespace,
+                            self.metrics.describe(namespace, context_str),
+                        )
+                        if self._is_stale(cached):
+                            self._revalidate(
+                                flight_key,
+                                self._revalidation_call(
+                                    self._execute_and_cache_sse,
+                                    func,
+                                    namespace,
+                                    context_str,
+                                    exact,
+                                    args,
+                                    kwargs,
+                                ),
+                                streaming=True,
+                            )
+                        async for chunk in self._handle_sse_cache_hit(cached):
                             yield chunk
                     else:
-                        async for chunk in self._execute_and_cache_sse(
-                            func, namespace, context_str, *args, **kwargs
-                        ):
+                        async for chunk in self._stream_once(flight_key, stream):
                             yield chunk
 
                 return sse_wrapper
@@ -132,21 +641,54 @@ class SemanticCacheLLMs:
 
                 @wraps(func)
                 async def rest_wrapper(*args, **kwargs):
-                    context_str = self._get_context_str(**kwargs)
+                    namespace = self._scoped_namespace(base_namespace)
+                    context_str = cache_key(namespace, args, kwargs)
 
-                    hits: List[Generation] = self._cache.lookup(context_str, namespace)
+                    flight_key = (
+                        self._l1_key(context_str, namespace, exact)
+                        if context_str
+                        else None
+                    )
+                    call = partial(
+                        self._execute_and_cache_rest,
+                        func,
+                        namespace,
+                        context_str,
+                        exact,
+                        *args,
+                        **kwargs,
+                    )
 
-                    if hits:
-                        logger.info("REST Cache-hit [%s]: %s", namespace, context_str)
-                        return self._handle_rest_cache_hit(hits[0])
-                    else:
-                        return await self._execute_and_cache_rest(
-                            func, namespace, context_str, *args, **kwargs
+                    cached = self._parse_hit(
+                        await self._lookup(context_str, namespace, exact)
+                    )
+
+                    if cached is not None:
+                        logger.info(
+                            "REST Cache-hit [%s]: %s",
+                            namespace,
+                            self.metrics.describe(namespace, context_str),
                         )
+                        if self._is_stale(cached):
+                            self._revalidate(
+                                flight_key,
+                                self._revalidation_call(
+                                    self._execute_and_cache_rest,
+                                    func,
+                                    namespace,
+                                    context_str,
+                                    exact,
+                                    args,
+                                    kwargs,
+                                ),
+                                streaming=False,
+                            )
+                        return self._handle_rest_cache_hit(cached)
+                    return await self._run_once(flight_key, call)
 
                 return rest_wrapper
 
         return inner
 
 
-semantic_cache_llms = SemanticCacheLLMs()
+semantic_cache_llms = SemanticCacheLLMs(ttl=SETTINGS.CACHE_TTL)
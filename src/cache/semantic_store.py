@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticHit(NamedTuple):
+    response: str
+    distance: float
+    ttl_left: Optional[float]  # Giây còn lại của entry, None = không hết hạn
+
+
+class SemanticStore(ABC):
+    """
+    Backend của SemanticCacheLLMs: vector search theo namespace cho semantic
+    cache và GET/SET theo key cho exact cache. Distance là cosine distance
+    (1 - cosine similarity) ở mọi backend để dùng chung một ngưỡng.
+    """
+
+    name = "base"
+
+    def __init__(self, *, distance_threshold: float = 0.2, ttl: int = 20):
+        self.distance_threshold = distance_threshold
+        self.ttl = ttl
+
+    @abstractmethod
+    async def nearest(
+        self, vector: List[float], namespace: str
+    ) -> Optional[SemanticHit]:
+        """Entry gần nhất trong namespace, không áp ngưỡng (dùng cho metrics)."""
+
+    async def lookup(
+        self, vector: List[float], namespace: str
+    ) -> Optional[SemanticHit]:
+        """Entry gần nhất trong ngưỡng, hoặc None."""
+        hit = await self.nearest(vector, namespace)
+        if hit is None or hit.distance > self.distance_threshold:
+            return None
+        return hit
+
+    async def update(
+        self, prompt: str, vector: List[float], namespace: str, response: str
+    ):
+        await self.update_many([(prompt, vector, namespace, response)])
+
+    @abstractmethod
+    async def update_many(self, entries: List[tuple[str, List[float], str, str]]):
+        """Ghi nhiều entry (prompt, vector, namespace, response)."""
+
+    @abstractmethod
+    async def get_exact(self, key: str) -> Optional[tuple[str, Optional[float]]]:
+        """(text, số giây còn lại) của key exact, hoặc None."""
+
+    @abstractmethod
+    async def set_exact_many(self, entries: List[tuple[str, str]], ttl: int):
+        """Ghi nhiều cặp (key, text) với TTL."""
+
+    @abstractmethod
+    async def clear(self):
+        """Xoá toàn bộ entry."""
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class FallbackSemanticStore(SemanticStore):
+    """
+    Redis làm tầng chính, store local làm dự phòng. Ghi vào cả hai; Redis lỗi
+    (mất kết nối, timeout) thì đọc từ local và tạm bỏ qua Redis trong
+    ``retry_after`` giây để request không phải chờ timeout mỗi lần.
+
+    Chỉ lỗi kết nối / timeout mới chuyển sang local: lỗi lệnh (ResponseError,
+    vd: thiếu module RediSearch, sai schema index) là lỗi cấu hình, phải
+    raise ra thay vì bị che bởi store dự phòng.
+    """
+
+    name = "fallback"
+    unavailable_errors = (RedisConnectionError, RedisTimeoutError, asyncio.TimeoutError)
+
+    def __init__(
+        self,
+        primary: SemanticStore,
+        fallback: SemanticStore,
+        retry_after: float = 5.0,
+    ):
+        super().__init__(distance_threshold=primary.distance_threshold, ttl=primary.ttl)
+        self.primary = primary
+        self.fallback = fallback
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self.fallbacks = 0
+
+    @property
+    def primary_available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _mark_down(self, error: BaseException):
+        if self.primary_available:
+            logger.warning(
+                "%s unavailable, using %s for %.0fs: %s",
+                self.primary.name,
+                self.fallback.name,
+                self.retry_after,
+                error,
+            )
+        self._down_until = time.monotonic() + self.retry_after
+
+    async def _read(self, method: str, *args):
+        if self.primary_available:
+            try:
+                return await getattr(self.primary, method)(*args)
+            except self.unavailable_errors as e:
+                self._mark_down(e)
+        self.fallbacks += 1
+        return await getattr(self.fallback, method)(*args)
+
+    async def _write(self, method: str, *args):
+        await getattr(self.fallback, method)(*args)
+        if self.primary_available:
+            try:
+                await getattr(self.primary, method)(*args)
+            except self.unavailable_errors as e:
+                self._mark_down(e)
+
+    async def nearest(
+        self, vector: List[float], namespace: str
+    ) -> Optional[SemanticHit]:
+        return await self._read("nearest", vector, namespace)
+
+    async def update_many(self, entries: List[tuple[str, List[float], str, str]]):
+        await self._write("update_many", entries)
+
+    async def get_exact(self, key: str) -> Optional[tuple[str, Optional[float]]]:
+        return await self._read("get_exact", key)
+
+    async def set_exact_many(self, entries: List[tuple[str, str]], ttl: int):
+        await self._write("set_exact_many", entries, ttl)
+
+    async def clear(self):
+        await self._write("clear")
+
+    async def close(self):
+        await self.fallback.close()
+        await self.primary.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "primary_available": self.primary_available,
+            "fallbacks": self.fallbacks,
+            "primary": self.primary.stats(),
+            "fallback": self.fallback.stats(),
+        }
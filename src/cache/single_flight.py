@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List
+
+logger = logging.getLogger(__name__)
+
+
+class StreamFanOut:
+    """
+    Chạy một async generator duy nhất và phát lại cho nhiều subscriber.
+
+    Chunk được giữ trong buffer nên subscriber vào muộn nhận lại từ đầu rồi
+    đi tiếp theo stream. Khi không còn subscriber nào (client ngắt hết) thì
+    generator bị huỷ như trước đây.
+    """
+
+    def __init__(self, source: AsyncIterator[Any]):
+        self._source = source
+        self.buffer: List[Any] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.cancel_requested = False
+        self._changed = asyncio.Condition()
+        self.task = asyncio.create_task(self._pump())
+
+    @property
+    def joinable(self) -> bool:
+        """
+        Còn nhận subscriber mới: chưa xong và chưa bị huỷ. Task bị huỷ chưa chắc
+        đã dừng ngay; subscriber vào lúc đó sẽ nhận CancelledError của người khác.
+        """
+        cancelling = getattr(self.task, "cancelling", None)  # Python >= 3.11
+        return not (
+            self.done
+            or self.cancel_requested
+            or self.task.cancelled()
+            or (cancelling is not None and cancelling())
+        )
+
+    async def _pump(self):
+        try:
+            async for chunk in self._source:
+                async with self._changed:
+                    self.buffer.append(chunk)
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(self.buffer):
+                    yield self.buffer[index]
+                    index += 1
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                async with self._changed:
+                    if index >= len(self.buffer) and not self.done:
+                        await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.cancel_requested = True
+                self.task.cancel()
+
+
+class SingleFlight:
+    """
+    Gộp các lời gọi trùng key đang chạy đồng thời: lời gọi đầu tiên thực thi,
+    các lời gọi sau chờ cùng kết quả (coroutine) hoặc nghe cùng stream (SSE).
+    Key được bỏ khỏi bảng ngay khi xong, request sau đó đi qua cache như thường.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, StreamFanOut] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            # Task riêng để caller đầu bị huỷ không kéo theo các caller đang chờ
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+            logger.debug("Coalesced in-flight call %s", key)
+        return await asyncio.shield(task)
+
+    async def stream(
+        self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        fan_out = self._streams.get(key)
+        if fan_out is None or not fan_out.joinable:
+            self.leaders += 1
+            fan_out = StreamFanOut(fn())
+            self._streams[key] = fan_out
+
+            def release(_, fan_out=fan_out):
+                if self._streams.get(key) is fan_out:
+                    del self._streams[key]
+
+            fan_out.task.add_done_callback(release)
+        else:
+            self.coalesced += 1
+            logger.debug("Joined in-flight stream %s", key)
+        subscription = fan_out.subscribe()
+        try:
+            async for chunk in subscription:
+                yield chunk
+        finally:
+            # Đóng ngay (không chờ GC) để stream được huỷ khi client cuối rời đi
+            await subscription.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
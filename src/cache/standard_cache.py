@@ -8,6 +8,7 @@ from uuid import UUID
 import redis
 from nemoguardrails import LLMRails
 
+from src.cache.versioning import cache_version
 from src.config.settings import SETTINGS
 
 
@@ -53,8 +54,9 @@ class StandardCache:
         # Tạo cache key
         dumped_args = self.serialize(args_to_serialize)
         dumped_kwargs = self.serialize(kwargs_to_serialize)
+        # Version (dataset, build collection, prompt, model) nằm trong key
         key = (
-            f"mlops:{environment}:{module_name}:"
+            f"mlops:{environment}:{cache_version.current()}:{module_name}:"
             + f"{func_name}:{dumped_args}:{dumped_kwargs}"
         )
         logging.info(f"Cached key: {key}")
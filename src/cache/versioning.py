@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from src.config.settings import SETTINGS
+from src.utils.request_context import current_dataset
+
+logger = logging.getLogger(__name__)
+
+UNVERSIONED = "unversioned"
+
+
+def build_stamp_path(persist_directory: str, collection_name: str) -> str:
+    """Cùng đường dẫn với ingest_data/plugins/jobs/collection_version.py."""
+    return os.path.join(persist_directory, "versions", f"{collection_name}.json")
+
+
+# path -> ((inode, mtime_ns, size), build_id): chỉ đọc lại khi ingest ghi file mới
+_build_ids: Dict[str, tuple[tuple[int, int, int], Optional[str]]] = {}
+
+
+def read_build_id(persist_directory: str, collection_name: str) -> Optional[str]:
+    """
+    Build ID ingest ghi cho collection. Được gọi từ event loop nên chỉ ``stat``
+    file; nội dung chỉ đọc lại khi inode / mtime / size đổi.
+    """
+    path = build_stamp_path(persist_directory, collection_name)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        _build_ids.pop(path, None)
+        return None
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _build_ids.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            build_id = json.load(f)["build_id"]
+    except (OSError, ValueError, KeyError, TypeError):
+        build_id = None
+    _build_ids[path] = (signature, build_id)
+    return build_id
+
+
+class CacheVersion:
+    """
+    Version của cache = (dataset, build ID của collection, version prompt RAG
+    mà generator đang dùng, model). Version nằm trong namespace/key nên khi một
+    thành phần đổi (re-ingest, generator nạp prompt mới, đổi model) toàn bộ
+    entry cũ tự động không còn được match, không cần xoá từng key; chúng hết
+    hạn theo TTL.
+
+    Build ID được kiểm tra lại (một lần stat) mỗi CACHE_VERSION_REFRESH_SECONDS.
+    Prompt version lấy từ chính object prompt generator đã nạp
+    (``register_prompt``), không hỏi Langfuse: publish prompt mới không đổi
+    namespace khi generator còn dùng prompt cũ.
+    """
+
+    def __init__(self, refresh_seconds: Optional[float] = None):
+        self.refresh_seconds = (
+            SETTINGS.CACHE_VERSION_REFRESH_SECONDS
+            if refresh_seconds is None
+            else refresh_seconds
+        )
+        self._builds: Dict[str, tuple[float, str]] = {}
+        self._prompts: Dict[str, str] = {}  # owner -> version prompt đang dùng
+
+    def collection_build(self, dataset: str) -> str:
+        now = time.monotonic()
+        cached = self._builds.get(dataset)
+        if cached is not None and now - cached[0] < self.refresh_seconds:
+            return cached[1]
+        build_id = (
+            read_build_id(
+                SETTINGS.CHROMA_PERSIST_DIR, SETTINGS.collection_name(dataset)
+            )
+            or UNVERSIONED
+        )
+        if cached is not None and cached[1] != build_id:
+            logger.info(
+                "Collection build for %s changed %s -> %s", dataset, cached[1], build_id
+            )
+        self._builds[dataset] = (now, build_id)
+        return build_id
+
+    def register_prompt(self, owner: str, prompt: Any):
+        """Generator ``owner`` sinh câu trả lời bằng ``prompt`` (gọi mỗi khi nạp prompt)."""
+        version = str(getattr(prompt, "version", None) or UNVERSIONED)
+        previous = self._prompts.get(owner)
+        if previous is not None and previous != version:
+            logger.info("Prompt for %s changed v%s -> v%s", owner, previous, version)
+        self._prompts[owner] = version
+
+    def prompt_version(self) -> str:
+        # Các generator có thể nạp prompt ở thời điểm khác nhau: gộp mọi version
+        return ",".join(sorted(set(self._prompts.values()))) or UNVERSIONED
+
+    def components(self, dataset: Optional[str] = None) -> Dict[str, Any]:
+        dataset = dataset or current_dataset.get()
+        return {
+            "dataset": dataset,
+            "collection_build": self.collection_build(dataset),
+            "prompt_version": self.prompt_version(),
+            "model": SETTINGS.LITELLM_MODEL,
+        }
+
+    def current(self, dataset: Optional[str] = None) -> str:
+        """``{dataset}:v{digest}`` cho request hiện tại."""
+        parts = self.components(dataset)
+        raw = json.dumps(parts, sort_keys=True)
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+        return f"{parts['dataset']}:v{digest}"
+
+
+cache_version = CacheVersion()
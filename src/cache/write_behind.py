@@ -0,0 +1,145 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WriteBehindQueue(Generic[T]):
+    """Ghi cache ở background, ngoài response path.
+
+    ``submit(item)`` không bao giờ chờ: item vào hàng đợi có giới hạn, đầy thì
+    bị bỏ (đếm vào ``dropped``). Worker gom tối đa ``batch_size`` item (hoặc
+    đợi ``flush_interval_ms``) rồi gọi ``write_batch`` một lần; lỗi thuộc
+    ``retry_on`` được thử lại với backoff, hết lượt thì batch bị bỏ.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[T]], Awaitable[None]],
+        *,
+        max_size: int = 1000,
+        batch_size: int = 32,
+        flush_interval_ms: float = 50.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.2,
+        retry_on: tuple[type[BaseException], ...] = (Exception,),
+        name: str = "cache-writer",
+    ):
+        self._write_batch = write_batch
+        self.max_size = max_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval_ms) / 1000
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_on = retry_on
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Dùng từ event loop khác (vd: test) -> tạo lại queue/worker
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            # Worker sống lâu hơn request tạo ra nó: chạy trong context rỗng để
+            # không giữ ContextVar của request (vd: memo embedding theo request)
+            self._worker = contextvars.Context().run(
+                loop.create_task, self._run(), name=self.name
+            )
+
+    def submit(self, item: T) -> bool:
+        """Đưa item vào hàng đợi; trả False nếu bị bỏ vì hàng đợi đầy."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.debug("%s queue full, dropping entry", self.name)
+            return False
+        return True
+
+    async def _next_batch(self) -> List[T]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write_with_retry(self, batch: List[T]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._write_batch(batch)
+                self.written += len(batch)
+                return
+            except self.retry_on as e:
+                if attempt == self.max_retries:
+                    self.failed += len(batch)
+                    logger.warning(
+                        "%s dropped batch of %d after %d retries: %s",
+                        self.name,
+                        len(batch),
+                        self.max_retries,
+                        e,
+                    )
+                    return
+                self.retries += 1
+                await asyncio.sleep(self.retry_backoff * 2**attempt)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning("%s failed to write batch: %s", self.name, e)
+                return
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write_with_retry(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def flush(self, timeout: float = 5.0):
+        """Chờ ghi hết các item đang chờ (dùng khi shutdown)."""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "%s flush timed out with %d entries pending",
+                self.name,
+                self._queue.qsize(),
+            )
+
+    async def close(self, timeout: float = 5.0):
+        await self.flush(timeout)
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
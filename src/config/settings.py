@@ -36,11 +36,96 @@ class Settings(BaseSettings):
     CHROMA_PERSIST_DIR: str = str(
         PROJECT_ROOT / "infrastructure" / "storage" / "chromadb"
     )
+    # Multi-dataset: request chọn dataset, collection đã mở giữ trong pool LRU
+    AVAILABLE_DATASETS: list[str] = ["environment_battery", "llm_papers"]
+    # Giới hạn số snapshot / BM25 index giữ trong RAM; segment HNSW của Chroma nằm
+    # trong client dùng chung và do LRU của Chroma quản lý
+    MAX_OPEN_COLLECTIONS: int = 4
+    RETRIEVAL_EXECUTOR_WORKERS: int = 4  # Số Chroma query chạy song song tối đa
+    # Retrieval cache: exact-match theo (query, top_k, with_score, filter, version)
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_MAX_SIZE: int = 2048
+    RETRIEVAL_CACHE_TTL: int = 3600
+    RETRIEVAL_CACHE_REDIS: bool = False  # Bật tầng Redis dùng chung giữa các worker
+    RETRIEVAL_VERSION_REFRESH_SECONDS: int = 30
+    # Hybrid search: BM25 (index build lúc ingest) + vector, gộp bằng RRF
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 20  # Số ứng viên mỗi nhánh trước khi fuse
+    RRF_K: int = 60
+    # Snapshot mmap (export bằng src.infrastructure.vector_stores.snapshot);
+    # None = query thẳng Chroma
+    VECTOR_SNAPSHOT_DIR: Optional[str] = None
+    VECTOR_SNAPSHOT_ANN_THRESHOLD: int = 50000
+    VECTOR_SNAPSHOT_EF_SEARCH: int = 100
+    TOOL_MAX_CONCURRENCY: int = 4  # Số tool call song song tối đa mỗi request
+    TOOL_CALL_TIMEOUT: float = 15.0  # Timeout (giây) cho mỗi tool call
+    # Context packing: dedup + sắp theo score + giới hạn token trước RAG prompt
+    CONTEXT_PACKING_ENABLED: bool = True
+    CONTEXT_MAX_TOKENS: int = 2048  # Đếm bằng tokenizer của embedding model
+    CONTEXT_NEAR_DUP_THRESHOLD: float = 0.85  # Jaccard trên word 3-gram
+
+    # Embedding Configuration
+    EMBEDDING_MODEL_NAME: str = (
+        "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+    )
+    EMBEDDING_BACKEND: str = "torch"  # torch | onnx | onnx-int8
+    EMBEDDING_ONNX_DIR: str = str(PROJECT_ROOT / "infrastructure" / "storage" / "onnx")
+    EMBEDDING_ONNX_THREADS: int = 0  # 0 = để ONNX Runtime tự chọn
+    EMBEDDING_ONNX_BATCH_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_SIZE: int = 32  # Số query tối đa trong một lần encode
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0  # Cửa sổ gom query đồng thời
+    EMBEDDING_EXECUTOR_WORKERS: int = 2  # Thread pool riêng cho encode (CPU-bound)
+    EMBEDDING_CACHE_MAX_SIZE: int = 4096  # Số vector tối đa trong memo toàn process
+    EMBEDDING_CACHE_TTL: int = 3600
+    # Sidecar mode: đặt socket để worker dùng chung một embedding server
+    EMBEDDING_SERVER_SOCKET: Optional[str] = None
+    EMBEDDING_SERVER_TIMEOUT: float = 30.0
+    EMBEDDING_SERVER_TORCH_THREADS: int = 0  # 0 = mặc định của torch
 
     # Performance & Caching
-    CACHE_TTL: int = 3600
+    # Key cache có version (dataset, build collection, prompt, model) nên TTL dài an toàn
+    CACHE_TTL: int = 6 * 3600
+    CACHE_VERSION_REFRESH_SECONDS: int = 30
+    # Stale-while-revalidate: quá CACHE_SOFT_TTL thì vẫn trả entry cũ và làm mới
+    # ở background; hết CACHE_TTL (hard) thì entry bị xoá như bình thường
+    CACHE_SWR_ENABLED: bool = True
+    CACHE_SOFT_TTL: int = 3600
     MAX_RESPONSE_LENGTH: int = 2048
     REDIS_URI: str = "localhost:6378"
+    REDIS_SOCKET_TIMEOUT: float = 1.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 1.0
+    REDIS_MAX_CONNECTIONS: int = 64  # Pool asyncio dùng chung trong một worker
+    REDIS_POOL_TIMEOUT: float = 1.0  # Chờ tối đa (giây) khi pool hết connection
+    # Write-behind cho semantic cache: ghi ở background, đầy queue thì bỏ entry
+    CACHE_WRITE_QUEUE_SIZE: int = 1000
+    CACHE_WRITE_BATCH_SIZE: int = 32
+    CACHE_WRITE_FLUSH_MS: float = 50.0
+    CACHE_WRITE_MAX_RETRIES: int = 3
+    # Post-cache: "exact" = hash(câu hỏi, chunk ID, prompt version, model), không
+    # embed; "semantic" = embed toàn bộ context như trước
+    POST_CACHE_MODE: str = "exact"
+    # Ngưỡng cosine distance cho hit semantic; hiệu chỉnh bằng python -m src.cache.calibrate
+    SEMANTIC_CACHE_DISTANCE_THRESHOLD: float = 0.2
+    SEMANTIC_CACHE_LOOKUP_LOG: Optional[str] = None  # File JSONL ghi mọi lookup
+    # Log chỉ ghi text (cắt ngắn) cho namespace có key là câu hỏi; namespace khác
+    # (post-cache: key là context tài liệu) chỉ ghi hash
+    SEMANTIC_CACHE_LOG_TEXT_NAMESPACES: list[str] = ["pre-cache"]
+    SEMANTIC_CACHE_LOG_MAX_CHARS: int = 300
+    # Backend: "redis" | "local" (NumPy trong process) | "redis+local" (local dự phòng)
+    SEMANTIC_CACHE_BACKEND: str = "redis"
+    SEMANTIC_CACHE_LOCAL_CAPACITY: int = 10000
+    SEMANTIC_CACHE_LOCAL_PATH: Optional[str] = None  # Lưu/nạp lại cache local
+    SEMANTIC_CACHE_RETRY_AFTER: float = 5.0  # Giây bỏ qua Redis sau khi lỗi kết nối
+    # L1 trong process trước Redis: key là câu hỏi đã chuẩn hoá, TTL theo entry Redis
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 2048
+    CACHE_L1_MAX_BYTES: int = 32 * 1024 * 1024
+    # Gộp các request trùng key cache đang chạy: chỉ một lần gọi LLM
+    SINGLE_FLIGHT_ENABLED: bool = True
+    # Phát lại SSE từ cache: "single" | "coalesced" | "paced"
+    SSE_CACHE_REPLAY_MODE: str = "coalesced"
+    SSE_CACHE_REPLAY_FRAME_BYTES: int = 4096  # Kích thước frame ở mode coalesced
+    SSE_CACHE_REPLAY_MAX_GAP_MS: int = 200  # Trần khoảng nghỉ giữa chunk ở mode paced
 
     # Langfuse Configuration
     LANGFUSE_SECRET_KEY: Optional[str] = os.getenv("LANGFUSE_SECRET_KEY")
@@ -63,6 +148,12 @@ class Settings(BaseSettings):
             "model": self.LITELLM_MODEL,
         }
 
+    def collection_name(self, dataset: str) -> str:
+        """Tên collection Chroma của một dataset (cùng quy ước với ingest)."""
+        if dataset == self.DATASET_NAME:
+            return self.CHROMA_COLLECTION_NAME
+        return f"rag-pipeline-{dataset}"
+
 
 SETTINGS = Settings()
 
@@ -0,0 +1,149 @@
+"""Embedding backends: torch fp32, ONNX Runtime fp32 và ONNX dynamic int8.
+
+Export / quantize model sang ONNX và kiểm tra độ lệch so với fp32:
+
+    python -m src.infrastructure.embeddings.backends --backend onnx-int8
+"""
+
+import argparse
+import json
+import logging
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings import onnx_model
+from src.infrastructure.embeddings.onnx_model import OnnxEncoder, model_export_dir
+
+logger = logging.getLogger(__name__)
+
+TORCH = "torch"
+ONNX = "onnx"
+ONNX_INT8 = "onnx-int8"
+BACKENDS = (TORCH, ONNX, ONNX_INT8)
+
+SAMPLE_TEXTS = [
+    "What do beetles eat?",
+    "How should lithium-ion batteries be collected and recycled?",
+    "Quy định về trách nhiệm tái chế pin của nhà sản xuất tại Việt Nam là gì?",
+    "Extended producer responsibility for portable batteries in the EU",
+    "Nguy cơ cháy nổ khi vận chuyển pin lithium",
+    "Attention is all you need",
+]
+
+
+class EmbeddingBackend(ABC):
+    """Encode list text thành ma trận float32 đã chuẩn hoá L2."""
+
+    name: str
+    dimension: int
+    tokenizer = None
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        pass
+
+
+class TorchBackend(EmbeddingBackend):
+    name = TORCH
+
+    def __init__(self, model_name: str):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.model = SentenceTransformer(model_name).to(device)
+        self.tokenizer = self.model.tokenizer
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """Chạy model đã export bằng ONNX Runtime trên CPU (xem onnx_model.py)."""
+
+    def __init__(self, model_name: str, quantized: bool = False):
+        self.name = ONNX_INT8 if quantized else ONNX
+        # Cùng encoder với ingestion (ingest_data/plugins/jobs/utils.py)
+        self.encoder = OnnxEncoder(
+            export_onnx(model_name, quantize=quantized),
+            quantized=quantized,
+            batch_size=SETTINGS.EMBEDDING_ONNX_BATCH_SIZE,
+            threads=SETTINGS.EMBEDDING_ONNX_THREADS,
+        )
+        self.tokenizer = self.encoder.tokenizer
+        self.dimension = self.encoder.dimension
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.encoder.encode(texts)
+
+
+def _export_dir(model_name: str) -> Path:
+    return model_export_dir(SETTINGS.EMBEDDING_ONNX_DIR, model_name)
+
+
+def export_onnx(model_name: str, quantize: bool = False) -> Path:
+    """Export model vào EMBEDDING_ONNX_DIR (bỏ qua nếu đã có)."""
+    return onnx_model.export_onnx(model_name, _export_dir(model_name), quantize)
+
+
+def get_backend(name: str, model_name: str) -> EmbeddingBackend:
+    if name == TORCH:
+        return TorchBackend(model_name)
+    if name in (ONNX, ONNX_INT8):
+        return OnnxBackend(model_name, quantized=name == ONNX_INT8)
+    raise ValueError(f"Unknown embedding backend: {name}. Choose from {BACKENDS}")
+
+
+def check_accuracy(
+    backend: EmbeddingBackend,
+    reference: EmbeddingBackend,
+    texts: Optional[List[str]] = None,
+) -> dict:
+    """So sánh cosine similarity giữa backend và vector fp32 tham chiếu."""
+    texts = texts or SAMPLE_TEXTS
+    cosine = np.sum(backend.encode(texts) * reference.encode(texts), axis=1)
+    return {
+        "backend": backend.name,
+        "reference": reference.name,
+        "n_texts": len(texts),
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export and validate ONNX embeddings")
+    parser.add_argument("--backend", choices=[ONNX, ONNX_INT8], default=ONNX_INT8)
+    parser.add_argument("--model", default=SETTINGS.EMBEDDING_MODEL_NAME)
+    parser.add_argument(
+        "--texts-file", help="File text (mỗi dòng một câu) dùng để so sánh"
+    )
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args(argv)
+
+    texts = None
+    if args.texts_file:
+        lines = Path(args.texts_file).read_text(encoding="utf-8").splitlines()
+        texts = [line for line in lines if line.strip()]
+
+    backend = get_backend(args.backend, args.model)
+    report = check_accuracy(backend, TorchBackend(args.model), texts)
+    print(json.dumps(report, indent=2))
+
+    if report["min_cosine"] < args.min_cosine:
+        print(f"❌ min cosine {report['min_cosine']:.4f} < {args.min_cosine}")
+        return 1
+    print(f"✅ {args.backend} export at {_export_dir(args.model)}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
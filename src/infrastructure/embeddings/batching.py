@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+EncodeFn = Callable[[List[str]], Sequence[List[float]]]
+
+
+class MicroBatcher:
+    """Gom các lời gọi embed đồng thời thành một lần encode.
+
+    Mỗi caller ``await submit(text)``; các text đến trong cùng một cửa sổ
+    ``max_wait_ms`` (hoặc đến khi đủ ``max_batch_size``) được encode chung,
+    sau đó từng caller nhận lại vector của riêng mình.
+    """
+
+    def __init__(
+        self,
+        encode_fn: EncodeFn,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+    ):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor = executor
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Batcher bị dùng từ một event loop khác (vd: test) -> bỏ batch cũ
+            self._reset(loop)
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _reset(self, loop: asyncio.AbstractEventLoop):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for _, future in self._pending:
+            if not future.done():
+                future.cancel()
+        self._pending = []
+        self._loop = loop
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = self._loop.create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: list[tuple[str, asyncio.Future]]):
+        # Các text trùng nhau trong cùng batch chỉ encode một lần
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = await self._loop.run_in_executor(
+                self._executor, self._encode_fn, unique_texts
+            )
+        except Exception as e:
+            logger.error("Embedding batch of %d failed: %s", len(unique_texts), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(unique_texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(list(by_text[text]))
+
+        logger.debug(
+            "Embedded batch: %d requests, %d unique texts",
+            len(batch),
+            len(unique_texts),
+        )
@@ -1,28 +1,189 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+import asyncio
+import hashlib
+import logging
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
 from langchain.embeddings.base import Embeddings
-import numpy as np
-import torch
+from src.cache.lru import TTLCache
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings.backends import EmbeddingBackend, get_backend
+from src.infrastructure.embeddings.batching import MicroBatcher
+from src.infrastructure.embeddings.remote import RemoteBackend
+
+logger = logging.getLogger(__name__)
+
+# Memo theo request: mỗi request (task) có dict riêng, xem begin_request_scope()
+_request_memo: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar(
+    "embedding_request_memo", default=None
+)
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hoá text trước khi embed: NFC + gộp khoảng trắng."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _memo_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
 
 class EmbeddingService(Embeddings):
     def __init__(
         self,
-        model_name: str = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2",
+        model_name: str = SETTINGS.EMBEDDING_MODEL_NAME,
+        backend: str = SETTINGS.EMBEDDING_BACKEND,
     ):
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.embedding_model = SentenceTransformer(model_name).to(device)
+        self.model_name = model_name
+        self.backend_name = backend
+        # Backend tạo ở lần dùng đầu (xem warm_up), không phải lúc import module
+        self._backend: Optional[EmbeddingBackend] = None
+        self._backend_lock = threading.Lock()
+        # Encode chạy trên pool riêng để không chặn event loop của FastAPI
+        self.executor = ThreadPoolExecutor(
+            max_workers=SETTINGS.EMBEDDING_EXECUTOR_WORKERS,
+            thread_name_prefix="embedding",
+        )
+        # Sidecar đã gom batch cho mọi worker: gom thêm ở đây chỉ cộng dồn
+        # hai lần chờ max_wait_ms cho mỗi query
+        self.batcher: Optional[MicroBatcher] = (
+            None
+            if SETTINGS.EMBEDDING_SERVER_SOCKET
+            else MicroBatcher(
+                self._encode,
+                max_batch_size=SETTINGS.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=SETTINGS.EMBEDDING_BATCH_MAX_WAIT_MS,
+                executor=self.executor,
+            )
+        )
+        # Memo toàn process, dùng chung giữa các request
+        self.memo = TTLCache(
+            max_size=SETTINGS.EMBEDDING_CACHE_MAX_SIZE,
+            ttl=SETTINGS.EMBEDDING_CACHE_TTL,
+        )
+        self.request_hits = 0
+
+    # ———— Memo ————
+    @staticmethod
+    def begin_request_scope():
+        """Mở memo riêng cho request hiện tại (gọi ở đầu mỗi request)."""
+        _request_memo.set({})
+
+    def _memo_get(self, key: str) -> Optional[List[float]]:
+        request_memo = _request_memo.get()
+        if request_memo is not None and key in request_memo:
+            self.request_hits += 1
+            return request_memo[key]
+
+        vector = self.memo.get(key)
+        if vector is not None and request_memo is not None:
+            request_memo[key] = vector
+        return vector
+
+    def _memo_put(self, key: str, vector: List[float]):
+        request_memo = _request_memo.get()
+        if request_memo is not None:
+            request_memo[key] = vector
+        self.memo.set(key, vector)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {**self.memo.stats(), "request_hits": self.request_hits}
+
+    # ———— Backend ————
+    @property
+    def backend(self) -> EmbeddingBackend:
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = self._create_backend()
+        return self._backend
+
+    def _create_backend(self) -> EmbeddingBackend:
+        if SETTINGS.EMBEDDING_SERVER_SOCKET:
+            # Model nằm ở sidecar (server.py), worker chỉ là client mỏng
+            return RemoteBackend(
+                SETTINGS.EMBEDDING_SERVER_SOCKET,
+                timeout=SETTINGS.EMBEDDING_SERVER_TIMEOUT,
+            )
+        # torch (fp32), onnx (fp32) hoặc onnx-int8, xem backends.py
+        return get_backend(self.backend_name, self.model_name)
+
+    def warm_up(self) -> bool:
+        """
+        Nạp model / handshake với sidecar trước khi nhận request. Lỗi (vd sidecar
+        chưa chạy) không chặn process khởi động: lần encode sau sẽ thử lại.
+        """
+        try:
+            self.backend
+        except Exception as e:
+            logger.warning("Embedding backend not ready, retrying on first use: %s", e)
+            return False
+        return True
+
+    # ———— Encode ————
+    @property
+    def tokenizer(self):
+        return self.backend.tokenizer
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        return self.backend.encode(texts).tolist()
+
+    def _lookup_many(self, texts: List[str]):
+        """Tách texts thành phần đã có trong memo và phần cần encode."""
+        normalized = [normalize_text(t) for t in texts]
+        keys = [_memo_key(t) for t in normalized]
+        results: List[Optional[List[float]]] = [self._memo_get(k) for k in keys]
+        missing = list(
+            dict.fromkeys(normalized[i] for i, r in enumerate(results) if r is None)
+        )
+        return normalized, keys, results, missing
+
+    def _fill_many(self, normalized, keys, results, missing, vectors):
+        by_text = dict(zip(missing, vectors))
+        for i, vector in enumerate(results):
+            if vector is None:
+                results[i] = by_text[normalized[i]]
+                self._memo_put(keys[i], results[i])
+        return results
 
     def embed_query(self, text: str) -> List[float]:
         """Embed a single text (normalized vector) and return as list."""
-        # SentenceTransformer.encode returns a numpy array for a single string
-        vector = self.embedding_model.encode(text, normalize_embeddings=True)
-        return np.array(vector).tolist()
+        return self.embed_documents([text])[0]
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of texts (normalized vectors) and return as list of lists."""
-        vectors = self.embedding_model.encode(texts, normalize_embeddings=True)
-        return np.array(vectors).tolist()
+        normalized, keys, results, missing = self._lookup_many(texts)
+        vectors = self._encode(missing) if missing else []
+        return self._fill_many(normalized, keys, results, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a single text, micro-batched with concurrent callers (hoặc ở sidecar)."""
+        normalized = normalize_text(text)
+        key = _memo_key(normalized)
+        vector = self._memo_get(key)
+        if vector is None:
+            if self.batcher is not None:
+                vector = await self.batcher.submit(normalized)
+            else:
+                loop = asyncio.get_running_loop()
+                vector = (
+                    await loop.run_in_executor(
+                        self.executor, self._encode, [normalized]
+                    )
+                )[0]
+            self._memo_put(key, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts on the embedding executor."""
+        normalized, keys, results, missing = self._lookup_many(texts)
+        vectors = []
+        if missing:
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(self.executor, self._encode, missing)
+        return self._fill_many(normalized, keys, results, missing, vectors)
 
 
 embedding_service = EmbeddingService()
@@ -0,0 +1,162 @@
+"""Export và encode model embedding ONNX, dùng chung cho API và ingestion.
+
+Module này không import ``src.config`` (chỉ numpy, lazy import onnxruntime /
+transformers / torch) để image Airflow dùng được qua volume ``../src``: vector
+lúc index và lúc query đi qua đúng một đoạn tokenize -> run -> pool ->
+normalize.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+EXPORT_META_FILE = "export.json"
+
+
+def model_export_dir(base_dir: Union[str, Path], model_name: str) -> Path:
+    return Path(base_dir) / model_name.replace("/", "__")
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def export_onnx(
+    model_name: str, export_dir: Union[str, Path], quantize: bool = False
+) -> Path:
+    """Export model sang ONNX (và int8 nếu cần), cache lại trên đĩa."""
+    export_dir = Path(export_dir)
+    fp32_path = export_dir / FP32_FILE
+    int8_path = export_dir / INT8_FILE
+
+    if not fp32_path.exists():
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        logger.info("Exporting %s to ONNX at %s", model_name, export_dir)
+        export_dir.mkdir(parents=True, exist_ok=True)
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        tokenizer = st_model.tokenizer
+
+        pooling = "mean"
+        if len(st_model) > 1 and hasattr(st_model[1], "get_pooling_mode_str"):
+            pooling = st_model[1].get_pooling_mode_str()
+        if pooling not in ("mean", "cls"):
+            raise ValueError(f"Unsupported pooling mode for ONNX export: {pooling}")
+
+        dummy = tokenizer(["export"], return_tensors="pt")
+        input_names = [
+            n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy
+        ]
+        dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(dummy[n] for n in input_names),
+                str(fp32_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+
+        tokenizer.save_pretrained(str(export_dir))
+        meta = {
+            "model_name": model_name,
+            "max_seq_length": st_model.max_seq_length,
+            "pooling": pooling,
+            "dimension": st_model.get_sentence_embedding_dimension(),
+        }
+        (export_dir / EXPORT_META_FILE).write_text(json.dumps(meta, indent=2))
+
+    if quantize and not int8_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("Quantizing %s to int8", fp32_path)
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+    return export_dir
+
+
+class OnnxEncoder:
+    """Chạy model đã export (xem export_onnx) bằng ONNX Runtime trên CPU."""
+
+    def __init__(
+        self,
+        export_dir: Union[str, Path],
+        quantized: bool = False,
+        batch_size: int = 32,
+        threads: int = 0,
+    ):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "ONNX embedding backend requires `onnxruntime` and `transformers`"
+            ) from e
+
+        export_dir = Path(export_dir)
+        meta_path = export_dir / EXPORT_META_FILE
+        if not meta_path.exists():
+            raise FileNotFoundError(
+                f"No ONNX export found in {export_dir}. Run "
+                "`python -m src.infrastructure.embeddings.backends` first."
+            )
+        meta = json.loads(meta_path.read_text())
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(export_dir))
+        self.max_seq_length = meta["max_seq_length"]
+        self.pooling = meta["pooling"]
+        self.dimension = meta["dimension"]
+        self.batch_size = batch_size
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        model_file = export_dir / (INT8_FILE if quantized else FP32_FILE)
+        self.session = ort.InferenceSession(
+            str(model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        features = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        inputs = {
+            k: v.astype(np.int64) for k, v in features.items() if k in self.input_names
+        }
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        if self.pooling == "cls":
+            return token_embeddings[:, 0]
+        mask = features["attention_mask"][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Ma trận float32 (len(texts), dimension) đã chuẩn hoá L2."""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        # Sắp theo độ dài để giảm padding trong mỗi batch
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        output = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start : start + self.batch_size]
+            output[idx] = self._encode_batch([texts[i] for i in idx])
+        return normalize_rows(output)
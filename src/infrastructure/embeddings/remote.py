@@ -0,0 +1,127 @@
+"""Client cho embedding sidecar (xem server.py) qua Unix socket.
+
+Frame: 4 byte độ dài (big-endian) + JSON header. Response của ``encode``
+kèm thêm ``n * dim`` float32 (little-endian) ngay sau header.
+"""
+
+import json
+import logging
+import socket
+import struct
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.infrastructure.embeddings.backends import EmbeddingBackend
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct("!I")
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+def pack_frame(header: Dict[str, Any], body: bytes = b"") -> bytes:
+    data = json.dumps(header).encode("utf-8")
+    return _LENGTH.pack(len(data)) + data + body
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("Embedding server closed the connection")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+class RemoteBackend(EmbeddingBackend):
+    """Backend mỏng: gửi text sang sidecar, không load weights trong worker."""
+
+    name = "remote"
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        # Mỗi thread của embedding executor giữ một connection riêng
+        self._local = threading.local()
+
+        info, _ = self._call({"op": "info"})
+        # Connection vừa mở thuộc thread khởi tạo, executor không dùng tới
+        self._close()
+        self.dimension = info["dimension"]
+        self.model_name = info["model_name"]
+        self.server_backend = info["backend"]
+        self._tokenizer = None
+        self._tokenizer_lock = threading.Lock()
+        logger.info(
+            "Using embedding server at %s (%s, %s)",
+            socket_path,
+            self.model_name,
+            self.server_backend,
+        )
+
+    @property
+    def tokenizer(self):
+        # Chỉ load tokenizer (nhẹ) khi cần đếm token, không load model. Lock để
+        # các thread đếm token đồng thời không cùng tải từ hub / disk
+        if self._tokenizer is None:
+            with self._tokenizer_lock:
+                if self._tokenizer is None:
+                    from transformers import AutoTokenizer
+
+                    self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return self._tokenizer
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _roundtrip(self, header: Dict[str, Any]):
+        sock = self._connection()
+        sock.sendall(pack_frame(header))
+        (length,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+        response = json.loads(_recv_exactly(sock, length))
+        if not response.get("ok"):
+            raise RuntimeError(f"Embedding server error: {response.get('error')}")
+
+        body = b""
+        if "n" in response:
+            size = response["n"] * response["dim"] * VECTOR_DTYPE.itemsize
+            body = _recv_exactly(sock, size)
+        return response, body
+
+    def _call(self, header: Dict[str, Any]):
+        for attempt in range(2):
+            try:
+                return self._roundtrip(header)
+            except TimeoutError:
+                # Sidecar có thể vẫn đang xử lý: không gửi lại (chỉ làm tăng tải),
+                # bỏ socket để reply đến muộn không bị đọc nhầm cho request sau
+                self._close()
+                raise
+            except OSError:
+                # Server restart -> kết nối lại một lần
+                self._close()
+                if attempt:
+                    raise
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        response, body = self._call({"op": "encode", "texts": texts})
+        vectors = np.frombuffer(body, dtype=VECTOR_DTYPE)
+        return vectors.reshape(response["n"], response["dim"]).astype(np.float32)
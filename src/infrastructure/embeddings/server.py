@@ -0,0 +1,129 @@
+"""Embedding sidecar: một process giữ model, phục vụ mọi uvicorn worker.
+
+    python -m src.infrastructure.embeddings.server --socket /tmp/rag-embedding.sock
+
+Worker bật chế độ client bằng ``EMBEDDING_SERVER_SOCKET=/tmp/rag-embedding.sock``.
+Request từ mọi connection được gom chung qua MicroBatcher trước khi encode.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings.backends import get_backend
+from src.infrastructure.embeddings.batching import MicroBatcher
+from src.infrastructure.embeddings.remote import VECTOR_DTYPE, pack_frame
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct("!I")
+
+
+class EmbeddingServer:
+    def __init__(self, socket_path: str, model_name: str, backend: str):
+        self.socket_path = socket_path
+        self.model_name = model_name
+        self.backend = get_backend(backend, model_name)
+        self.executor = ThreadPoolExecutor(
+            max_workers=SETTINGS.EMBEDDING_EXECUTOR_WORKERS,
+            thread_name_prefix="embedding",
+        )
+        self.batcher = MicroBatcher(
+            self.backend.encode,
+            max_batch_size=SETTINGS.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=SETTINGS.EMBEDDING_BATCH_MAX_WAIT_MS,
+            executor=self.executor,
+        )
+
+    async def _dispatch(self, request: dict) -> bytes:
+        op = request.get("op")
+        if op == "info":
+            return pack_frame(
+                {
+                    "ok": True,
+                    "dimension": self.backend.dimension,
+                    "model_name": self.model_name,
+                    "backend": self.backend.name,
+                }
+            )
+        if op == "encode":
+            texts = request["texts"]
+            vectors = await asyncio.gather(*(self.batcher.submit(t) for t in texts))
+            matrix = np.asarray(vectors, dtype=VECTOR_DTYPE).reshape(
+                len(texts), self.backend.dimension
+            )
+            header = {"ok": True, "n": len(texts), "dim": self.backend.dimension}
+            return pack_frame(header, matrix.tobytes())
+        raise ValueError(f"Unknown op: {op}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                    request = json.loads(await reader.readexactly(length))
+                except asyncio.IncompleteReadError:
+                    break
+
+                try:
+                    response = await self._dispatch(request)
+                except Exception as e:
+                    logger.error("Embedding request failed: %s", e)
+                    response = pack_frame({"ok": False, "error": str(e)})
+
+                writer.write(response)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        logger.info(
+            "Embedding server (%s, %s) listening on %s",
+            self.model_name,
+            self.backend.name,
+            self.socket_path,
+        )
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run shared embedding server")
+    parser.add_argument("--socket", default=SETTINGS.EMBEDDING_SERVER_SOCKET)
+    parser.add_argument("--model", default=SETTINGS.EMBEDDING_MODEL_NAME)
+    parser.add_argument("--backend", default=SETTINGS.EMBEDDING_BACKEND)
+    parser.add_argument(
+        "--torch-threads",
+        type=int,
+        default=SETTINGS.EMBEDDING_SERVER_TORCH_THREADS,
+        help="Số thread torch (0 = mặc định)",
+    )
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("--socket (hoặc EMBEDDING_SERVER_SOCKET) là bắt buộc")
+
+    if args.torch_threads and args.backend == "torch":
+        import torch
+
+        torch.set_num_threads(args.torch_threads)
+
+    server = EmbeddingServer(args.socket, args.model, args.backend)
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    main()
@@ -0,0 +1,113 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def bm25_index_path(persist_directory: str, collection_name: str) -> str:
+    """Cùng đường dẫn với ingest_data/plugins/jobs/bm25_index.py."""
+    return os.path.join(persist_directory, "bm25", f"{collection_name}.json")
+
+
+class BM25Index:
+    """
+    Sparse BM25 index (build lúc ingest) nạp vào RAM để query cùng vector search.
+
+    Postings được chuyển sang numpy array nên mỗi query chỉ cộng dồn điểm
+    trên các document chứa term, không duyệt toàn bộ corpus.
+    """
+
+    def __init__(self, data: dict):
+        self.token_pattern = re.compile(data["token_pattern"])
+        self.split_pattern = re.compile(data["split_pattern"])
+        self.k1 = float(data["k1"])
+        self.b = float(data["b"])
+        self.doc_ids: List[str] = data["doc_ids"]
+        self.doc_lens = np.asarray(data["doc_lens"], dtype=np.float32)
+        avgdl = float(data["avgdl"]) or 1.0
+
+        n_docs = len(self.doc_ids)
+        # Phần chuẩn hoá theo độ dài document tính sẵn một lần
+        self._norm = self.k1 * (1 - self.b + self.b * self.doc_lens / avgdl)
+        self.postings: dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, entries in data["postings"].items():
+            arr = np.asarray(entries, dtype=np.int64).reshape(-1, 2)
+            df = len(arr)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            self.postings[term] = (arr[:, 0], arr[:, 1].astype(np.float32), idf)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def tokenize(self, text: str) -> List[str]:
+        # NFC như normalize_text: dấu tiếng Việt dựng sẵn và tổ hợp ra cùng token
+        text = unicodedata.normalize("NFC", text).lower()
+        tokens = []
+        for token in self.token_pattern.findall(text):
+            tokens.append(token)
+            parts = self.split_pattern.split(token)
+            if len(parts) > 1:
+                tokens.extend(p for p in parts if p)
+        return tokens
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Trả về tối đa k cặp (chunk_id, score) có score > 0, giảm dần."""
+        if not self.doc_ids or k <= 0:
+            return []
+
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for term in set(self.tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, tf, idf = posting
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self._norm[docs])
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.doc_ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+class BM25IndexLoader:
+    """Giữ index hiện tại, nạp lại khi file trên disk được build lại (mtime đổi)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._index: Optional[BM25Index] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[BM25Index]:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            # Chưa có index (collection ingest trước khi có BM25) -> chỉ dùng vector
+            return None
+
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    # Ghi nhận mtime cả khi lỗi để không load lại file hỏng mỗi query
+                    self._mtime = mtime
+                    try:
+                        self._index = BM25Index.load(self.path)
+                        logger.info(
+                            f"Loaded BM25 index ({len(self._index)} chunks) from {self.path}"
+                        )
+                    except Exception as e:
+                        logger.error(f"Could not load BM25 index {self.path}: {e}")
+        return self._index
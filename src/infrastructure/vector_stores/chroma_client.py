@@ -1,35 +1,339 @@
-from langchain_chroma import Chroma
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import chromadb
+from chromadb.errors import NotFoundError
 from langfuse import observe
+from src.cache.retrieval_cache import RetrievalCache
+from src.cache.versioning import read_build_id
+from src.infrastructure.vector_stores.bm25 import (
+    BM25Index,
+    BM25IndexLoader,
+    bm25_index_path,
+)
+from src.infrastructure.vector_stores.snapshot import VectorSnapshot
 from src.infrastructure.embeddings.embeddings import embedding_service
 from src.config.settings import SETTINGS
-from langchain.schema.document import Document
-from typing import List, Tuple, Dict, Any
+from src.schemas.domain.retrieval import RetrievedChunk, SearchArgs
+from src.utils import logger
+from src.utils.request_context import current_dataset
+from typing import Callable, List, Dict, Any, Tuple
 
 
-def _format_docs(docs: List[Document], scores: List[float] | None = None) -> str:
+class DatasetNotFoundError(LookupError):
+    """Dataset chưa được ingest: không có collection (hay snapshot) để phục vụ."""
+
+
+def _format_docs(chunks: List[RetrievedChunk], with_score: bool = False) -> str:
+    if with_score and not chunks:
+        return "Không tìm thấy tài liệu phù hợp."
+
     formatted = []
-    for idx, doc in enumerate(docs):
-        content = doc.page_content.strip()
-        if scores:
-            content += f" [score={scores[idx]:.4f}]"
+    for chunk in chunks:
+        content = chunk.content.strip()
+        if with_score and chunk.distance is not None:
+            content += f" [score={chunk.distance:.4f}]"
         formatted.append(content)
     return "\n\n".join(formatted)
 
 
+class CollectionHandle:
+    """
+    Một collection đang mở: collection Chroma, BM25 index, snapshot và version
+    stamp. Mọi method đều sync, được gọi trong retrieval executor.
+
+    Client Chroma (``get_client``) dùng chung cho mọi dataset: Chroma giữ một
+    System cho mỗi persist dir nên handle chỉ sở hữu snapshot và BM25 index,
+    được giải phóng khi handle bị evict khỏi pool và request cuối kết thúc.
+    Raise DatasetNotFoundError nếu collection chưa tồn tại (không tạo mới).
+    """
+
+    def __init__(self, dataset: str, get_client: Callable[[], chromadb.ClientAPI]):
+        self.dataset = dataset
+        self.name = SETTINGS.collection_name(dataset)
+        self._get_client = get_client
+        self._collection = None
+        self._connect_lock = threading.Lock()
+        self._version: str | None = None
+        self._version_checked_at = 0.0
+        self._snapshot_checked_at = time.monotonic()
+        self.bm25 = (
+            BM25IndexLoader(bm25_index_path(SETTINGS.CHROMA_PERSIST_DIR, self.name))
+            if SETTINGS.HYBRID_SEARCH_ENABLED
+            else None
+        )
+        # Snapshot mmap dùng chung page cache giữa các worker, thay cho Chroma
+        self.snapshot = (
+            VectorSnapshot.open(SETTINGS.VECTOR_SNAPSHOT_DIR, self.name)
+            if SETTINGS.VECTOR_SNAPSHOT_DIR
+            else None
+        )
+        if self.snapshot is None:
+            self.chroma_collection()
+
+    def current_snapshot(self) -> VectorSnapshot | None:
+        """
+        Snapshot đang phục vụ. Vài giây (RETRIEVAL_VERSION_REFRESH_SECONDS) kiểm
+        tra một lần xem đã export lại chưa, kể cả khi không bật retrieval cache.
+        """
+        if self.snapshot is None:
+            return None
+        now = time.monotonic()
+        if now - self._snapshot_checked_at > SETTINGS.RETRIEVAL_VERSION_REFRESH_SECONDS:
+            self._snapshot_checked_at = now
+            if self.snapshot.is_stale():
+                # Export lại -> mở bản mới; giữ bản cũ nếu mở lỗi
+                self.snapshot = (
+                    VectorSnapshot.open(SETTINGS.VECTOR_SNAPSHOT_DIR, self.name)
+                    or self.snapshot
+                )
+        return self.snapshot
+
+    def chroma_collection(self) -> chromadb.Collection:
+        if self._collection is None:
+            with self._connect_lock:
+                if self._collection is None:
+                    try:
+                        # get_collection, không get_or_create: tên sai hoặc dataset
+                        # chưa ingest không được tạo ra collection rỗng
+                        self._collection = self._get_client().get_collection(
+                            self.name, embedding_function=None
+                        )
+                    except NotFoundError as e:
+                        raise DatasetNotFoundError(
+                            f"Dataset '{self.dataset}' has not been ingested "
+                            f"(no collection {self.name})"
+                        ) from e
+        return self._collection
+
+    def query_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        n_results: int,
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[List[RetrievedChunk]]:
+        """Một lần query Chroma cho nhiều vector, trả về chunk theo từng vector."""
+        snapshot = self.current_snapshot()
+        if snapshot is not None and not metadata_filter:
+            # Snapshot không hỗ trợ where-filter -> có filter thì vẫn hỏi Chroma
+            return snapshot.query(embeddings, n_results)
+
+        results = self.chroma_collection().query(
+            query_embeddings=embeddings,
+            n_results=n_results,
+            where=metadata_filter,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            [
+                RetrievedChunk(
+                    id=chunk_id,
+                    content=document or "",
+                    metadata=metadata or {},
+                    distance=distance,
+                )
+                for chunk_id, document, metadata, distance in zip(
+                    ids, documents, metadatas, distances
+                )
+            ]
+            for ids, documents, metadatas, distances in zip(
+                results["ids"],
+                results["documents"],
+                results["metadatas"],
+                results["distances"],
+            )
+        ]
+
+    def get_by_ids(self, ids: List[str]) -> Dict[str, RetrievedChunk]:
+        snapshot = self.current_snapshot()
+        if snapshot is not None:
+            return snapshot.get(ids)
+
+        results = self.chroma_collection().get(
+            ids=ids, include=["documents", "metadatas"]
+        )
+        return {
+            chunk_id: RetrievedChunk(
+                id=chunk_id, content=document or "", metadata=metadata or {}
+            )
+            for chunk_id, document, metadata in zip(
+                results["ids"], results["documents"], results["metadatas"]
+            )
+        }
+
+    def search(
+        self,
+        queries: List[str],
+        embeddings: List[List[float]],
+        n_results: int,
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[List[RetrievedChunk]]:
+        """
+        Vector search, fuse thêm BM25 chỉ khi index đã nạp được (và không có
+        metadata_filter, vì BM25 index không lưu metadata). Collection chưa có
+        index thì giữ nguyên ``n_results``, không lấy thừa ứng viên.
+        """
+        index = None
+        if self.bm25 is not None and not metadata_filter:
+            index = self.bm25.get()
+        if index is None:
+            return self.query_by_vectors(embeddings, n_results, metadata_filter)
+
+        dense_results = self.query_by_vectors(
+            embeddings, max(n_results, SETTINGS.HYBRID_CANDIDATES)
+        )
+        return self.fuse_hybrid(index, queries, dense_results)
+
+    def fuse_hybrid(
+        self,
+        index: BM25Index,
+        queries: List[str],
+        dense_results: List[List[RetrievedChunk]],
+    ) -> List[List[RetrievedChunk]]:
+        """
+        Gộp kết quả vector với BM25 bằng reciprocal rank fusion:
+        score(d) = sum(1 / (RRF_K + rank)). Chunk chỉ BM25 tìm thấy được lấy
+        nội dung từ Chroma theo ID, chung một lần cho mọi query.
+        """
+        fused_ids = []
+        for query, chunks in zip(queries, dense_results):
+            scores: Dict[str, float] = {}
+            sparse = index.search(query, SETTINGS.HYBRID_CANDIDATES)
+            for ranking in ([chunk.id for chunk in chunks], [i for i, _ in sparse]):
+                for rank, chunk_id in enumerate(ranking, start=1):
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (
+                        SETTINGS.RRF_K + rank
+                    )
+            fused_ids.append(sorted(scores.items(), key=lambda x: x[1], reverse=True))
+
+        known = {chunk.id: chunk for chunks in dense_results for chunk in chunks}
+        missing = list({i for ranked in fused_ids for i, _ in ranked if i not in known})
+        if missing:
+            known.update(self.get_by_ids(missing))
+
+        return [
+            [
+                known[chunk_id].model_copy(update={"score": score})
+                for chunk_id, score in ranked
+                # ID có trong BM25 nhưng đã bị xoá khỏi collection
+                if chunk_id in known
+            ]
+            for ranked in fused_ids
+        ]
+
+    def version(self) -> str:
+        """Version stamp của collection (đổi khi re-ingest), cache trong vài giây."""
+        now = time.monotonic()
+        if (
+            self._version is None
+            or now - self._version_checked_at
+            > SETTINGS.RETRIEVAL_VERSION_REFRESH_SECONDS
+        ):
+            snapshot = self.current_snapshot()
+            if snapshot is not None:
+                stamp = f"snapshot-{snapshot.stamp}"
+            else:
+                build_id = read_build_id(SETTINGS.CHROMA_PERSIST_DIR, self.name)
+                if build_id is not None:
+                    stamp = f"build-{build_id}"
+                else:
+                    stamp = f"count-{self.chroma_collection().count()}"
+            # Dataset nằm trong version -> retrieval cache tách riêng theo dataset
+            self._version = f"{self.dataset}:{stamp}"
+            self._version_checked_at = now
+        return self._version
+
+
 class ChromaClientService:
     def __init__(self):
-        self.client = None
-        self.collection = None
         self.embedding_service = embedding_service
+        # HNSW query chạy trên pool riêng, không chiếm event loop
+        self.executor = ThreadPoolExecutor(
+            max_workers=SETTINGS.RETRIEVAL_EXECUTOR_WORKERS,
+            thread_name_prefix="retrieval",
+        )
+        self.retrieval_cache = (
+            RetrievalCache(
+                max_size=SETTINGS.RETRIEVAL_CACHE_MAX_SIZE,
+                ttl=SETTINGS.RETRIEVAL_CACHE_TTL,
+                use_redis=SETTINGS.RETRIEVAL_CACHE_REDIS,
+            )
+            if SETTINGS.RETRIEVAL_CACHE_ENABLED
+            else None
+        )
+        # Một client Chroma cho mọi dataset (Chroma dùng chung System theo path)
+        self._chroma: chromadb.ClientAPI | None = None
+        self._chroma_lock = threading.Lock()
+        # Pool các collection đã mở (LRU): giới hạn snapshot / BM25 nằm trong RAM
+        self._collections: OrderedDict[str, CollectionHandle] = OrderedDict()
+        self._pool_lock = threading.Lock()
 
-    def _connect(self):
-        persist_dir = SETTINGS.CHROMA_PERSIST_DIR
+    def chroma(self) -> chromadb.ClientAPI:
+        if self._chroma is None:
+            with self._chroma_lock:
+                if self._chroma is None:
+                    self._chroma = chromadb.PersistentClient(
+                        path=str(SETTINGS.CHROMA_PERSIST_DIR)
+                    )
+        return self._chroma
 
-        self.client = Chroma(
-            collection_name=SETTINGS.CHROMA_COLLECTION_NAME,
-            persist_directory=str(persist_dir),
-            embedding_function=self.embedding_service,
-        )
+    def collection(self, dataset: str | None = None) -> CollectionHandle:
+        """
+        Handle của dataset (mặc định: dataset của request hiện tại). Lần đầu mở
+        sẽ đọc snapshot / BM25 từ disk: từ event loop thì gọi qua executor.
+        """
+        dataset = dataset or current_dataset.get()
+        with self._pool_lock:
+            handle = self._collections.get(dataset)
+            if handle is not None:
+                self._collections.move_to_end(dataset)
+                return handle
+
+        # Mở ngoài lock để dataset khác không phải chờ đọc disk
+        opened = CollectionHandle(dataset, self.chroma)
+        with self._pool_lock:
+            handle = self._collections.get(dataset)
+            if handle is not None:  # Thread khác đã mở trước
+                self._collections.move_to_end(dataset)
+                return handle
+            self._collections[dataset] = opened
+            while len(self._collections) > SETTINGS.MAX_OPEN_COLLECTIONS:
+                # Snapshot / BM25 của handle bị evict được giải phóng khi request
+                # cuối còn giữ reference kết thúc
+                evicted, _ = self._collections.popitem(last=False)
+                logger.info(f"Evicted collection {evicted} from pool")
+            return opened
+
+    async def aopen(self, dataset: str) -> CollectionHandle:
+        """
+        Mở dataset từ event loop (đọc disk trong executor). Router gọi trước khi
+        xử lý request để dataset chưa ingest trả về 404 thay vì lỗi giữa chừng.
+        """
+        handle = self._collections.get(dataset)
+        if handle is not None:
+            return handle
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.collection, dataset)
+
+    def open_datasets(self) -> List[str]:
+        return list(self._collections)
+
+    def search_docs(
+        self,
+        query: str,
+        top_k: int = 3,
+        with_score: bool = False,
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> Tuple[str, List[RetrievedChunk]]:
+        """Trả về (text cho LLM, chunk) — chunk đi kèm ToolMessage làm artifact."""
+        embedding = self.embedding_service.embed_query(query)
+        chunks = self.collection().query_by_vectors(
+            [embedding], top_k, metadata_filter
+        )[0]
+        return _format_docs(chunks, with_score), chunks
 
     def retrieve_vector(
         self,
@@ -38,24 +342,116 @@ class ChromaClientService:
         with_score: bool = False,
         metadata_filter: Dict[str, Any] | None = None,
     ) -> str:
+        return self.search_docs(query, top_k, with_score, metadata_filter)[0]
 
-        if self.client is None:
-            self._connect()
+    async def _asearch(
+        self,
+        requests: List[SearchArgs],
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[List[RetrievedChunk]]:
+        """
+        Tìm chunk cho nhiều query: query nào có trong retrieval cache thì lấy
+        từ cache, phần còn lại được embed chung một lần và query Chroma một lần.
+        Khi bật hybrid search và collection có BM25 index, kết quả vector được
+        fuse với BM25 (xem CollectionHandle.search).
+        """
+        loop = asyncio.get_running_loop()
+        # Dataset đọc trong event loop (executor thread không thấy ContextVar),
+        # handle mở trong executor vì lần đầu phải đọc snapshot từ disk
+        handle = await self.aopen(current_dataset.get())
+        results: List[List[RetrievedChunk] | None] = [None] * len(requests)
+        keys: List[str | None] = [None] * len(requests)
 
-        if with_score:
-            docs_with_scores: List[Tuple[Document, float]] = (
-                self.client.similarity_search_with_score(
-                    query, k=top_k, filter=metadata_filter
+        if self.retrieval_cache is not None:
+            version = await loop.run_in_executor(self.executor, handle.version)
+            for i, request in enumerate(requests):
+                keys[i] = self.retrieval_cache.make_key(
+                    request.query,
+                    request.top_k,
+                    request.with_score,
+                    metadata_filter,
+                    version,
                 )
+                cached = await self.retrieval_cache.get(keys[i])
+                if cached is not None:
+                    results[i] = [RetrievedChunk(**chunk) for chunk in cached]
+
+        missing = [i for i, chunks in enumerate(results) if chunks is None]
+        if missing:
+            queries = [requests[i].query for i in missing]
+            if len(queries) == 1:
+                embeddings = [await self.embedding_service.aembed_query(queries[0])]
+            else:
+                embeddings = await self.embedding_service.aembed_documents(queries)
+            n_results = max(requests[i].top_k for i in missing)
+            found = await loop.run_in_executor(
+                self.executor,
+                partial(handle.search, queries, embeddings, n_results, metadata_filter),
             )
-            try:
-                docs, scores = zip(*docs_with_scores)
-                return _format_docs(list(docs), list(scores))
-            except ValueError:
-                return "Không tìm thấy tài liệu phù hợp."
-
-        else:
-            docs: List[Document] = self.client.similarity_search(
-                query, k=top_k, filter=metadata_filter
-            )
-            return _format_docs(docs)
+            for i, chunks in zip(missing, found):
+                results[i] = chunks
+                if keys[i] is not None:
+                    await self.retrieval_cache.set(
+                        keys[i],
+                        [chunk.model_dump() for chunk in chunks[: requests[i].top_k]],
+                    )
+
+        return results
+
+    async def asearch_docs(
+        self,
+        query: str,
+        top_k: int = 3,
+        with_score: bool = False,
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> Tuple[str, List[RetrievedChunk]]:
+        """Async version: embed và HNSW query đều chạy ngoài event loop."""
+        request = SearchArgs(query=query, top_k=top_k, with_score=with_score)
+        chunks = (await self._asearch([request], metadata_filter))[0][:top_k]
+        return _format_docs(chunks, with_score), chunks
+
+    async def aretrieve_vector(
+        self,
+        query: str,
+        top_k: int = 3,
+        with_score: bool = False,
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> str:
+        return (await self.asearch_docs(query, top_k, with_score, metadata_filter))[0]
+
+    async def asearch_docs_batch(
+        self,
+        requests: List[SearchArgs],
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[Tuple[str, List[RetrievedChunk]]]:
+        """
+        Batched search cho nhiều tool call trong cùng một lượt LLM: một lần encode,
+        một lần query Chroma. Chunk đã trả cho sub-query trước sẽ bị loại khỏi
+        các sub-query sau (bù bằng kết quả kế tiếp nếu còn).
+        """
+        if not requests:
+            return []
+
+        results = await self._asearch(requests, metadata_filter)
+
+        seen: set[str] = set()
+        outputs = []
+        for request, chunks in zip(requests, results):
+            selected = []
+            for chunk in chunks:
+                if len(selected) >= request.top_k:
+                    break
+                if chunk.id in seen:
+                    continue
+                seen.add(chunk.id)
+                selected.append(chunk)
+            outputs.append((_format_docs(selected, request.with_score), selected))
+        return outputs
+
+    async def aretrieve_batch(
+        self,
+        requests: List[SearchArgs],
+        metadata_filter: Dict[str, Any] | None = None,
+    ) -> List[str]:
+        results = await self.asearch_docs_batch(requests, metadata_filter)
+        return [content for content, _ in results]
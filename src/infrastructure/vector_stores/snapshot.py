@@ -0,0 +1,368 @@
+"""Snapshot read-only của collection Chroma, mở bằng memory-map.
+
+    python -m src.infrastructure.vector_stores.snapshot --dtype float16
+
+``<VECTOR_SNAPSHOT_DIR>/<collection>`` là symlink tới thư mục version
+``<collection>.<stamp>/``; export mới ghi ra version khác rồi đổi symlink bằng
+một ``os.replace`` nên worker luôn thấy một snapshot đầy đủ. Mỗi version:
+
+    manifest.json          count, dim, dtype, space, stamp (hash nội dung)
+    vectors.npy            (count, dim) float32/float16, C-contiguous
+    norms.npy              (count,) float32, L2 norm của từng vector
+    ids.json               chunk ID theo thứ tự hàng
+    documents.bin/.idx     text UTF-8 nối liền + offsets int64 (count + 1)
+    metadatas.bin/.idx     metadata JSON nối liền + offsets
+    hnsw.bin               index hnswlib khi corpus >= ``ann_threshold``
+
+Vector, document và metadata được ``mmap`` nên mọi worker dùng chung page
+cache của OS. Giới hạn: hnswlib không mmap được index, ``hnsw.bin`` được đọc
+vào RAM riêng của từng worker (khoảng ``count * (dim * 4 + M * 8)`` byte);
+danh sách chunk ID và bảng ID -> hàng cũng là object Python trong từng worker.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.config.settings import SETTINGS
+from src.schemas.domain.retrieval import RetrievedChunk
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+_EXACT_BLOCK_ROWS = 65536
+
+
+def _write_blob(path: str, items: List[bytes]):
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    with open(f"{path}.bin", "wb") as f:
+        for i, item in enumerate(items):
+            f.write(item)
+            offsets[i + 1] = offsets[i] + len(item)
+    np.save(f"{path}.idx.npy", offsets)
+
+
+class _Blob:
+    """Danh sách bytes có độ dài thay đổi trên mmap: ``blob[i]`` -> bytes."""
+
+    def __init__(self, path: str):
+        self.offsets = np.load(f"{path}.idx.npy", mmap_mode="r")
+        size = int(self.offsets[-1])
+        self.data = (
+            np.memmap(f"{path}.bin", dtype=np.uint8, mode="r")
+            if size
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.data[int(self.offsets[i]) : int(self.offsets[i + 1])].tobytes()
+
+
+def _content_stamp(ids: List[str], matrix: np.ndarray, dtype: str) -> str:
+    # Stamp theo nội dung: hai lần export khác nhau không bao giờ trùng stamp,
+    # export lại y hệt thì worker không cần mở lại
+    digest = hashlib.sha1(json.dumps(ids).encode("utf-8"))
+    digest.update(matrix.tobytes())
+    digest.update(dtype.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _point_link(link: str, target: str):
+    """Trỏ symlink ``link`` sang ``target`` (cùng thư mục) một cách nguyên tử."""
+    tmp_link = f"{link}.link.tmp"
+    if os.path.lexists(tmp_link):
+        os.unlink(tmp_link)
+    os.symlink(os.path.basename(target), tmp_link)
+    if os.path.isdir(link) and not os.path.islink(link):
+        # Layout cũ (thư mục thật): chuyển một lần, os.replace không ghi đè dir
+        legacy_dir = f"{link}.legacy"
+        shutil.rmtree(legacy_dir, ignore_errors=True)
+        os.replace(link, legacy_dir)
+        shutil.rmtree(legacy_dir, ignore_errors=True)
+    os.replace(tmp_link, link)
+
+
+def _prune_versions(out_dir: str, keep: List[str]):
+    """Xoá version cũ, giữ ``keep`` (bản hiện tại và bản trước đó)."""
+    parent, name = os.path.split(os.path.abspath(out_dir))
+    keep = {os.path.basename(path) for path in keep}
+    # Chỉ đúng dạng <name>.<stamp>: không đụng collection khác có tên chứa dấu chấm
+    version = re.compile(re.escape(name) + r"\.[0-9a-f]{16}(\.tmp)?")
+    for entry in os.listdir(parent):
+        if not version.fullmatch(entry) or entry in keep:
+            continue
+        path = os.path.join(parent, entry)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def export_snapshot(
+    collection,
+    out_dir: str,
+    dtype: str = "float32",
+    ann_threshold: int = 50000,
+    page_size: int = 1000,
+) -> str:
+    """
+    Ghi toàn bộ collection ra một thư mục version mới rồi đổi symlink
+    ``out_dir`` sang đó. Trả về thư mục version.
+    """
+    ids, documents, metadatas, vectors = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["documents", "metadatas", "embeddings"],
+            limit=page_size,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(doc or "" for doc in page["documents"])
+        metadatas.extend(meta or {} for meta in page["metadatas"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+
+    if not ids:
+        raise ValueError(f"Collection {collection.name} is empty")
+
+    matrix = np.ascontiguousarray(np.concatenate(vectors))
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    stamp = _content_stamp(ids, matrix, dtype)
+    version_dir = f"{out_dir}.{stamp}"
+    previous = os.path.realpath(out_dir) if os.path.islink(out_dir) else None
+
+    if os.path.exists(os.path.join(version_dir, MANIFEST)):
+        # Cùng nội dung đã export: chỉ cần trỏ lại symlink
+        _point_link(out_dir, version_dir)
+        _prune_versions(out_dir, keep=[version_dir, previous or version_dir])
+        logger.info("Snapshot of %s unchanged (%s)", collection.name, stamp)
+        return version_dir
+
+    tmp_dir = f"{version_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "vectors.npy"), matrix.astype(dtype))
+    np.save(
+        os.path.join(tmp_dir, "norms.npy"),
+        np.linalg.norm(matrix, axis=1).astype(np.float32),
+    )
+    with open(os.path.join(tmp_dir, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f, ensure_ascii=False)
+    _write_blob(
+        os.path.join(tmp_dir, "documents"), [d.encode("utf-8") for d in documents]
+    )
+    _write_blob(
+        os.path.join(tmp_dir, "metadatas"),
+        [json.dumps(m, ensure_ascii=False).encode("utf-8") for m in metadatas],
+    )
+
+    has_ann = False
+    if len(ids) >= ann_threshold:
+        try:
+            import hnswlib
+
+            index = hnswlib.Index(space=space, dim=matrix.shape[1])
+            index.init_index(max_elements=len(ids), M=32, ef_construction=200)
+            index.add_items(matrix, np.arange(len(ids)))
+            index.save_index(os.path.join(tmp_dir, "hnsw.bin"))
+            has_ann = True
+        except ImportError:
+            logger.warning(
+                "hnswlib not installed (see requirements.txt): snapshot of %d "
+                "vectors will use exact search",
+                len(ids),
+            )
+
+    manifest = {
+        "collection": collection.name,
+        "count": len(ids),
+        "dim": int(matrix.shape[1]),
+        "dtype": dtype,
+        "space": space,
+        "ann": has_ann,
+        "stamp": stamp,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    os.replace(tmp_dir, version_dir)
+    _point_link(out_dir, version_dir)
+    # Giữ bản trước cho worker đang mở dở; worker đang mmap bản cũ hơn vẫn
+    # giữ inode cũ, không bị ảnh hưởng khi xoá
+    _prune_versions(out_dir, keep=[version_dir, previous or version_dir])
+
+    logger.info(
+        "Exported snapshot of %s: %d vectors (%s, %s, ann=%s) -> %s",
+        collection.name,
+        len(ids),
+        dtype,
+        space,
+        has_ann,
+        version_dir,
+    )
+    return version_dir
+
+
+class VectorSnapshot:
+    """
+    Searcher trên snapshot, trả kết quả cùng dạng ``query_by_vectors`` của
+    CollectionHandle. Corpus nhỏ dùng dot product chính xác (vectorized,
+    theo block), corpus lớn dùng index hnswlib nếu snapshot có.
+    """
+
+    def __init__(self, path: str, ef_search: int = 100):
+        # ``path`` thường là symlink: ghim version đang trỏ tới, kiểm tra stale
+        # qua symlink
+        self.source = path
+        self.path = path = os.path.realpath(path)
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.stamp: str = self.manifest["stamp"]
+        self.space: str = self.manifest["space"]
+
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.norms = np.load(os.path.join(path, "norms.npy"), mmap_mode="r")
+        with open(os.path.join(path, "ids.json"), encoding="utf-8") as f:
+            self.ids: List[str] = json.load(f)
+        self.row_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.documents = _Blob(os.path.join(path, "documents"))
+        self.metadatas = _Blob(os.path.join(path, "metadatas"))
+
+        self.ann = None
+        if self.manifest.get("ann"):
+            try:
+                import hnswlib
+
+                self.ann = hnswlib.Index(space=self.space, dim=self.manifest["dim"])
+                self.ann.load_index(os.path.join(path, "hnsw.bin"))
+                self.ann.set_ef(ef_search)
+            except ImportError:
+                logger.warning("hnswlib not installed, using exact search")
+
+    @classmethod
+    def open(cls, base_dir: str, collection_name: str) -> Optional["VectorSnapshot"]:
+        path = os.path.join(base_dir, collection_name)
+        if not os.path.exists(os.path.join(path, MANIFEST)):
+            logger.warning(f"No vector snapshot at {path}, using Chroma")
+            return None
+        snapshot = cls(path, ef_search=SETTINGS.VECTOR_SNAPSHOT_EF_SEARCH)
+        logger.info(
+            f"Serving {collection_name} from snapshot {path} "
+            f"({len(snapshot)} vectors, ann={snapshot.ann is not None})"
+        )
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def is_stale(self) -> bool:
+        """True nếu collection đã được export lại (stamp trên disk khác)."""
+        try:
+            with open(os.path.join(self.source, MANIFEST), encoding="utf-8") as f:
+                return json.load(f)["stamp"] != self.stamp
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def _chunk(self, row: int, distance: float | None = None) -> RetrievedChunk:
+        return RetrievedChunk(
+            id=self.ids[row],
+            content=self.documents[row].decode("utf-8"),
+            metadata=json.loads(self.metadatas[row]),
+            distance=distance,
+        )
+
+    def _exact(self, queries: np.ndarray, k: int):
+        # Similarity (n_queries, count), tính theo block để float16 mmap không
+        # bị cast toàn bộ ma trận một lần
+        sims = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), _EXACT_BLOCK_ROWS):
+            block = self.vectors[start : start + _EXACT_BLOCK_ROWS]
+            sims[:, start : start + len(block)] = (
+                queries @ block.astype(np.float32, copy=False).T
+            )
+
+        # Cùng thang distance với Chroma cho từng space
+        if self.space == "l2":
+            q_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+            # Bình phương norm tính theo query, không giữ bản copy trong từng worker
+            distances = q_norms + np.square(self.norms)[None, :] - 2 * sims
+        elif self.space == "cosine":
+            q_norms = np.linalg.norm(queries, axis=1)[:, None]
+            distances = 1 - sims / np.maximum(q_norms * self.norms[None, :], 1e-12)
+        else:
+            distances = 1 - sims
+
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+        rows = np.take_along_axis(top, order, axis=1)
+        return rows, np.take_along_axis(distances, rows, axis=1)
+
+    def query(
+        self, embeddings: List[List[float]], n_results: int
+    ) -> List[List[RetrievedChunk]]:
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        k = min(n_results, len(self))
+        if k <= 0:
+            return [[] for _ in embeddings]
+
+        if self.ann is not None:
+            rows, distances = self.ann.knn_query(queries, k=k)
+        else:
+            rows, distances = self._exact(queries, k)
+
+        return [
+            [self._chunk(int(r), float(d)) for r, d in zip(row, dist)]
+            for row, dist in zip(rows, distances)
+        ]
+
+    def get(self, ids: List[str]) -> Dict[str, RetrievedChunk]:
+        return {
+            chunk_id: self._chunk(self.row_by_id[chunk_id])
+            for chunk_id in ids
+            if chunk_id in self.row_by_id
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Chroma collection snapshot")
+    parser.add_argument("--collection", default=SETTINGS.CHROMA_COLLECTION_NAME)
+    parser.add_argument("--persist-dir", default=SETTINGS.CHROMA_PERSIST_DIR)
+    parser.add_argument("--out-dir", default=SETTINGS.VECTOR_SNAPSHOT_DIR)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument(
+        "--ann-threshold",
+        type=int,
+        default=SETTINGS.VECTOR_SNAPSHOT_ANN_THRESHOLD,
+        help="Build index hnswlib khi số vector >= ngưỡng này",
+    )
+    args = parser.parse_args()
+    if not args.out_dir:
+        parser.error("--out-dir (hoặc VECTOR_SNAPSHOT_DIR) là bắt buộc")
+
+    import chromadb
+
+    client = chromadb.PersistentClient(path=args.persist_dir)
+    collection = client.get_collection(args.collection)
+    export_snapshot(
+        collection,
+        os.path.join(args.out_dir, args.collection),
+        dtype=args.dtype,
+        ann_threshold=args.ann_threshold,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    main()
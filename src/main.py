@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import tracemalloc
 import os
@@ -14,9 +15,11 @@ load_dotenv()
 
 from src.api.routers.api import api_router
 from src.services.application.rag import rag_service
+from src.cache.redis_client import close_async_redis
+from src.cache.semantic_cache import semantic_cache_llms
+from src.infrastructure.embeddings.embeddings import embedding_service
 from src.config.settings import APP_CONFIGS, SETTINGS
 
-
 tracemalloc.start()
 
 
@@ -35,6 +38,7 @@ logging.getLogger("uvicorn.access").addFilter(EndpointFilter())
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.rag_service = rag_service
+    await asyncio.to_thread(embedding_service.warm_up)
 
     config_restapi = RailsConfig.from_path(SETTINGS.GUARDRAILS_RESTAPI_PATH)
     app.state.rails_restapi = LLMRails(config_restapi)
@@ -44,6 +48,9 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    await semantic_cache_llms.close()
+    await close_async_redis()
+
 
 app = FastAPI(**APP_CONFIGS, lifespan=lifespan)
 
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -13,4 +15,8 @@ class UserInput(BaseModel):
     user_id: str = Field(
         description="User ID",
         default="1",
+    )
+    dataset: Optional[str] = Field(
+        description="Dataset to answer from (defaults to DATASET_NAME)",
+        default=None,
     )
\ No newline at end of file
@@ -14,3 +14,17 @@ class SearchArgs(BaseModel):
         description="Whether to return the score of the results",
         default=False,
     )
+
+
+class RetrievedChunk(BaseModel):
+    id: str = Field(description="Chunk ID in the vector store")
+    content: str = Field(description="Chunk text")
+    metadata: dict = Field(description="Chunk metadata", default_factory=dict)
+    distance: float | None = Field(
+        description="Vector distance to the query (lower is closer)",
+        default=None,
+    )
+    score: float | None = Field(
+        description="Fused rank score when hybrid search is used (higher is better)",
+        default=None,
+    )
@@ -13,7 +13,10 @@ from langfuse import get_client
 import uuid
 from nemoguardrails import LLMRails
 import json
-from src.utils.text_processing import is_guardrails_error
+from src.utils.text_processing import (
+    GUARDRAILS_BLOCKED_MESSAGE,
+    is_guardrails_error,
+)
 from logging import getLogger
 
 logger = getLogger(__name__)
@@ -40,12 +43,17 @@ class Rag:
                 "    with_score (bool): whether to include similarity scores.\n"
                 "    metadata_filter (dict): filter by metadata.\n"
             ),
-            func=self.chroma_client.retrieve_vector,
+            func=self.chroma_client.search_docs,
+            coroutine=self.chroma_client.asearch_docs,
             args_schema=SearchArgs,
+            # Chunk gốc đi kèm ToolMessage.artifact để context packer dùng lại
+            response_format="content_and_artifact",
         )
 
         # Define tools dictionary
         self.tools = {"search_docs": self.search_tool}
+        # Batched implementation khi một lượt LLM gọi search_docs nhiều lần
+        self.batch_tools = {"search_docs": self.chroma_client.asearch_docs_batch}
 
         # Bind tools to LLM
         self.llm_with_tools = self.llm.bind_tools(list(self.tools.values()))
@@ -55,11 +63,13 @@ class Rag:
             llm_with_tools=self.llm_with_tools,
             tools=self.tools,
             langfuse_handler=self.langfuse_handler,
+            batch_tools=self.batch_tools,
         )
         self.sse_generator_service = SSEGeneratorService(
             llm_with_tools=self.llm_with_tools,
             tools=self.tools,
             langfuse_handler=self.langfuse_handler,
+            batch_tools=self.batch_tools,
         )
 
         self.summarize_service = SummarizeService(
@@ -141,7 +151,7 @@ class Rag:
                 result = await guardrails.generate_async(prompt=messages)
 
                 if is_guardrails_error(result):
-                    blocked_response = "I'm sorry, but I cannot provide a response to that request. The content was blocked by our safety guidelines."
+                    blocked_response = f"{GUARDRAILS_BLOCKED_MESSAGE} The content was blocked by our safety guidelines."
                     span.update(output=blocked_response)
                     return blocked_response
 
@@ -265,7 +275,7 @@ class Rag:
                     if is_guardrails_error(chunk):
                         is_blocked = True
                         # Send a clean error message instead
-                        error_message = "I'm sorry, but I cannot provide a response to that request."
+                        error_message = GUARDRAILS_BLOCKED_MESSAGE
                         yield f"{json.dumps(error_message)}\n\n"
                         break
                     else:
@@ -0,0 +1,180 @@
+import asyncio
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings.embeddings import embedding_service, normalize_text
+from src.schemas.domain.retrieval import RetrievedChunk
+from src.utils import logger
+from src.utils.text_processing import CONTEXT_SEPARATOR, build_context
+
+
+def _shingles(text: str, n: int = 3) -> frozenset:
+    words = text.lower().split()
+    if len(words) < n:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i : i + n]) for i in range(len(words) - n + 1))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ContextPacker:
+    """
+    Đóng gói chunk từ các ToolMessage thành context cho RAG prompt.
+
+    Chunk (lấy từ ToolMessage.artifact) được sắp theo score, bỏ trùng chính
+    xác và gần trùng giữa các tool call, rồi cắt theo ngân sách token đếm
+    bằng tokenizer của embedding model. Tool call gọi với ``with_score`` giữ
+    annotation ``[score=...]`` như trong output gốc của tool.
+
+    Đếm token dùng bản sao tokenizer riêng trên một thread riêng: fast
+    tokenizer không an toàn khi hai thread gọi cùng lúc, và embedding executor
+    (vốn chỉ vài worker) vẫn dùng bản gốc để encode.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int | None = None,
+        near_dup_threshold: float | None = None,
+        tokenizer=None,
+    ):
+        self.max_tokens = (
+            SETTINGS.CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+        )
+        self.near_dup_threshold = (
+            SETTINGS.CONTEXT_NEAR_DUP_THRESHOLD
+            if near_dup_threshold is None
+            else near_dup_threshold
+        )
+        self._tokenizer = tokenizer
+        self._tokenizer_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="context-packer"
+        )
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            with self._tokenizer_lock:
+                if self._tokenizer is None:
+                    self._tokenizer = copy.deepcopy(embedding_service.tokenizer)
+        return self._tokenizer
+
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Một lần gọi tokenizer (fast tokenizer encode song song) cho cả list."""
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        token_ids = self.tokenizer.encode(text, add_special_tokens=False)
+        return self.tokenizer.decode(token_ids[:max_tokens])
+
+    @staticmethod
+    def _candidates(
+        messages: List[BaseMessage],
+    ) -> List[tuple[RetrievedChunk, str]]:
+        """(chunk, text đưa vào prompt) của mọi ToolMessage."""
+        candidates = []
+        for m in messages:
+            if not isinstance(m, ToolMessage):
+                continue
+            if isinstance(m.artifact, list):
+                # Output của tool có score (with_score=True) -> giữ annotation
+                with_score = "[score=" in str(m.content)
+                for chunk in m.artifact:
+                    if not isinstance(chunk, RetrievedChunk):
+                        continue
+                    text = chunk.content.strip()
+                    if with_score and chunk.distance is not None:
+                        text += f" [score={chunk.distance:.4f}]"
+                    candidates.append((chunk, text))
+            elif m.content:
+                # Tool không trả artifact: giữ cả output như một chunk không score
+                content = str(m.content)
+                candidates.append(
+                    (RetrievedChunk(id="", content=content), content.strip())
+                )
+        return candidates
+
+    @staticmethod
+    def _rank_key(chunk: RetrievedChunk) -> tuple:
+        # Hybrid search có fused score (cao hơn tốt hơn), dense-only có distance
+        if chunk.score is not None:
+            return (0, -chunk.score)
+        if chunk.distance is not None:
+            return (1, chunk.distance)
+        return (2, 0.0)
+
+    def pack(self, messages: List[BaseMessage]) -> List[RetrievedChunk]:
+        """Chunk được chọn; ``content`` là text đưa vào prompt (kèm annotation)."""
+        candidates = sorted(
+            self._candidates(messages), key=lambda c: self._rank_key(c[0])
+        )
+        budget = self.max_tokens
+        # Đếm token cho separator và mọi chunk trong một lần gọi tokenizer
+        separator_tokens, *token_counts = self.count_tokens_batch(
+            [CONTEXT_SEPARATOR] + [rendered for _, rendered in candidates]
+        )
+
+        selected: List[RetrievedChunk] = []
+        seen_ids: set[str] = set()
+        seen_texts: set[str] = set()
+        kept_shingles: List[frozenset] = []
+        used = duplicates = over_budget = 0
+
+        for (chunk, rendered), cost in zip(candidates, token_counts):
+            text = normalize_text(chunk.content)
+            if not text:
+                continue
+            if (chunk.id and chunk.id in seen_ids) or text in seen_texts:
+                duplicates += 1
+                continue
+            shingles = _shingles(text)
+            if any(
+                _jaccard(shingles, other) >= self.near_dup_threshold
+                for other in kept_shingles
+            ):
+                duplicates += 1
+                continue
+
+            if selected:
+                cost += separator_tokens
+            if budget > 0 and used + cost > budget:
+                if selected:
+                    over_budget += 1
+                    continue
+                # Chunk tốt nhất một mình đã vượt budget -> cắt bớt thay vì bỏ trống
+                rendered = self._truncate(rendered, budget)
+                cost = budget
+
+            selected.append(chunk.model_copy(update={"content": rendered}))
+            used += cost
+            seen_ids.add(chunk.id)
+            seen_texts.add(text)
+            kept_shingles.append(shingles)
+
+        logger.debug(
+            f"Context packed: {len(selected)}/{len(candidates)} chunks, "
+            f"{used} tokens, {duplicates} duplicates, {over_budget} over budget"
+        )
+        return selected
+
+    def build(self, messages: List[BaseMessage]) -> str:
+        if not SETTINGS.CONTEXT_PACKING_ENABLED:
+            return build_context(messages)
+        return CONTEXT_SEPARATOR.join(chunk.content for chunk in self.pack(messages))
+
+    async def abuild(self, messages: List[BaseMessage]) -> str:
+        """build() trên executor riêng: tokenize không chặn event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.build, messages)
@@ -3,12 +3,22 @@ from langchain_core.runnables import Runnable
 from langchain_core.messages import BaseMessage
 from langchain_core.language_models.base import LanguageModelInput
 from langchain_core.messages import ToolMessage
+from src.cache.versioning import cache_version
+from src.config.settings import SETTINGS
+from src.services.domain.context_packer import ContextPacker
 from src.utils import logger
+import asyncio
 import json
 import re
 from langfuse.langchain import CallbackHandler
 from langfuse import get_client
 from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable
+
+# Handler nhận list args (đã validate theo args_schema của tool),
+# trả list (content, artifact) theo thứ tự args
+BatchToolHandler = Callable[[list], Awaitable[list[tuple[str, Any]]]]
+ToolOutput = tuple[str, Any]
 
 
 class BaseGeneratorService(ABC):
@@ -19,9 +29,12 @@ class BaseGeneratorService(ABC):
         llm_with_tools: Runnable[LanguageModelInput, BaseMessage],
         tools: dict[str, StructuredTool],
         langfuse_handler: CallbackHandler,
+        batch_tools: dict[str, BatchToolHandler] | None = None,
     ):
         self.llm_with_tools = llm_with_tools
         self.tools = tools
+        # Tool có API batch: nhiều call cùng tên trong một lượt được gộp làm một
+        self.batch_tools = batch_tools or {}
         self.langfuse = get_client()
         self.prompt_userinput = self.langfuse.get_prompt(
             "userinput_service",
@@ -33,8 +46,11 @@ class BaseGeneratorService(ABC):
             label="production",
             type="text",
         )
+        # Namespace cache theo version prompt thực sự dùng để generate
+        cache_version.register_prompt(type(self).__name__, self.prompt_rag)
         self.clear_think = re.compile(r"<think>.*?</think>", flags=re.DOTALL)
         self.langfuse_handler = langfuse_handler
+        self.context_packer = ContextPacker()
 
     def _update_trace_context(
         self, session_id: str | None = None, user_id: str | None = None
@@ -65,6 +81,136 @@ class BaseGeneratorService(ABC):
     ):
         pass
 
+    async def _invoke_tool(
+        self,
+        tool_inst: StructuredTool,
+        call_args: dict,
+        semaphore: asyncio.Semaphore,
+        tool_call_id: str | None = None,
+    ) -> ToolOutput:
+        """Chạy một tool call với giới hạn concurrency và timeout."""
+        timeout = SETTINGS.TOOL_CALL_TIMEOUT
+        # Gọi dưới dạng ToolCall để nhận ToolMessage (kèm artifact nếu tool có)
+        tool_call = {
+            "type": "tool_call",
+            "name": tool_inst.name,
+            "args": call_args,
+            "id": tool_call_id or tool_inst.name,
+        }
+        async with semaphore:
+            try:
+                message = await asyncio.wait_for(tool_inst.ainvoke(tool_call), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Tool {tool_inst.name} timed out after {timeout}s")
+                # Kết quả rỗng: không để thông báo lỗi lọt vào context như một chunk
+                return "", []
+        return str(message.content), message.artifact
+
+    @staticmethod
+    def _parse_tool_call(tool_call: dict) -> tuple[str, dict, list[dict]]:
+        """Trả về (tên tool, payload, danh sách call args — kể cả nested tool_calls)."""
+        name = tool_call["function"]["name"].lower()
+        payload = json.loads(tool_call["function"]["arguments"])
+        calls = payload["tool_calls"] if "tool_calls" in payload else [payload]
+        return name, payload, calls
+
+    async def _prefetch_batched(
+        self,
+        parsed: list[tuple[str, dict, list[dict]]],
+        semaphore: asyncio.Semaphore,
+    ) -> list[list[ToolOutput] | None]:
+        """
+        Gộp các call của tool có batch API thành một lần gọi (nếu >= 2 call).
+        Mỗi lần gọi batch chiếm một slot của ``semaphore`` như một tool call.
+        """
+        prefetched: list[list[ToolOutput] | None] = [None] * len(parsed)
+
+        for name, handler in self.batch_tools.items():
+            indices = [i for i, (n, _, _) in enumerate(parsed) if n == name]
+            calls = [(i, call_args) for i in indices for call_args in parsed[i][2]]
+            if len(calls) < 2:
+                continue
+
+            tool_inst = self.tools[name]
+            with self.langfuse.start_as_current_span(
+                name=f"tool_{name}_batch", input={"n_calls": len(calls)}
+            ):
+                try:
+                    async with semaphore:
+                        outputs = await asyncio.wait_for(
+                            handler(
+                                [
+                                    tool_inst.args_schema(**call_args)
+                                    for _, call_args in calls
+                                ]
+                            ),
+                            SETTINGS.TOOL_CALL_TIMEOUT,
+                        )
+                except asyncio.TimeoutError:
+                    logger.warning(
+                        f"Batched {name} timed out after {SETTINGS.TOOL_CALL_TIMEOUT}s"
+                    )
+                    # Như timeout của từng call: kết quả rỗng. Chạy lại từng call
+                    # sẽ cho mỗi call thêm một TOOL_CALL_TIMEOUT nữa
+                    outputs = [("", [])] * len(calls)
+                except Exception as e:
+                    logger.warning(
+                        f"Batched {name} failed, falling back to per-call execution: {e}"
+                    )
+                    continue
+
+            for i in indices:
+                prefetched[i] = []
+            for (i, _), output in zip(calls, outputs):
+                prefetched[i].append(output)
+
+        return prefetched
+
+    async def _run_tool_call(
+        self,
+        tool_call: dict,
+        semaphore: asyncio.Semaphore,
+        prefetched: list[ToolOutput] | None = None,
+    ) -> list[ToolMessage]:
+        name, payload, calls = self._parse_tool_call(tool_call)
+        tool_inst = self.tools[name]
+        tool_call_id = tool_call.get("id")
+
+        async def call_tool(index: int, call_args: dict) -> ToolOutput:
+            if prefetched is not None:
+                return prefetched[index]
+            return await self._invoke_tool(
+                tool_inst, call_args, semaphore, tool_call_id
+            )
+
+        with self.langfuse.start_as_current_span(
+            name=f"tool_{name}", input=payload, metadata={"tool_name": name}
+        ) as span:
+
+            if "tool_calls" in payload:
+
+                async def traced_call(index: int, call_args: dict) -> ToolOutput:
+                    # Trace từng call args nếu có nhiều
+                    with self.langfuse.start_as_current_span(
+                        name=f"tool_{name}_call", input=call_args
+                    ) as sub_span:
+                        output = await call_tool(index, call_args)
+                        sub_span.update(output=output[0])
+                    return output
+
+                outputs = await asyncio.gather(
+                    *(traced_call(i, call_args) for i, call_args in enumerate(calls))
+                )
+            else:
+                output = await call_tool(0, payload)
+                span.update(output=output[0])
+                outputs = [output]
+
+        return [
+            ToolMessage(content=content, artifact=artifact, tool_call_id=tool_call_id)
+            for content, artifact in outputs
+        ]
+
     async def _execute_tools(
         self,
         tool_calls: list,
@@ -72,41 +218,27 @@ class BaseGeneratorService(ABC):
         session_id: str | None = None,
         user_id: str | None = None,
     ):
+        """Chạy các tool call độc lập song song, giữ nguyên thứ tự ToolMessage."""
         self._update_trace_context(session_id, user_id)
 
-        executed_tools = []
-        for tool_call in tool_calls:
-            name = tool_call["function"]["name"].lower()
+        parsed = [self._parse_tool_call(tool_call) for tool_call in tool_calls]
+        for name, _, _ in parsed:
             if name not in self.tools:
                 raise ValueError(f"Unknown tool: {name}")
 
-            tool_inst = self.tools[name]
-            payload = json.loads(tool_call["function"]["arguments"])
+        # Giới hạn số tool call chạy đồng thời trong một request
+        semaphore = asyncio.Semaphore(SETTINGS.TOOL_MAX_CONCURRENCY)
 
-            with self.langfuse.start_as_current_span(
-                name=f"tool_{name}", input=payload, metadata={"tool_name": name}
-            ) as span:
-
-                if "tool_calls" in payload:
-                    for call_args in payload["tool_calls"]:
-                        # Trace từng call args nếu có nhiều
-                        with self.langfuse.start_as_current_span(
-                            name=f"tool_{name}_call", input=call_args
-                        ) as sub_span:
-                            output = tool_inst.invoke(call_args)
-                            sub_span.update(output=output)
-
-                        messages.append(
-                            ToolMessage(
-                                content=output, tool_call_id=tool_call.get("id")
-                            )
-                        )
-                else:
-                    output = tool_inst.invoke(payload)
-                    span.update(output=output)
-                    messages.append(
-                        ToolMessage(content=output, tool_call_id=tool_call.get("id"))
-                    )
+        # Fan-out search_docs: một lần embed + một lần query cho tất cả sub-query
+        prefetched = await self._prefetch_batched(parsed, semaphore)
+        results = await asyncio.gather(
+            *(
+                self._run_tool_call(tool_call, semaphore, prefetched[i])
+                for i, tool_call in enumerate(tool_calls)
+            )
+        )
+        for tool_messages in results:
+            messages.extend(tool_messages)
 
         return messages
 
@@ -1,6 +1,6 @@
 from langchain_core.messages import SystemMessage
 from src.cache.semantic_cache import semantic_cache_llms
-from src.utils.text_processing import build_context
+from src.config.settings import SETTINGS
 from .base import BaseGeneratorService
 from langfuse import observe
 from src.utils import logger
@@ -68,7 +68,7 @@ class RestApiGeneratorService(BaseGeneratorService):
         return True, messages
 
     @observe(name="rag_generation_rest_api")
-    @semantic_cache_llms.cache(namespace="post-cache")
+    @semantic_cache_llms.cache(namespace="post-cache", mode=SETTINGS.POST_CACHE_MODE)
     async def _rag_generation(
         self,
         messages: list,
@@ -80,7 +80,7 @@ class RestApiGeneratorService(BaseGeneratorService):
         """Phase 3: RAG generation với context từ tools"""
         self._update_trace_context(session_id, user_id)
 
-        context_str = build_context(messages)
+        context_str = await self.context_packer.abuild(messages)
 
         # RAG prompt với context
         prompt = self.prompt_rag.get_langchain_prompt(
@@ -1,8 +1,8 @@
 from .base import BaseGeneratorService
 from src.utils import logger
-from src.utils.text_processing import build_context
 from langchain_core.messages import AIMessage, SystemMessage
 from src.cache.semantic_cache import semantic_cache_llms
+from src.config.settings import SETTINGS
 
 
 class SSEGeneratorService(BaseGeneratorService):
@@ -86,7 +86,7 @@ class SSEGeneratorService(BaseGeneratorService):
             )
             yield True, messages
 
-    @semantic_cache_llms.cache(namespace="post-cache")
+    @semantic_cache_llms.cache(namespace="post-cache", mode=SETTINGS.POST_CACHE_MODE)
     async def _rag_generation(
         self,
         messages: list,
@@ -98,7 +98,7 @@ class SSEGeneratorService(BaseGeneratorService):
         """Phase 3: RAG generation với streaming output"""
         self._update_trace_context(session_id, user_id)
 
-        context_str = build_context(messages)
+        context_str = await self.context_packer.abuild(messages)
         logger.info(f"Generated Context String: '{context_str}'")
         # RAG prompt với context
         prompt = self.prompt_rag.get_langchain_prompt(
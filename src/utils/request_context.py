@@ -0,0 +1,20 @@
+from contextvars import ContextVar
+
+from src.config.settings import SETTINGS
+
+# Dataset của request hiện tại; retrieval và semantic cache đọc từ đây
+current_dataset: ContextVar[str] = ContextVar(
+    "current_dataset", default=SETTINGS.DATASET_NAME
+)
+
+
+def use_dataset(dataset: str | None = None) -> str:
+    """Chọn dataset cho request hiện tại; ValueError nếu dataset không được phục vụ."""
+    dataset = dataset or SETTINGS.DATASET_NAME
+    if dataset != SETTINGS.DATASET_NAME and dataset not in SETTINGS.AVAILABLE_DATASETS:
+        raise ValueError(
+            f"Unknown dataset '{dataset}'. Available: "
+            f"{sorted({SETTINGS.DATASET_NAME, *SETTINGS.AVAILABLE_DATASETS})}"
+        )
+    current_dataset.set(dataset)
+    return dataset
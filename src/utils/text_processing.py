@@ -1,6 +1,12 @@
 from typing import List
 from langchain_core.messages import BaseMessage, ToolMessage
 
+CONTEXT_SEPARATOR = "\n\n--- Retrieved Documents ---\n\n"
+# Câu trả lời thay thế khi output bị guardrails chặn
+GUARDRAILS_BLOCKED_MESSAGE = (
+    "I'm sorry, but I cannot provide a response to that request."
+)
+
 
 def build_context(messages: List[BaseMessage]) -> str:
     tool_chunks = []
@@ -8,7 +14,7 @@ def build_context(messages: List[BaseMessage]) -> str:
         if isinstance(m, ToolMessage):
             tool_chunks.append(str(m.content))
 
-    context_str = "\n\n--- Retrieved Documents ---\n\n".join(tool_chunks)
+    context_str = CONTEXT_SEPARATOR.join(tool_chunks)
     return context_str
 
 
@@ -35,3 +41,8 @@ def is_guardrails_error(response) -> bool:
     return any(
         indicator.lower() in response_str.lower() for indicator in error_indicators
     )
+
+
+def is_blocked_response(text: str) -> bool:
+    """Câu trả lời (đã ghép đủ) bị guardrails chặn ở input hoặc output."""
+    return GUARDRAILS_BLOCKED_MESSAGE in text or is_guardrails_error(text)
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from src.infrastructure.embeddings.batching import MicroBatcher
+
+
+class RecordingEncoder:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("encoder down")
+        return [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+
+
+def test_concurrent_submits_share_one_batch():
+    encoder = RecordingEncoder()
+    batcher = MicroBatcher(encoder, max_batch_size=32, max_wait_ms=5)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.submit("a"), batcher.submit("bb"), batcher.submit("a")
+        )
+
+    vectors = asyncio.run(scenario())
+    # Text trùng trong batch chỉ encode một lần, mỗi caller nhận đúng vector
+    assert encoder.batches == [["a", "bb"]]
+    assert vectors == [[1.0, 0.0], [2.0, 1.0], [1.0, 0.0]]
+
+
+def test_full_batch_flushes_without_waiting():
+    encoder = RecordingEncoder()
+    batcher = MicroBatcher(encoder, max_batch_size=2, max_wait_ms=10_000)
+
+    async def scenario():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(t) for t in ["a", "b", "c", "d"])), 1
+        )
+
+    asyncio.run(scenario())
+    assert encoder.batches == [["a", "b"], ["c", "d"]]
+
+
+def test_encoder_error_reaches_every_caller():
+    batcher = MicroBatcher(RecordingEncoder(fail=True), max_wait_ms=1)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"), return_exceptions=True
+        )
+
+    errors = asyncio.run(scenario())
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_batcher_reused_from_a_new_event_loop():
+    encoder = RecordingEncoder()
+    batcher = MicroBatcher(encoder, max_wait_ms=1)
+
+    assert asyncio.run(batcher.submit("a")) == [1.0, 0.0]
+    assert asyncio.run(batcher.submit("bb")) == [2.0, 0.0]
+    assert encoder.batches == [["a"], ["bb"]]
+
+
+@pytest.mark.parametrize("max_batch_size", [0, 1])
+def test_batch_size_one_encodes_each_text(max_batch_size):
+    encoder = RecordingEncoder()
+    batcher = MicroBatcher(encoder, max_batch_size=max_batch_size)
+
+    async def scenario():
+        await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+
+    asyncio.run(scenario())
+    assert encoder.batches == [["a"], ["b"]]
@@ -0,0 +1,99 @@
+import json
+import os
+import unicodedata
+from collections import Counter
+
+from src.infrastructure.vector_stores.bm25 import BM25Index, BM25IndexLoader
+
+# Cùng pattern với ingest_data/plugins/jobs/bm25_index.py
+TOKEN_PATTERN = r"\w+(?:[./\-]\w+)*"
+SPLIT_PATTERN = r"[./\-]"
+
+
+def build_index(texts):
+    """Dựng index theo đúng format file ingest ghi ra."""
+    data = {
+        "token_pattern": TOKEN_PATTERN,
+        "split_pattern": SPLIT_PATTERN,
+        "k1": 1.5,
+        "b": 0.75,
+        "doc_ids": [f"doc-{i}" for i in range(len(texts))],
+        "doc_lens": [],
+        "postings": {},
+    }
+    tokenizer = BM25Index({**data, "avgdl": 1.0})
+    for doc_index, text in enumerate(texts):
+        tokens = tokenizer.tokenize(text)
+        data["doc_lens"].append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            data["postings"].setdefault(term, []).append([doc_index, tf])
+    data["avgdl"] = sum(data["doc_lens"]) / len(texts)
+    return BM25Index(data)
+
+
+def test_compound_codes_kept_whole_and_split():
+    index = build_index(["x"])
+    assert index.tokenize("Công văn 460/TB-BTNMT") == [
+        "công",
+        "văn",
+        "460/tb-btnmt",
+        "460",
+        "tb",
+        "btnmt",
+    ]
+
+
+def test_exact_code_ranks_first():
+    index = build_index(
+        [
+            "Thông báo 460/TB-BTNMT về môi trường",
+            "Thông báo 461/TB-BTNMT về đất đai",
+            "Quyết định 460 của UBND",
+        ]
+    )
+    results = index.search("460/TB-BTNMT", k=3)
+    assert results[0][0] == "doc-0"
+    assert {doc_id for doc_id, _ in results} == {"doc-0", "doc-1", "doc-2"}
+
+
+def test_nfd_query_matches_nfc_index():
+    text = "Điều kiện tuyển sinh"
+    index = build_index([unicodedata.normalize("NFC", text), "văn bản khác"])
+    query = unicodedata.normalize("NFD", "tuyển sinh")
+    assert query != unicodedata.normalize("NFC", query)
+
+    assert index.tokenize(query) == ["tuyển", "sinh"]
+    assert index.search(query, k=1)[0][0] == "doc-0"
+
+
+def test_search_edge_cases():
+    index = build_index(["alpha beta", "gamma"])
+    assert index.search("delta", k=5) == []
+    assert index.search("alpha", k=0) == []
+    assert len(index.search("alpha gamma", k=5)) == 2
+
+
+def test_loader_missing_broken_and_rebuilt_file(tmp_path):
+    path = str(tmp_path / "bm25" / "collection.json")
+    loader = BM25IndexLoader(path)
+    assert loader.get() is None
+
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{broken")
+    assert loader.get() is None
+
+    data = {
+        "token_pattern": TOKEN_PATTERN,
+        "split_pattern": SPLIT_PATTERN,
+        "k1": 1.5,
+        "b": 0.75,
+        "doc_ids": ["doc-0"],
+        "doc_lens": [1],
+        "avgdl": 1.0,
+        "postings": {"alpha": [[0, 1]]},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.utime(path, (1, 1))
+    assert loader.get().search("alpha", k=1)[0][0] == "doc-0"
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from src.cache.calibrate import (
+    _thresholds,
+    load_questions,
+    nearest_previous,
+    threshold_curve,
+)
+from src.cache.metrics import DISTANCE_BUCKETS, SemanticCacheMetrics
+
+
+def test_counters_and_hit_rate_per_base_namespace():
+    metrics = SemanticCacheMetrics()
+    metrics.record_lookup("pre-cache:ds:v1", "q", hit=False, distance=0.3)
+    metrics.record_miss_latency("pre-cache:ds:v1", 100.0)
+    metrics.record_lookup("pre-cache:ds:v2", "q", hit=True, distance=0.04)
+    metrics.record_l1_hit("pre-cache:other:v1")
+    metrics.record_lookup("post-cache:ds:v1", None, hit=True)
+
+    stats = metrics.stats()
+    pre = stats["pre-cache"]
+    assert (pre["lookups"], pre["l1_hits"], pre["l2_hits"], pre["misses"]) == (
+        3,
+        1,
+        1,
+        1,
+    )
+    assert pre["hit_rate"] == pytest.approx(2 / 3)
+    # Mỗi hit tiết kiệm EWMA latency của các lần miss
+    assert pre["latency_saved_ms"] == pytest.approx(200.0)
+    assert pre["hit_distances"][0] == 1  # 0.04 <= 0.05
+    assert pre["miss_distances"][DISTANCE_BUCKETS.index(0.3)] == 1
+    assert stats["post-cache"]["l2_hits"] == 1
+    assert "lookup_log" not in stats
+
+
+def test_miss_latency_is_an_ewma():
+    metrics = SemanticCacheMetrics(ewma_alpha=0.5)
+    for latency in (100.0, 200.0, 200.0):
+        metrics.record_miss_latency("pre-cache", latency)
+    assert metrics.stats()["pre-cache"]["miss_latency_ms"] == pytest.approx(175.0)
+
+
+def test_distance_above_all_buckets_goes_to_last():
+    metrics = SemanticCacheMetrics()
+    metrics.record_lookup("pre-cache", "q", hit=False, distance=5.0)
+    assert metrics.stats()["pre-cache"]["miss_distances"][-1] == 1
+
+
+def write_log(metrics, path):
+    async def scenario():
+        metrics.record_lookup(
+            "pre-cache:ds:v1", "học phí " * 100, hit=False, distance=0.3, threshold=0.2
+        )
+        metrics.record_lookup(
+            "post-cache:ds:v1",
+            "Nguyễn Văn A, CMND 012345678",
+            hit=True,
+            distance=0.01,
+            threshold=0.2,
+        )
+        await metrics.close()
+
+    asyncio.run(scenario())
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_lookup_log_never_contains_post_cache_context(tmp_path):
+    path = tmp_path / "lookups.jsonl"
+    pre, post = write_log(SemanticCacheMetrics(log_path=str(path), max_chars=20), path)
+
+    assert pre["question"] == ("học phí " * 100)[:20]
+    assert "question" not in post
+    assert "012345678" not in path.read_text(encoding="utf-8")
+    assert len(post["prompt_hash"]) == 16
+    assert (post["hit"], post["distance"], post["threshold"]) == (True, 0.01, 0.2)
+    # Cùng text -> cùng hash để đếm câu lặp lại mà không cần text
+    assert pre["prompt_hash"] == SemanticCacheMetrics.prompt_hash("học phí " * 100)
+
+
+def test_describe_hashes_context_keys():
+    metrics = SemanticCacheMetrics(max_chars=5)
+    assert metrics.describe("pre-cache:ds:v1", "câu hỏi dài") == "câu h"
+    assert metrics.describe("post-cache:ds:v1", "context").startswith("sha256:")
+    assert metrics.describe("post-cache:ds:v1", None) == ""
+
+
+def test_calibration_reads_only_logged_questions(tmp_path):
+    path = tmp_path / "lookups.jsonl"
+    write_log(SemanticCacheMetrics(log_path=str(path)), path)
+    records = load_questions(str(path), "pre-cache")
+    assert len(records) == 1
+    assert load_questions(str(path), "post-cache") == []
+
+
+def unit(*rows):
+    vectors = np.asarray(rows, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_nearest_previous():
+    vectors = unit([1, 0], [0.8, 0.6], [0, 1])
+    distances, matches = nearest_previous(vectors, [0, 1, 0, 2])
+    assert distances[0] == np.inf and matches[0] == -1
+    assert distances[1] == pytest.approx(0.2) and matches[1] == 0
+    # Lặp lại y hệt: distance 0, trỏ về lượt đầu tiên
+    assert distances[2] == 0.0 and matches[2] == 0
+    assert distances[3] == pytest.approx(0.4) and matches[3] == 1
+
+
+def test_threshold_sweep_counts_hits_and_false_hits():
+    distances = np.array([np.inf, 0.05, 0.15, 0.3], dtype=np.float32)
+    matches = np.array([-1, 0, 0, 1])
+    labels = ["fee", "fee", "exam", None]
+    curve = threshold_curve(distances, matches, labels, [0.1, 0.2, 0.4])
+
+    assert [row["lookups"] for row in curve] == [3, 3, 3]
+    assert [row["hits"] for row in curve] == [1, 2, 3]
+    assert [row["false_hits"] for row in curve] == [0, 1, 1]
+    # false-hit rate chỉ tính trên hit có label ở cả hai phía
+    assert [row["false_hit_rate"] for row in curve] == [0.0, 0.5, 0.5]
+    assert curve[2]["hit_rate"] == pytest.approx(1.0)
+
+
+def test_threshold_sweep_without_labels():
+    curve = threshold_curve(
+        np.array([np.inf, 0.1]), np.array([-1, 0]), [None, None], [0.05, 0.2]
+    )
+    assert [row["hits"] for row in curve] == [0, 1]
+    assert all(row["false_hit_rate"] is None for row in curve)
+
+
+def test_threshold_argument():
+    assert _thresholds("0.1:0.3:0.1") == [0.1, 0.2, 0.3]
+    assert _thresholds("0.05,0.2") == [0.05, 0.2]
@@ -0,0 +1,96 @@
+import asyncio
+import gc
+import weakref
+
+import chromadb
+import pytest
+
+from src.config.settings import SETTINGS
+from src.infrastructure.vector_stores import chroma_client as chroma_module
+from src.infrastructure.vector_stores.chroma_client import (
+    ChromaClientService,
+    DatasetNotFoundError,
+)
+from src.utils.request_context import use_dataset
+
+DATASETS = ["a", "b", "c"]
+
+
+class FakeEmbeddings:
+    """Vector 2 chiều: query "a" gần nhất với chunk "a-doc"."""
+
+    def embed_query(self, text):
+        return [1.0, 0.0] if text == "a" else [0.0, 1.0]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "CHROMA_PERSIST_DIR", str(tmp_path))
+    monkeypatch.setattr(SETTINGS, "VECTOR_SNAPSHOT_DIR", None)
+    monkeypatch.setattr(SETTINGS, "HYBRID_SEARCH_ENABLED", False)
+    monkeypatch.setattr(SETTINGS, "RETRIEVAL_CACHE_ENABLED", False)
+    monkeypatch.setattr(SETTINGS, "MAX_OPEN_COLLECTIONS", 2)
+    monkeypatch.setattr(SETTINGS, "AVAILABLE_DATASETS", [*DATASETS, "missing"])
+    monkeypatch.setattr(chroma_module, "embedding_service", FakeEmbeddings())
+
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    for dataset in DATASETS:
+        collection = client.create_collection(
+            SETTINGS.collection_name(dataset), embedding_function=None
+        )
+        collection.add(
+            ids=[f"{dataset}-doc", f"{dataset}-other"],
+            documents=[f"tài liệu {dataset}", "khác"],
+            embeddings=[[1.0, 0.0], [0.0, 1.0]],
+        )
+    return ChromaClientService()
+
+
+def test_search_routes_by_request_dataset(service):
+    async def search(dataset):
+        use_dataset(dataset)
+        return await service.asearch_docs("a", top_k=1)
+
+    async def scenario():
+        # Mỗi task có ContextVar riêng -> chạy song song không lẫn dataset
+        return await asyncio.gather(*(search(d) for d in DATASETS))
+
+    results = asyncio.run(scenario())
+    assert [chunks[0].id for _, chunks in results] == ["a-doc", "b-doc", "c-doc"]
+
+
+def test_pool_evicts_least_recently_used(service):
+    service.collection("a")
+    service.collection("b")
+    service.collection("a")
+    service.collection("c")
+    assert service.open_datasets() == ["a", "c"]
+
+
+def test_evicted_handle_is_released(service):
+    handle = weakref.ref(service.collection("a"))
+    service.collection("b")
+    service.collection("c")
+    gc.collect()
+    assert handle() is None
+
+
+def test_handles_share_one_chroma_client(service):
+    service.collection("a").chroma_collection()
+    service.collection("b").chroma_collection()
+    assert service.chroma() is service.chroma()
+
+
+def test_unknown_dataset_is_not_created(service):
+    with pytest.raises(DatasetNotFoundError):
+        asyncio.run(service.aopen("missing"))
+    assert "missing" not in service.open_datasets()
+
+    names = {c.name for c in service.chroma().list_collections()}
+    assert SETTINGS.collection_name("missing") not in names
@@ -0,0 +1,174 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from src.schemas.domain.retrieval import RetrievedChunk
+from src.services.domain import context_packer as context_packer_module
+from src.services.domain.context_packer import ContextPacker
+from src.utils.text_processing import CONTEXT_SEPARATOR
+
+
+class WordTokenizer:
+    """Mỗi từ là một token; đếm số lần gọi để kiểm tra tokenize theo batch."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=False):
+        self.calls += 1
+        return text.split()
+
+    def decode(self, token_ids):
+        return " ".join(token_ids)
+
+    def __call__(self, texts, add_special_tokens=False):
+        self.calls += 1
+        return {"input_ids": [text.split() for text in texts]}
+
+
+def chunk(chunk_id, content, score=None, distance=None):
+    return RetrievedChunk(id=chunk_id, content=content, score=score, distance=distance)
+
+
+def tool_message(*chunks):
+    return ToolMessage(content="", artifact=list(chunks), tool_call_id="call")
+
+
+def make_packer(max_tokens=100, near_dup_threshold=0.8):
+    return ContextPacker(
+        max_tokens=max_tokens,
+        near_dup_threshold=near_dup_threshold,
+        tokenizer=WordTokenizer(),
+    )
+
+
+def test_orders_by_score_and_drops_duplicates():
+    packer = make_packer()
+    messages = [
+        AIMessage(content="calling tools"),
+        tool_message(
+            chunk("a", "học phí năm 2024 là mười triệu", score=0.2),
+            chunk("b", "điều kiện tuyển sinh đại học chính quy", score=0.9),
+        ),
+        tool_message(
+            chunk("b", "điều kiện tuyển sinh đại học chính quy", score=0.9),
+            chunk("c", "Học  phí năm 2024 là mười triệu", score=0.1),
+        ),
+    ]
+    assert [c.id for c in packer.pack(messages)] == ["b", "a"]
+
+
+def test_near_duplicates_are_dropped():
+    packer = make_packer(near_dup_threshold=0.5)
+    base = "quy định về học bổng khuyến khích học tập dành cho sinh viên"
+    messages = [
+        tool_message(
+            chunk("a", base, distance=0.1),
+            chunk("b", base + " năm nay", distance=0.2),
+            chunk(
+                "c", "lịch thi cuối kỳ được công bố trên cổng thông tin", distance=0.3
+            ),
+        )
+    ]
+    assert [c.id for c in packer.pack(messages)] == ["a", "c"]
+
+
+def test_budget_skips_chunks_and_counts_separator():
+    separator_tokens = len(CONTEXT_SEPARATOR.split())
+    packer = make_packer(max_tokens=5 + separator_tokens + 3)
+    messages = [
+        tool_message(
+            chunk("a", "một hai ba bốn năm", score=3),
+            chunk("b", "sáu bảy tám chín", score=2),
+            chunk("c", "mười một mười", score=1),
+        )
+    ]
+    assert [c.id for c in packer.pack(messages)] == ["a", "c"]
+    # Separator và mọi chunk được đếm trong một lần gọi tokenizer
+    assert packer.tokenizer.calls == 1
+
+
+def test_first_chunk_over_budget_is_truncated():
+    packer = make_packer(max_tokens=3)
+    messages = [tool_message(chunk("a", "một hai ba bốn năm", score=1))]
+    packed = packer.pack(messages)
+    assert [c.content for c in packed] == ["một hai ba"]
+
+
+def test_tool_output_without_artifact_is_kept():
+    packer = make_packer()
+    messages = [ToolMessage(content="kết quả tool", tool_call_id="call")]
+    assert [c.content for c in packer.pack(messages)] == ["kết quả tool"]
+
+
+def test_abuild_runs_off_the_event_loop():
+    packer = make_packer()
+    messages = [
+        tool_message(chunk("a", "đoạn một", score=2), chunk("b", "đoạn hai", score=1))
+    ]
+
+    async def scenario():
+        return await packer.abuild(messages)
+
+    assert asyncio.run(scenario()) == f"đoạn một{CONTEXT_SEPARATOR}đoạn hai"
+
+
+def test_score_annotation_kept_for_with_score_calls():
+    packer = make_packer()
+    scored = chunk("a", "học phí", distance=0.12345)
+    plain = chunk("b", "lịch thi", distance=0.5)
+    messages = [
+        ToolMessage(
+            content="học phí [score=0.1235]", artifact=[scored], tool_call_id="1"
+        ),
+        ToolMessage(content="lịch thi", artifact=[plain], tool_call_id="2"),
+    ]
+    assert packer.build(messages) == (
+        f"học phí [score=0.1235]{CONTEXT_SEPARATOR}lịch thi"
+    )
+
+
+def test_annotation_does_not_break_duplicate_detection():
+    packer = make_packer()
+    messages = [
+        ToolMessage(
+            content="học phí [score=0.1000]",
+            artifact=[chunk("a", "học phí", distance=0.1)],
+            tool_call_id="1",
+        ),
+        tool_message(chunk("c", "Học  phí", distance=0.2)),
+    ]
+    assert [c.id for c in packer.pack(messages)] == ["a"]
+
+
+def test_abuild_uses_own_single_thread_executor():
+    packer = make_packer()
+    threads = []
+    build = packer.build
+
+    def recording_build(messages):
+        threads.append(threading.current_thread().name)
+        return build(messages)
+
+    packer.build = recording_build
+
+    async def scenario():
+        await asyncio.gather(*(packer.abuild([]) for _ in range(3)))
+
+    asyncio.run(scenario())
+    assert len(threads) == 3
+    assert all(name.startswith("context-packer") for name in threads)
+    assert packer.executor._max_workers == 1
+
+
+def test_default_tokenizer_is_a_private_copy(monkeypatch):
+    shared = WordTokenizer()
+    monkeypatch.setattr(
+        context_packer_module, "embedding_service", SimpleNamespace(tokenizer=shared)
+    )
+    packer = ContextPacker(max_tokens=10)
+    assert packer.tokenizer is packer.tokenizer
+    assert packer.tokenizer is not shared
+    assert isinstance(packer.tokenizer, WordTokenizer)
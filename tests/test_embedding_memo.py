@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings.embeddings import (
+    EmbeddingService,
+    _memo_key,
+    _request_memo,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingBackend:
+    name = "fake"
+    dimension = 2
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.asarray([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def make_service(monkeypatch):
+    monkeypatch.setattr(SETTINGS, "EMBEDDING_SERVER_SOCKET", None)
+
+    def make(max_size=16, ttl=60):
+        monkeypatch.setattr(SETTINGS, "EMBEDDING_CACHE_MAX_SIZE", max_size)
+        monkeypatch.setattr(SETTINGS, "EMBEDDING_CACHE_TTL", ttl)
+        service = EmbeddingService(backend="fake")
+        service._backend = CountingBackend()
+        return service
+
+    return make
+
+
+def test_request_memo_is_isolated_per_task(make_service):
+    service = make_service()
+    key = _memo_key("học phí")
+    seen = {}
+
+    async def request(name, put):
+        EmbeddingService.begin_request_scope()
+        if put:
+            service._memo_put(key, [1.0, 0.0])
+        await asyncio.sleep(0)  # Nhường cho task kia chạy xen vào
+        seen[name] = dict(_request_memo.get())
+
+    async def main():
+        await asyncio.gather(request("a", True), request("b", False))
+
+    asyncio.run(main())
+
+    assert seen == {"a": {key: [1.0, 0.0]}, "b": {}}
+
+
+def test_request_memo_outlives_process_eviction(make_service):
+    service = make_service()
+    key = _memo_key("học phí")
+
+    async def request(put):
+        EmbeddingService.begin_request_scope()
+        if put:
+            service._memo_put(key, [1.0, 0.0])
+            service.memo.clear()
+        return service._memo_get(key)
+
+    async def main():
+        return await request(True), await asyncio.create_task(request(False))
+
+    # Request đã thấy vector vẫn dùng được, request mới thì không
+    assert asyncio.run(main()) == ([1.0, 0.0], None)
+    assert service.cache_stats()["request_hits"] == 1
+
+
+def test_process_memo_hit_is_copied_into_request_memo(make_service):
+    service = make_service()
+    key = _memo_key("q")
+    service._memo_put(key, [2.0])  # Ngoài request: chỉ vào memo toàn process
+    assert _request_memo.get() is None
+
+    async def request():
+        EmbeddingService.begin_request_scope()
+        first = service._memo_get(key)
+        second = service._memo_get(key)
+        return first, second, dict(_request_memo.get())
+
+    assert asyncio.run(request()) == ([2.0], [2.0], {key: [2.0]})
+    stats = service.cache_stats()
+    assert (stats["hits"], stats["request_hits"]) == (1, 1)
+
+
+def test_repeated_query_is_encoded_once(make_service):
+    service = make_service()
+
+    async def request():
+        EmbeddingService.begin_request_scope()
+        return [await service.aembed_query(q) for q in ("học  phí", "học phí")]
+
+    first, second = asyncio.run(request())
+    assert first == second
+    assert service._backend.encoded == ["học phí"]
+
+
+def test_process_memo_expires_after_ttl(make_service, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    service = make_service(ttl=10)
+
+    service.embed_documents(["a"])
+    clock.now += 9
+    service.embed_documents(["a"])
+    assert service._backend.encoded == ["a"]
+
+    clock.now += 2
+    service.embed_documents(["a"])
+    assert service._backend.encoded == ["a", "a"]
+
+
+def test_process_memo_respects_max_size(make_service):
+    service = make_service(max_size=2)
+
+    service.embed_documents(["a", "b"])
+    service.embed_documents(["a"])  # "b" thành LRU
+    service.embed_documents(["c"])
+    assert service.cache_stats()["size"] == 2
+
+    service.embed_documents(["a", "c"])
+    assert service._backend.encoded == ["a", "b", "c"]
+    service.embed_documents(["b"])
+    assert service._backend.encoded == ["a", "b", "c", "b"]
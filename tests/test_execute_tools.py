@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import json
+
+import pytest
+from langchain.tools import StructuredTool
+
+from src.config.settings import SETTINGS
+from src.schemas.domain.retrieval import RetrievedChunk, SearchArgs
+from src.services.domain.generator.base import BaseGeneratorService
+
+
+class FakeSpan:
+    def update(self, **kwargs):
+        pass
+
+
+class FakeLangfuse:
+    @contextlib.contextmanager
+    def start_as_current_span(self, **kwargs):
+        yield FakeSpan()
+
+    def update_current_trace(self, **kwargs):
+        pass
+
+
+class Generator(BaseGeneratorService):
+    async def _initial_llm_call(self, *args, **kwargs):
+        pass
+
+    async def _create_message(self, *args, **kwargs):
+        pass
+
+    async def _rag_generation(self, *args, **kwargs):
+        pass
+
+
+def make_generator(tools, batch_tools=None):
+    # Bỏ qua __init__: không cần Langfuse prompt hay LLM để chạy tool
+    generator = Generator.__new__(Generator)
+    generator.tools = {tool.name: tool for tool in tools}
+    generator.batch_tools = batch_tools or {}
+    generator.langfuse = FakeLangfuse()
+    return generator
+
+
+def search_tool(delays=None, calls=None, running=None):
+    delays = delays or {}
+
+    async def search(query: str, top_k: int = 3, with_score: bool = False):
+        if calls is not None:
+            calls.append(query)
+        if running is not None:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        try:
+            await asyncio.sleep(delays.get(query, 0.001))
+        finally:
+            if running is not None:
+                running["now"] -= 1
+        return f"docs for {query}", [RetrievedChunk(id=query, content=query)]
+
+    return StructuredTool.from_function(
+        name="search_docs",
+        description="search",
+        coroutine=search,
+        args_schema=SearchArgs,
+        response_format="content_and_artifact",
+    )
+
+
+def tool_call(call_id, name, **arguments):
+    return {
+        "id": call_id,
+        "function": {"name": name, "arguments": json.dumps(arguments)},
+    }
+
+
+def run(generator, tool_calls):
+    return asyncio.run(generator._execute_tools(tool_calls, []))
+
+
+def test_results_keep_tool_call_order():
+    generator = make_generator([search_tool(delays={"slow": 0.05})])
+    messages = run(
+        generator,
+        [
+            tool_call("1", "search_docs", query="slow"),
+            tool_call("2", "search_docs", query="fast"),
+        ],
+    )
+    assert [m.content for m in messages] == ["docs for slow", "docs for fast"]
+    assert [m.tool_call_id for m in messages] == ["1", "2"]
+    assert [c.id for c in messages[0].artifact] == ["slow"]
+
+
+def test_timeout_returns_empty_result(monkeypatch):
+    monkeypatch.setattr(SETTINGS, "TOOL_CALL_TIMEOUT", 0.01)
+    generator = make_generator([search_tool(delays={"slow": 1})])
+    messages = run(
+        generator,
+        [
+            tool_call("1", "search_docs", query="slow"),
+            tool_call("2", "search_docs", query="fast"),
+        ],
+    )
+    assert (messages[0].content, messages[0].artifact) == ("", [])
+    assert messages[1].content == "docs for fast"
+
+
+def test_concurrency_is_bounded(monkeypatch):
+    monkeypatch.setattr(SETTINGS, "TOOL_MAX_CONCURRENCY", 2)
+    running = {"now": 0, "max": 0}
+    generator = make_generator([search_tool(running=running)])
+    messages = run(
+        generator,
+        [tool_call(str(i), "search_docs", query=f"q{i}") for i in range(6)],
+    )
+    assert len(messages) == 6
+    assert running["max"] == 2
+
+
+def test_unknown_tool_is_rejected():
+    generator = make_generator([search_tool()])
+    with pytest.raises(ValueError):
+        run(generator, [tool_call("1", "missing", query="q")])
+
+
+class BatchHandler:
+    def __init__(self, delay=0.0, fail=False):
+        self.batches = []
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self, requests):
+        self.batches.append([r.query for r in requests])
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("index down")
+        return [
+            (f"batched {r.query}", [RetrievedChunk(id=r.query, content=r.query)])
+            for r in requests
+        ]
+
+
+def other_tool(calls):
+    async def lookup(term: str):
+        calls.append(term)
+        return f"definition of {term}", []
+
+    return StructuredTool.from_function(
+        name="lookup",
+        description="lookup",
+        coroutine=lookup,
+        response_format="content_and_artifact",
+    )
+
+
+def mixed_calls():
+    return [
+        tool_call("1", "search_docs", query="a"),
+        tool_call("2", "lookup", term="x"),
+        tool_call(
+            "3",
+            "search_docs",
+            tool_calls=[{"query": "b"}, {"query": "c"}],
+        ),
+    ]
+
+
+def test_batched_calls_mixed_with_other_tools():
+    search_calls, lookup_calls = [], []
+    handler = BatchHandler()
+    generator = make_generator(
+        [search_tool(calls=search_calls), other_tool(lookup_calls)],
+        batch_tools={"search_docs": handler},
+    )
+    messages = run(generator, mixed_calls())
+
+    assert handler.batches == [["a", "b", "c"]]
+    assert search_calls == []
+    assert lookup_calls == ["x"]
+    assert [m.content for m in messages] == [
+        "batched a",
+        "definition of x",
+        "batched b",
+        "batched c",
+    ]
+    assert [m.tool_call_id for m in messages] == ["1", "2", "3", "3"]
+
+
+def test_batched_timeout_does_not_fall_back(monkeypatch):
+    monkeypatch.setattr(SETTINGS, "TOOL_CALL_TIMEOUT", 0.01)
+    search_calls = []
+    generator = make_generator(
+        [search_tool(calls=search_calls), other_tool([])],
+        batch_tools={"search_docs": BatchHandler(delay=1)},
+    )
+    messages = run(generator, mixed_calls())
+
+    # Timeout của batch không chạy lại từng call (sẽ thành 2x timeout)
+    assert search_calls == []
+    assert [(m.content, m.artifact) for m in messages] == [
+        ("", []),
+        ("definition of x", []),
+        ("", []),
+        ("", []),
+    ]
+
+
+def test_batched_error_falls_back_to_per_call():
+    search_calls = []
+    generator = make_generator(
+        [search_tool(calls=search_calls), other_tool([])],
+        batch_tools={"search_docs": BatchHandler(fail=True)},
+    )
+    messages = run(generator, mixed_calls())
+
+    assert sorted(search_calls) == ["a", "b", "c"]
+    assert [m.content for m in messages] == [
+        "docs for a",
+        "definition of x",
+        "docs for b",
+        "docs for c",
+    ]
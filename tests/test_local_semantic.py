@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+from src.cache.local_semantic import LocalSemanticStore
+
+
+def unit(index, dim=4):
+    vector = [0.0] * dim
+    vector[index] = 1.0
+    return vector
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_nearest_respects_threshold_and_namespace():
+    async def scenario():
+        store = LocalSemanticStore(capacity=4, distance_threshold=0.1)
+        await store.update_many([("p0", unit(0), "v1", "r0")])
+
+        hit = await store.nearest([1.0, 0.05, 0.0, 0.0], "v1")
+        assert hit.response == "r0" and hit.distance < 0.01
+        assert hit.ttl_left is not None
+        assert await store.nearest(unit(0), "v2") is None
+        # Trả về hàng gần nhất kể cả khi vượt ngưỡng, caller tự so distance
+        assert (await store.nearest(unit(1), "v1")).distance > 0.9
+
+    asyncio.run(scenario())
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+
+    async def scenario():
+        store = LocalSemanticStore(capacity=4, ttl=10)
+        await store.update_many([("p0", unit(0), "v1", "r0")])
+        await store.set_exact_many([("k", "text")], ttl=10)
+
+        clock.now += 5
+        assert (await store.nearest(unit(0), "v1")).ttl_left == 5
+        assert await store.get_exact("k") == ("text", 5)
+
+        clock.now += 6
+        assert await store.nearest(unit(0), "v1") is None
+        assert await store.get_exact("k") is None
+
+    asyncio.run(scenario())
+
+
+def test_lru_eviction_when_full(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+
+    async def scenario():
+        store = LocalSemanticStore(capacity=2, ttl=0)
+        await store.update_many([("p0", unit(0), "v1", "r0")])
+        clock.now += 1
+        await store.update_many([("p1", unit(1), "v1", "r1")])
+        clock.now += 1
+        await store.nearest(unit(0), "v1")  # p0 vừa được dùng, p1 là LRU
+
+        clock.now += 1
+        await store.update_many([("p2", unit(2), "v1", "r2")])
+
+        assert (await store.nearest(unit(0), "v1")).response == "r0"
+        assert (await store.nearest(unit(2), "v1")).response == "r2"
+        assert (await store.nearest(unit(1), "v1")).distance > 0.9
+        assert store.stats()["evictions"] == 1
+        assert store.stats()["entries"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_old_namespaces_are_evicted():
+    async def scenario():
+        store = LocalSemanticStore(capacity=2, ttl=0)
+        await store.update_many(
+            [("p0", unit(0), "v1", "r0"), ("p1", unit(1), "v1", "r1")]
+        )
+        await store.update_many([("p0", unit(0), "v2", "new0")])
+        assert store.stats()["namespaces"] == 2
+
+        await store.update_many([("p1", unit(1), "v2", "new1")])
+        # Hàng cuối của v1 bị ghi đè: namespace v1 cũng bị bỏ
+        assert store.stats()["namespaces"] == 1
+        assert await store.nearest(unit(0), "v1") is None
+        assert (await store.nearest(unit(0), "v2")).response == "new0"
+
+        await store.clear()
+        assert store.stats()["namespaces"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_persist_round_trip(tmp_path):
+    path = str(tmp_path / "cache" / "semantic")
+
+    async def scenario():
+        store = LocalSemanticStore(capacity=4, ttl=60, persist_path=path)
+        await store.update_many(
+            [("p0", unit(0), "v1", "r0"), ("p1", unit(1), "v2", "r1")]
+        )
+        await store.set_exact_many([("k", "text")], ttl=0)
+        await store.close()
+
+        restored = LocalSemanticStore(capacity=4, ttl=60, persist_path=path)
+        assert (await restored.nearest(unit(0), "v1")).response == "r0"
+        assert (await restored.nearest(unit(1), "v2")).response == "r1"
+        assert await restored.get_exact("k") == ("text", None)
+        assert restored.stats()["entries"] == 2
+        assert restored.stats()["namespaces"] == 2
+
+    asyncio.run(scenario())
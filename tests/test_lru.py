@@ -0,0 +1,79 @@
+import time
+
+from src.cache.lru import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_order_and_max_size():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" thành LRU
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    cache = TTLCache(ttl=10)
+    cache.set("default", "x")
+    cache.set("short", "y", ttl=1)
+    cache.set("forever", "z", ttl=0)
+
+    clock.now += 5
+    assert cache.get("short") is None
+    assert cache.get("default") == "x"
+
+    clock.now += 10
+    assert cache.get("default", "missing") == "missing"
+    assert cache.get("forever") == "z"
+    assert len(cache) == 1
+
+
+def test_byte_cap_evicts_lru():
+    cache = TTLCache(max_size=100, max_bytes=10)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.get("a")
+    cache.set("c", "cccc")  # 12 bytes > 10 -> evict "b"
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+    assert cache.stats()["bytes"] == 8
+
+
+def test_byte_cap_accounting_on_replace_pop_and_oversized():
+    cache = TTLCache(max_bytes=10, sizeof=lambda value: value["size"])
+    cache.set("a", {"size": 6})
+    cache.set("a", {"size": 3})
+    assert cache.stats()["bytes"] == 3
+
+    # Lớn hơn cả cache: không giữ, và bỏ luôn value cũ của key
+    cache.set("a", {"size": 11})
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+    cache.set("b", {"size": 4})
+    assert cache.pop("b") == {"size": 4}
+    assert cache.pop("b", "gone") == "gone"
+    assert cache.stats()["bytes"] == 0
+
+    cache.set("c", {"size": 5})
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
+
+
+def test_stats_without_byte_cap():
+    assert "bytes" not in TTLCache().stats()
@@ -0,0 +1,184 @@
+import asyncio
+import importlib
+import sys
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from src.cache import semantic_cache as semantic_cache_module
+from src.cache.local_semantic import LocalSemanticStore
+from src.cache.semantic_cache import SemanticCacheLLMs
+from src.config.settings import SETTINGS
+from src.schemas.domain.retrieval import RetrievedChunk
+
+GENERATOR_MODULES = [
+    "src.services.domain.generator.rest_api",
+    "src.services.domain.generator.sse",
+]
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        return [1.0, 0.0]
+
+    async def aembed_documents(self, texts):
+        self.calls += len(texts)
+        return [[1.0, 0.0] for _ in texts]
+
+
+def service(prompt_version=1):
+    return SimpleNamespace(prompt_rag=SimpleNamespace(version=prompt_version))
+
+
+def messages(*chunk_ids):
+    return [
+        AIMessage(content="calling tools"),
+        ToolMessage(
+            content="docs",
+            artifact=[RetrievedChunk(id=i, content=i) for i in chunk_ids],
+            tool_call_id="call",
+        ),
+    ]
+
+
+def exact_key(svc=None, question="Học phí?", chunk_ids=("a", "b")):
+    return SemanticCacheLLMs._get_exact_key(
+        "post-cache:v0",
+        (svc or service(),),
+        {"question": question, "messages": messages(*chunk_ids)},
+    )
+
+
+def test_exact_key_is_stable_and_normalizes_question():
+    assert exact_key() == exact_key()
+    assert exact_key(question="  học   PHÍ? ") == exact_key()
+
+
+def test_exact_key_changes_with_each_input(monkeypatch):
+    base = exact_key()
+    assert exact_key(question="Học bổng?") != base
+    assert exact_key(chunk_ids=("a", "c")) != base
+    # Thứ tự chunk đổi thì context (và câu trả lời) đổi
+    assert exact_key(chunk_ids=("b", "a")) != base
+    assert exact_key(svc=service(prompt_version=2)) != base
+
+    monkeypatch.setattr(SETTINGS, "LITELLM_MODEL", "another-model")
+    assert exact_key() != base
+
+
+def test_exact_key_hashes_tool_output_without_artifact():
+    def key(content):
+        return SemanticCacheLLMs._get_exact_key(
+            "ns",
+            (service(),),
+            {
+                "question": "q",
+                "messages": [ToolMessage(content=content, tool_call_id="call")],
+            },
+        )
+
+    assert key("kết quả") == key("kết quả")
+    assert key("kết quả") != key("kết quả khác")
+
+
+@pytest.fixture
+def make_cache(monkeypatch):
+    monkeypatch.setattr(
+        semantic_cache_module.cache_version, "current", lambda dataset=None: "test:v0"
+    )
+    monkeypatch.setattr(SETTINGS, "CACHE_SWR_ENABLED", False)
+    monkeypatch.setattr(SETTINGS, "CACHE_L1_ENABLED", False)
+    monkeypatch.setattr(SETTINGS, "CACHE_WRITE_FLUSH_MS", 0)
+
+    def make():
+        embeddings = CountingEmbeddings()
+        cache = SemanticCacheLLMs(
+            store=LocalSemanticStore(ttl=60),
+            embeddings=embeddings,
+            distance_threshold=0.1,
+        )
+        return cache, embeddings
+
+    return make
+
+
+def run_generation(cache, mode, calls):
+    class Generator:
+        prompt_rag = SimpleNamespace(version=1)
+
+        @cache.cache(namespace="post-cache", mode=mode)
+        async def _rag_generation(self, messages, question, session_id=None):
+            calls.append(session_id)
+            return f"answer {len(calls)}"
+
+    async def main():
+        generator = Generator()
+        results = []
+        for session_id, chunk_ids in (("s1", "ab"), ("s2", "ab"), ("s3", "ac")):
+            results.append(
+                await generator._rag_generation(
+                    messages=messages(*chunk_ids),
+                    question="q",
+                    session_id=session_id,
+                )
+            )
+            await cache._writer.flush()
+            await cache._exact_writer.flush()
+        return results
+
+    return asyncio.run(main())
+
+
+def test_exact_mode_hits_on_same_chunks_without_embedding(make_cache):
+    cache, embeddings = make_cache()
+    calls = []
+    results = run_generation(cache, "exact", calls)
+
+    assert results == ["answer 1", "answer 1", "answer 2"]
+    assert calls == ["s1", "s3"]
+    assert embeddings.calls == 0
+
+
+def test_semantic_mode_embeds_the_context(make_cache):
+    cache, embeddings = make_cache()
+    calls = []
+    run_generation(cache, "semantic", calls)
+    assert embeddings.calls > 0
+
+
+def test_unknown_mode_is_rejected(make_cache):
+    cache, _ = make_cache()
+    with pytest.raises(ValueError):
+        cache.cache(namespace="post-cache", mode="exakt")
+
+
+@pytest.mark.parametrize("mode", ["semantic", "exact"])
+def test_generators_use_post_cache_mode(mode):
+    decorated = []
+    original = semantic_cache_module.semantic_cache_llms.cache
+
+    def recording_cache(*, namespace, mode="semantic"):
+        decorated.append((namespace, mode))
+        return original(namespace=namespace, mode=mode)
+
+    for name in GENERATOR_MODULES:
+        importlib.import_module(name)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(SETTINGS, "POST_CACHE_MODE", mode)
+        mp.setattr(semantic_cache_module.semantic_cache_llms, "cache", recording_cache)
+        try:
+            for name in GENERATOR_MODULES:
+                importlib.reload(sys.modules[name])
+        finally:
+            mp.undo()
+            # Nạp lại với settings gốc cho các test khác
+            for name in GENERATOR_MODULES:
+                importlib.reload(sys.modules[name])
+
+    assert decorated == [("post-cache", mode), ("post-cache", mode)]
@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import ResponseError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from src.cache.local_semantic import LocalSemanticStore
+from src.cache.redis_semantic import AsyncRedisSemanticStore, escape_tag
+from src.cache.semantic_store import FallbackSemanticStore, SemanticHit
+
+
+class FakeRedis:
+    """Trả lời FT.* theo ``search_result``; ghi lại mọi lệnh đã gửi."""
+
+    def __init__(self, search_result=None, index_exists=True):
+        self.search_result = search_result
+        self.index_exists = index_exists
+        self.commands = []
+
+    async def execute_command(self, *args):
+        self.commands.append(args)
+        if args[0] == "FT.INFO" and not self.index_exists:
+            raise ResponseError("Unknown index name")
+        if args[0] == "FT.SEARCH":
+            return self.search_result
+        return "OK"
+
+
+def nearest(store, vector=(1.0, 0.0), namespace="pre-cache:ds:v1"):
+    return asyncio.run(store.nearest(list(vector), namespace))
+
+
+def test_nearest_parses_bytes_response():
+    created_at = time.time() - 10
+    redis = FakeRedis(
+        [
+            1,
+            b"semcache:abc",
+            [
+                b"response",
+                "câu trả lời".encode("utf-8"),
+                b"distance",
+                b"0.125",
+                b"created_at",
+                str(created_at).encode(),
+            ],
+        ]
+    )
+    hit = nearest(AsyncRedisSemanticStore(redis, ttl=60))
+
+    assert (hit.response, hit.distance) == ("câu trả lời", 0.125)
+    assert 49 < hit.ttl_left <= 50
+
+
+def test_nearest_parses_decoded_response_in_any_field_order():
+    redis = FakeRedis(
+        [1, "semcache:abc", ["distance", "0.5", "response", "answer"]],
+    )
+    # Không có created_at (entry cũ) hoặc ttl=0: không tính thời gian còn lại
+    assert nearest(AsyncRedisSemanticStore(redis, ttl=60)) == SemanticHit(
+        "answer", 0.5, None
+    )
+    redis.search_result = [
+        1,
+        "semcache:abc",
+        ["response", "answer", "distance", "0.5", "created_at", "1"],
+    ]
+    assert nearest(AsyncRedisSemanticStore(redis, ttl=0)).ttl_left is None
+
+
+@pytest.mark.parametrize("result", [None, [], [0], [1, b"semcache:abc"]])
+def test_nearest_without_match_returns_none(result):
+    assert nearest(AsyncRedisSemanticStore(FakeRedis(result))) is None
+
+
+def test_search_command_returns_only_needed_fields():
+    redis = FakeRedis([0])
+    nearest(AsyncRedisSemanticStore(redis, index_name="idx"), namespace="pre-cache:a")
+
+    search = next(c for c in redis.commands if c[0] == "FT.SEARCH")
+    assert search[1] == "idx"
+    assert search[2].startswith(f"(@namespace:{{{escape_tag('pre-cache:a')}}})")
+    returned = search.index("RETURN")
+    assert search[returned : returned + 5] == (
+        "RETURN",
+        3,
+        "response",
+        "distance",
+        "created_at",
+    )
+    vector = search[search.index("vec") + 1]
+    assert np.frombuffer(vector, dtype=np.float32).tolist() == [1.0, 0.0]
+
+
+def test_index_is_created_once_when_missing():
+    redis = FakeRedis([0], index_exists=False)
+    store = AsyncRedisSemanticStore(redis, index_name="idx")
+    nearest(store)
+    nearest(store)
+
+    assert [c[0] for c in redis.commands] == ["FT.INFO", "FT.CREATE"] + [
+        "FT.SEARCH"
+    ] * 2
+    create = redis.commands[1]
+    assert create[create.index("DIM") + 1] == 2
+
+
+def test_escape_tag():
+    assert escape_tag("pre-cache:ds_1") == r"pre\-cache\:ds_1"
+
+
+class FailingStore(LocalSemanticStore):
+    name = "failing"
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+        self.calls = 0
+
+    async def nearest(self, vector, namespace):
+        self.calls += 1
+        raise self.error
+
+
+def make_fallback(error):
+    fallback = LocalSemanticStore(distance_threshold=0.2)
+    asyncio.run(fallback.update("q", [1.0, 0.0], "ns", "local answer"))
+    return FallbackSemanticStore(FailingStore(error), fallback, retry_after=60)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        RedisConnectionError("connection refused"),
+        RedisTimeoutError("timeout"),
+        asyncio.TimeoutError(),
+    ],
+)
+def test_unavailable_redis_fails_over_to_local(error):
+    store = make_fallback(error)
+    assert nearest(store, namespace="ns").response == "local answer"
+    assert not store.primary_available
+
+    # Trong retry_after: không thử lại Redis
+    assert nearest(store, namespace="ns").response == "local answer"
+    assert store.primary.calls == 1
+    assert store.fallbacks == 2
+
+
+def test_response_error_is_not_hidden_by_fallback():
+    store = make_fallback(ResponseError("unknown command 'FT.SEARCH'"))
+    with pytest.raises(ResponseError):
+        nearest(store, namespace="ns")
+    assert store.primary_available
+    assert store.fallbacks == 0
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.config.settings import SETTINGS
+from src.infrastructure.embeddings import server as server_module
+from src.infrastructure.embeddings.embeddings import EmbeddingService
+from src.infrastructure.embeddings.remote import (
+    VECTOR_DTYPE,
+    RemoteBackend,
+    _recv_exactly,
+    pack_frame,
+)
+
+_LENGTH = struct.Struct("!I")
+
+
+class FakeBackend:
+    name = "fake"
+    dimension = 3
+
+    def encode(self, texts):
+        return np.asarray(
+            [[len(t), i, 0.5] for i, t in enumerate(texts)], dtype=np.float32
+        )
+
+
+class SidecarThread:
+    """EmbeddingServer thật (backend giả) chạy trên event loop riêng."""
+
+    def __init__(self, socket_path, monkeypatch):
+        monkeypatch.setattr(server_module, "get_backend", lambda *_: FakeBackend())
+        self.server = server_module.EmbeddingServer(socket_path, "fake-model", "fake")
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=asyncio.run, args=(self._main(),))
+        self.thread.start()
+        assert self.ready.wait(5)
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        handlers = set()
+
+        async def handle(reader, writer):
+            handlers.add(asyncio.current_task())
+            try:
+                await self.server._handle(reader, writer)
+            finally:
+                handlers.discard(asyncio.current_task())
+
+        unix_server = await asyncio.start_unix_server(
+            handle, path=self.server.socket_path
+        )
+        self.ready.set()
+        await self.stopped.wait()
+        # Như process sidecar chết: đóng cả các connection đang mở
+        unix_server.close()
+        for task in list(handlers):
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        await unix_server.wait_closed()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.stopped.set)
+        self.thread.join(5)
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "embedding.sock")
+
+
+def test_pack_frame_layout():
+    frame = pack_frame({"op": "info"}, b"\x01\x02")
+    (length,) = _LENGTH.unpack(frame[: _LENGTH.size])
+    header = frame[_LENGTH.size : _LENGTH.size + length]
+    assert json.loads(header) == {"op": "info"}
+    assert frame[_LENGTH.size + length :] == b"\x01\x02"
+
+
+def test_recv_exactly_reads_across_chunks():
+    left, right = socket.socketpair()
+    with left, right:
+        right.sendall(b"ab")
+        right.sendall(b"cd")
+        assert _recv_exactly(left, 4) == b"abcd"
+        right.close()
+        with pytest.raises(ConnectionError):
+            _recv_exactly(left, 1)
+
+
+def test_round_trip_with_sidecar(socket_path, monkeypatch):
+    sidecar = SidecarThread(socket_path, monkeypatch)
+    try:
+        backend = RemoteBackend(socket_path, timeout=5)
+        assert (backend.dimension, backend.model_name) == (3, "fake-model")
+        assert backend.server_backend == "fake"
+
+        vectors = backend.encode(["a", "bbb"])
+        assert vectors.dtype == np.float32
+        np.testing.assert_allclose(vectors, [[1, 0, 0.5], [3, 1, 0.5]])
+        assert backend.encode([]).shape == (0, 3)
+    finally:
+        sidecar.stop()
+
+
+def test_reconnects_once_after_sidecar_restart(socket_path, monkeypatch):
+    sidecar = SidecarThread(socket_path, monkeypatch)
+    backend = RemoteBackend(socket_path, timeout=5)
+    assert backend.encode(["a"]).shape == (1, 3)
+    sidecar.stop()
+
+    # Connection cũ đã chết: lần gọi sau kết nối lại một lần rồi thành công
+    sidecar = SidecarThread(socket_path, monkeypatch)
+    try:
+        assert backend.encode(["bb"]).tolist() == [[2.0, 0.0, 0.5]]
+    finally:
+        sidecar.stop()
+
+    with pytest.raises(OSError):
+        backend.encode(["a"])
+
+
+class StallingSidecar:
+    """Trả lời ``info`` rồi im lặng với ``encode``; đếm số frame nhận được."""
+
+    def __init__(self, socket_path):
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(socket_path)
+        self.listener.listen()
+        self.frames = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    (length,) = _LENGTH.unpack(_recv_exactly(conn, _LENGTH.size))
+                    request = json.loads(_recv_exactly(conn, length))
+                except (ConnectionError, OSError):
+                    return
+                self.frames.append(request["op"])
+                if request["op"] == "info":
+                    conn.sendall(
+                        pack_frame(
+                            {
+                                "ok": True,
+                                "dimension": 2,
+                                "model_name": "m",
+                                "backend": "fake",
+                            }
+                        )
+                    )
+
+    def close(self):
+        self.listener.close()
+
+
+def test_timeout_is_not_retried(socket_path):
+    sidecar = StallingSidecar(socket_path)
+    try:
+        backend = RemoteBackend(socket_path, timeout=0.2)
+        with pytest.raises(TimeoutError):
+            backend.encode(["a"])
+        # Không gửi lại sau timeout, và socket cũ đã bị bỏ
+        assert sidecar.frames == ["info", "encode"]
+        assert getattr(backend._local, "sock", None) is None
+    finally:
+        sidecar.close()
+
+
+def test_error_response_is_raised(socket_path):
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+
+    def serve():
+        for reply in (
+            {"ok": True, "dimension": 2, "model_name": "m", "backend": "fake"},
+            {"ok": False, "error": "boom"},
+        ):
+            conn, _ = listener.accept()
+            with conn:
+                (length,) = _LENGTH.unpack(_recv_exactly(conn, _LENGTH.size))
+                _recv_exactly(conn, length)
+                conn.sendall(pack_frame(reply))
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        backend = RemoteBackend(socket_path, timeout=2)
+        with pytest.raises(RuntimeError, match="boom"):
+            backend.encode(["a"])
+    finally:
+        thread.join(2)
+        listener.close()
+
+
+def test_vector_dtype_is_little_endian_float32():
+    assert VECTOR_DTYPE == np.dtype("<f4")
+
+
+def test_service_connects_lazily_when_sidecar_starts_late(socket_path, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "EMBEDDING_SERVER_SOCKET", socket_path)
+    # Sidecar chưa chạy: tạo service (lúc import) không được lỗi
+    service = EmbeddingService()
+    assert not service.warm_up()
+
+    sidecar = SidecarThread(socket_path, monkeypatch)
+    try:
+        assert service.warm_up()
+        assert service.embed_query("abc") == [3.0, 0.0, 0.5]
+    finally:
+        sidecar.stop()
+
+
+def test_tokenizer_is_loaded_once_under_concurrency(socket_path, monkeypatch):
+    loads = []
+
+    class SlowAutoTokenizer:
+        @staticmethod
+        def from_pretrained(model_name):
+            loads.append(model_name)
+            time.sleep(0.05)
+            return object()
+
+    monkeypatch.setitem(
+        sys.modules, "transformers", SimpleNamespace(AutoTokenizer=SlowAutoTokenizer)
+    )
+    sidecar = SidecarThread(socket_path, monkeypatch)
+    try:
+        backend = RemoteBackend(socket_path, timeout=5)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            tokenizers = list(pool.map(lambda _: backend.tokenizer, range(4)))
+    finally:
+        sidecar.stop()
+
+    assert loads == ["fake-model"]
+    assert all(t is tokenizers[0] for t in tokenizers)
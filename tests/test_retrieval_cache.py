@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from src.cache.retrieval_cache import RetrievalCache
+
+CHUNKS = [{"id": "chunk-1", "content": "học phí", "metadata": {}}]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.deleted = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, key):
+        self.deleted.append(key)
+        self.data.pop(key, None)
+
+
+def make_cache():
+    cache = RetrievalCache(max_size=8, ttl=60)
+    cache.redis = FakeRedis()
+    return cache
+
+
+def key(query="học phí", version="v1"):
+    return RetrievalCache.make_key(query, 3, False, None, version)
+
+
+def test_hit_and_miss():
+    cache = make_cache()
+
+    async def scenario():
+        assert await cache.get(key()) is None
+        await cache.set(key(), CHUNKS)
+        return await cache.get(key())
+
+    assert asyncio.run(scenario()) == CHUNKS
+    assert cache.stats()["redis_hits"] == 0
+
+
+def test_redis_hit_fills_local_cache():
+    cache = make_cache()
+    cache.redis.data[key()] = json.dumps(CHUNKS)
+
+    async def scenario():
+        first = await cache.get(key())
+        cache.redis.data.clear()
+        return first, await cache.get(key())
+
+    assert asyncio.run(scenario()) == (CHUNKS, CHUNKS)
+    assert cache.stats()["redis_hits"] == 1
+
+
+def test_key_normalizes_query_and_changes_with_version():
+    assert key(" học  phí ") == key("học phí")
+    assert key(version="v1") != key(version="v2")
+    assert RetrievalCache.make_key("q", 3, False, None, "v1") != (
+        RetrievalCache.make_key("q", 5, False, None, "v1")
+    )
+
+
+def test_new_version_misses_old_entry():
+    cache = make_cache()
+
+    async def scenario():
+        await cache.set(key(version="v1"), CHUNKS)
+        return await cache.get(key(version="v2"))
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_corrupt_redis_value_is_a_miss_and_deleted():
+    cache = make_cache()
+    cache.redis.data[key("a")] = "{not json"
+    cache.redis.data[key("b")] = json.dumps({"id": "not-a-list"})
+
+    async def scenario():
+        return await cache.get(key("a")), await cache.get(key("b"))
+
+    assert asyncio.run(scenario()) == (None, None)
+    assert cache.redis.deleted == [key("a"), key("b")]
+    assert cache.redis.data == {}
+    assert cache.stats()["redis_errors"] == 2
@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import json
+import time
+
+import numpy as np
+import pytest
+
+from src.cache import semantic_cache as semantic_cache_module
+from src.cache.local_semantic import LocalSemanticStore
+from src.cache.semantic_cache import REVALIDATION_ATTRIBUTION, SemanticCacheLLMs
+from src.config.settings import SETTINGS
+from src.utils.text_processing import GUARDRAILS_BLOCKED_MESSAGE
+
+
+class FakeEmbeddings:
+    """Cùng text -> cùng vector, text khác -> gần như trực giao."""
+
+    def _embed(self, text: str):
+        seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).normal(size=64).tolist()
+
+    async def aembed_query(self, text):
+        return self._embed(text)
+
+    async def aembed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+
+@pytest.fixture
+def make_cache(monkeypatch):
+    monkeypatch.setattr(
+        semantic_cache_module.cache_version, "current", lambda dataset=None: "test:v0"
+    )
+    monkeypatch.setattr(SETTINGS, "CACHE_SWR_ENABLED", True)
+    monkeypatch.setattr(SETTINGS, "CACHE_SOFT_TTL", 0)  # Entry stale ngay khi ghi
+    monkeypatch.setattr(SETTINGS, "CACHE_WRITE_FLUSH_MS", 0)
+
+    def make(ttl: float = 60):
+        return SemanticCacheLLMs(
+            store=LocalSemanticStore(ttl=ttl),
+            embeddings=FakeEmbeddings(),
+            distance_threshold=0.1,
+        )
+
+    return make
+
+
+async def settle(cache: SemanticCacheLLMs):
+    """Chờ revalidation và write-behind xong."""
+    while cache._revalidations:
+        await asyncio.gather(*cache._revalidations.values(), return_exceptions=True)
+    await cache._writer.flush()
+
+
+def test_stale_hit_serves_old_answer_and_revalidates_once(make_cache):
+    cache = make_cache()
+    calls = []
+
+    @cache.cache(namespace="pre-cache")
+    async def answer(question, session_id=None, user_id=None):
+        calls.append((session_id, user_id))
+        await asyncio.sleep(0.01)
+        return f"answer {len(calls)}"
+
+    async def main():
+        first = await answer(question="q", session_id="s1", user_id="u1")
+        await settle(cache)
+        # Ba hit stale đồng thời: trả entry cũ ngay, chỉ một lần làm mới
+        stale = await asyncio.gather(
+            *(answer(question="q", session_id="s2", user_id="u2") for _ in range(3))
+        )
+        await settle(cache)
+        fresh = await answer(question="q", session_id="s3", user_id="u3")
+        await settle(cache)
+        return first, stale, fresh
+
+    first, stale, fresh = asyncio.run(main())
+    assert first == "answer 1"
+    assert stale == ["answer 1"] * 3
+    # Lần hit sau lại stale (CACHE_SOFT_TTL=0) nhưng nhận bản đã làm mới
+    assert fresh == "answer 2"
+    assert calls[0] == ("s1", "u1")
+    # Revalidation không mang session/user của request kích hoạt
+    assert calls[1] == (
+        REVALIDATION_ATTRIBUTION["session_id"],
+        REVALIDATION_ATTRIBUTION["user_id"],
+    )
+    assert cache.stale_hits == 4
+    assert cache.revalidated == 2
+    assert cache.revalidate_failed == 0
+
+
+def test_revalidation_bypasses_nested_cache_layers(make_cache):
+    cache = make_cache()
+    inner_calls = []
+
+    @cache.cache(namespace="post-cache")
+    async def generate(question, session_id=None, user_id=None):
+        inner_calls.append(session_id)
+        return f"generated {len(inner_calls)}"
+
+    @cache.cache(namespace="pre-cache")
+    async def answer(question, session_id=None, user_id=None):
+        return await generate(question=question, session_id=session_id, user_id=user_id)
+
+    async def main():
+        first = await answer(question="q", session_id="s1")
+        await settle(cache)
+        stale = await answer(question="q", session_id="s2")
+        await settle(cache)
+        fresh = await answer(question="q", session_id="s3")
+        await settle(cache)
+        return first, stale, fresh
+
+    first, stale, fresh = asyncio.run(main())
+    assert (first, stale) == ("generated 1", "generated 1")
+    # Post-cache cũng stale nhưng revalidation phải generate lại, không trả nó
+    assert fresh == "generated 2"
+    # Mỗi hit stale (lần 2, lần 3) làm mới một lần, không dưới session của user
+    assert inner_calls == ["s1", None, None]
+
+
+def test_stale_sse_hit_replays_and_revalidates(make_cache):
+    cache = make_cache()
+    calls = []
+
+    @cache.cache(namespace="pre-cache")
+    async def stream(question, session_id=None, user_id=None):
+        calls.append(session_id)
+        for token in ("a", "b", str(len(calls))):
+            yield f'"{token}"\n\n'
+
+    async def collect(**kwargs):
+        return "".join([chunk async for chunk in stream(**kwargs)])
+
+    async def main():
+        first = await collect(question="q", session_id="s1")
+        await settle(cache)
+        stale = await collect(question="q", session_id="s2")
+        await settle(cache)
+        fresh = await collect(question="q", session_id="s3")
+        await settle(cache)
+        return first, stale, fresh
+
+    first, stale, fresh = asyncio.run(main())
+    assert first == '"a"\n\n"b"\n\n"1"\n\n'
+    assert "1" in stale and "2" not in stale
+    assert "2" in fresh
+    assert calls == ["s1", None, None]
+
+
+def test_hard_expiry_is_a_miss(make_cache, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "CACHE_L1_ENABLED", False)
+    cache = make_cache(ttl=0.05)
+    calls = []
+
+    @cache.cache(namespace="pre-cache")
+    async def answer(question, session_id=None, user_id=None):
+        calls.append(session_id)
+        return f"answer {len(calls)}"
+
+    async def main():
+        await answer(question="q", session_id="s1")
+        await settle(cache)
+        time.sleep(0.1)
+        result = await answer(question="q", session_id="s2")
+        await settle(cache)
+        return result
+
+    # Quá hard TTL: chạy lại đồng bộ cho chính request đó, không revalidate
+    assert asyncio.run(main()) == "answer 2"
+    assert calls == ["s1", "s2"]
+    assert cache.stale_hits == 0
+
+
+def replay(cache, cached_data):
+    async def collect():
+        return [chunk async for chunk in cache._handle_sse_cache_hit(cached_data)]
+
+    return asyncio.run(collect())
+
+
+ENTRY = {"response": "xin chao ban", "framed": True, "offsets": [4, 8, 12]}
+
+
+def test_replay_single_mode(make_cache, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "SSE_CACHE_REPLAY_MODE", "single")
+    assert replay(make_cache(), ENTRY) == ['"xin chao ban"\n\n']
+
+
+def test_replay_coalesced_mode(make_cache, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "SSE_CACHE_REPLAY_MODE", "coalesced")
+    monkeypatch.setattr(SETTINGS, "SSE_CACHE_REPLAY_FRAME_BYTES", 6)
+    # "xin " + "chao" đủ 6 byte -> một frame; phần còn lại flush cuối stream
+    assert replay(make_cache(), ENTRY) == ['"xin chao"\n\n', '" ban"\n\n']
+
+
+def test_replay_paced_mode_keeps_boundaries_and_caps_gaps(make_cache, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "SSE_CACHE_REPLAY_MODE", "paced")
+    monkeypatch.setattr(SETTINGS, "SSE_CACHE_REPLAY_MAX_GAP_MS", 20)
+    entry = {**ENTRY, "framed": False, "gaps_ms": [500, 10, 10_000]}
+
+    started = time.monotonic()
+    assert replay(make_cache(), entry) == ["xin ", "chao", " ban"]
+    # Gap đầu (trước chunk đầu) bỏ qua, gap sau bị chặn ở MAX_GAP_MS
+    assert 0.03 <= time.monotonic() - started < 0.5
+
+
+def test_replay_falls_back_when_offsets_do_not_match(make_cache, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "SSE_CACHE_REPLAY_MODE", "paced")
+    entry = {**ENTRY, "offsets": [4, 100]}
+    assert replay(make_cache(), entry) == ['"xin chao ban"\n\n']
+
+
+def stored_entries(cache, monkeypatch):
+    entries = []
+    monkeypatch.setattr(
+        cache, "_store", lambda key, namespace, text, exact: entries.append(text)
+    )
+    return entries
+
+
+def test_miss_records_offsets_and_gaps(make_cache, monkeypatch):
+    cache = make_cache()
+    entries = stored_entries(cache, monkeypatch)
+
+    @cache.cache(namespace="pre-cache")
+    async def stream(question, session_id=None, user_id=None):
+        for token in ("xin ", "chao", " ban"):
+            await asyncio.sleep(0.01)
+            yield f"{json.dumps(token)}\n\n"
+
+    async def collect():
+        return [chunk async for chunk in stream(question="q")]
+
+    asyncio.run(collect())
+    (entry,) = [json.loads(e) for e in entries]
+    assert entry["response"] == "xin chao ban"
+    assert entry["framed"] is True
+    assert entry["offsets"] == [4, 8, 12]
+    assert len(entry["gaps_ms"]) == 3 and all(g >= 5 for g in entry["gaps_ms"])
+
+
+@pytest.mark.parametrize(
+    "frames",
+    [
+        [],
+        ['""\n\n', '" "\n\n'],
+        [json.dumps(GUARDRAILS_BLOCKED_MESSAGE) + "\n\n"],
+        [json.dumps("I'm sorry, I can't respond to that.") + "\n\n"],
+    ],
+)
+def test_empty_or_blocked_stream_is_not_cached(make_cache, monkeypatch, frames):
+    cache = make_cache()
+    entries = stored_entries(cache, monkeypatch)
+
+    @cache.cache(namespace="pre-cache")
+    async def stream(question, session_id=None, user_id=None):
+        for frame in frames:
+            yield frame
+
+    async def collect():
+        return [chunk async for chunk in stream(question="q")]
+
+    assert asyncio.run(collect()) == frames
+    assert entries == []
+
+
+def test_blocked_entry_already_in_cache_is_a_miss(make_cache):
+    cache = make_cache()
+    calls = []
+
+    @cache.cache(namespace="pre-cache")
+    async def stream(question, session_id=None, user_id=None):
+        calls.append(session_id)
+        yield '"answer"\n\n'
+
+    async def main():
+        namespace = cache._scoped_namespace("pre-cache")
+        blocked = {"type": "sse_response", "response": GUARDRAILS_BLOCKED_MESSAGE}
+        cache._store("q", namespace, json.dumps(blocked), False)
+        await settle(cache)
+        return [chunk async for chunk in stream(question="q", session_id="s1")]
+
+    assert asyncio.run(main()) == ['"answer"\n\n']
+    assert calls == ["s1"]
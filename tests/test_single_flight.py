@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from src.cache.single_flight import SingleFlight
+
+
+def test_do_coalesces_concurrent_calls():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flights.do("k", compute) for _ in range(5)))
+        assert results == ["answer"] * 5
+        assert calls == [1]
+        assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+    asyncio.run(scenario())
+
+
+def test_do_leader_cancel_keeps_followers():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        leader = asyncio.create_task(flights.do("k", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "answer"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_stream_replays_buffer_to_late_joiner():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        starts = []
+
+        async def source():
+            starts.append(1)
+            yield "a"
+            yield "b"
+            await release.wait()
+            yield "c"
+
+        async def collect():
+            return [chunk async for chunk in flights.stream("k", source)]
+
+        first = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        late = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        release.set()
+
+        assert await first == ["a", "b", "c"]
+        assert await late == ["a", "b", "c"]
+        assert starts == [1]
+        assert flights.stats()["coalesced"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_stream_cancelled_when_last_subscriber_leaves():
+    async def scenario():
+        flights = SingleFlight()
+        closed = asyncio.Event()
+
+        async def source():
+            try:
+                yield "a"
+                await asyncio.sleep(10)
+                yield "b"
+            finally:
+                closed.set()
+
+        subscriber = flights.stream("k", source)
+        assert await subscriber.__anext__() == "a"
+        await subscriber.aclose()
+
+        await asyncio.wait_for(closed.wait(), 1)
+        await asyncio.sleep(0)
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_late_joiner_does_not_attach_to_cancelled_stream():
+    async def scenario():
+        flights = SingleFlight()
+        starts = []
+
+        async def source():
+            starts.append(1)
+            yield "a"
+            await asyncio.sleep(0.01)
+            yield "b"
+
+        subscriber = flights.stream("k", source)
+        assert await subscriber.__anext__() == "a"
+        # Client cuối rời đi: task bị huỷ nhưng chưa kịp dừng
+        await subscriber.aclose()
+
+        # Request mới cùng key phải chạy flight mới, không nhận CancelledError
+        assert [chunk async for chunk in flights.stream("k", source)] == ["a", "b"]
+        assert starts == [1, 1]
+        assert flights.stats()["leaders"] == 2
+
+    asyncio.run(scenario())
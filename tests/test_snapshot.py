@@ -0,0 +1,174 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.infrastructure.vector_stores.snapshot import (
+    MANIFEST,
+    VectorSnapshot,
+    export_snapshot,
+)
+
+
+class FakeCollection:
+    """Đủ API ``get`` phân trang của collection Chroma cho export_snapshot."""
+
+    def __init__(self, vectors, space="l2", name="test"):
+        self.name = name
+        self.metadata = {"hnsw:space": space}
+        self.ids = [f"chunk-{i}" for i in range(len(vectors))]
+        self.vectors = vectors
+
+    def get(self, include, limit, offset):
+        rows = range(offset, min(offset + limit, len(self.ids)))
+        return {
+            "ids": [self.ids[i] for i in rows],
+            "documents": [f"tài liệu {i}" for i in rows],
+            "metadatas": [{"row": i} for i in rows],
+            "embeddings": [self.vectors[i] for i in rows],
+        }
+
+
+def vectors(count=50, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_exact_search_matches_brute_force(tmp_path, space):
+    matrix = vectors()
+    path = export_snapshot(
+        FakeCollection(matrix, space), str(tmp_path / "snap"), page_size=7
+    )
+    snapshot = VectorSnapshot(path)
+    queries = vectors(count=3, seed=1)
+
+    results = snapshot.query(queries.tolist(), n_results=5)
+
+    for query, chunks in zip(queries, results):
+        if space == "l2":
+            expected = np.square(matrix - query).sum(axis=1)
+        elif space == "cosine":
+            expected = 1 - matrix @ query / (
+                np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+            )
+        else:
+            expected = 1 - matrix @ query
+        order = np.argsort(expected)[:5]
+        assert [c.id for c in chunks] == [f"chunk-{i}" for i in order]
+        np.testing.assert_allclose(
+            [c.distance for c in chunks], expected[order], rtol=1e-4, atol=1e-4
+        )
+    assert results[0][0].content.startswith("tài liệu")
+    assert results[0][0].metadata == {"row": int(results[0][0].id.split("-")[1])}
+
+
+def test_get_and_small_corpus(tmp_path):
+    path = export_snapshot(FakeCollection(vectors(count=3)), str(tmp_path / "snap"))
+    snapshot = VectorSnapshot(path)
+
+    assert len(snapshot.query(vectors(count=1).tolist(), n_results=10)[0]) == 3
+    found = snapshot.get(["chunk-2", "missing"])
+    assert list(found) == ["chunk-2"]
+    assert found["chunk-2"].content == "tài liệu 2"
+
+
+def test_stamp_is_content_hash(tmp_path):
+    out_dir = str(tmp_path / "snap")
+    first = export_snapshot(FakeCollection(vectors()), out_dir)
+    snapshot = VectorSnapshot(out_dir)
+
+    # Export lại cùng nội dung (cùng count): stamp và thư mục version không đổi
+    assert export_snapshot(FakeCollection(vectors()), out_dir) == first
+    assert not snapshot.is_stale()
+
+    # Cùng count nhưng nội dung khác: stamp phải khác
+    export_snapshot(FakeCollection(vectors(seed=2)), out_dir)
+    assert snapshot.is_stale()
+    assert VectorSnapshot(out_dir).stamp != snapshot.stamp
+
+
+def test_reexport_swaps_symlink_and_prunes_versions(tmp_path):
+    out_dir = str(tmp_path / "snap")
+    exported = [
+        export_snapshot(FakeCollection(vectors(seed=seed)), out_dir)
+        for seed in range(3)
+    ]
+    assert len(set(exported)) == 3
+
+    # out_dir luôn là symlink tới version mới nhất, không có lúc vắng mặt
+    assert os.path.islink(out_dir)
+    assert os.path.realpath(out_dir) == os.path.realpath(exported[-1])
+    # Giữ bản hiện tại và bản trước cho worker đang mở dở
+    assert not os.path.exists(exported[0])
+    assert os.path.exists(exported[1])
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ["snap", os.path.basename(exported[1]), os.path.basename(exported[2])]
+    )
+
+    # Snapshot đã mở ghim version của nó, không đổi theo symlink
+    pinned = VectorSnapshot(exported[1])
+    assert pinned.path == os.path.realpath(exported[1])
+
+
+def test_prune_leaves_other_collections(tmp_path):
+    other = export_snapshot(FakeCollection(vectors()), str(tmp_path / "snap.v2"))
+    out_dir = str(tmp_path / "snap")
+    for seed in range(3):
+        export_snapshot(FakeCollection(vectors(seed=seed)), out_dir)
+    assert os.path.exists(other)
+
+
+def test_legacy_directory_is_replaced_by_symlink(tmp_path):
+    out_dir = tmp_path / "snap"
+    out_dir.mkdir()
+    (out_dir / MANIFEST).write_text("{}")
+
+    export_snapshot(FakeCollection(vectors()), str(out_dir))
+    assert os.path.islink(out_dir)
+    assert len(VectorSnapshot(str(out_dir))) == 50
+
+
+def test_handle_picks_up_reexport_without_retrieval_cache(tmp_path, monkeypatch):
+    from src.config.settings import SETTINGS
+    from src.infrastructure.vector_stores.chroma_client import CollectionHandle
+
+    monkeypatch.setattr(SETTINGS, "VECTOR_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(SETTINGS, "HYBRID_SEARCH_ENABLED", False)
+    monkeypatch.setattr(SETTINGS, "RETRIEVAL_VERSION_REFRESH_SECONDS", 0)
+    name = SETTINGS.collection_name(SETTINGS.DATASET_NAME)
+    matrix = vectors()
+    export_snapshot(FakeCollection(matrix), str(tmp_path / name))
+
+    # Có snapshot: không cần client Chroma
+    handle = CollectionHandle(SETTINGS.DATASET_NAME, get_client=None)
+    assert handle.query_by_vectors([matrix[3].tolist()], 1)[0][0].id == "chunk-3"
+
+    # Export lại với thứ tự hàng khác: query sau đó đọc bản mới
+    export_snapshot(FakeCollection(matrix[::-1].copy()), str(tmp_path / name))
+    assert handle.query_by_vectors([matrix[3].tolist()], 1)[0][0].id == "chunk-46"
+
+
+def test_ann_index_for_large_corpus(tmp_path):
+    pytest.importorskip("hnswlib")
+    matrix = vectors(count=200)
+    path = export_snapshot(
+        FakeCollection(matrix), str(tmp_path / "snap"), ann_threshold=100
+    )
+    with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+        assert json.load(f)["ann"]
+
+    snapshot = VectorSnapshot(path)
+    assert snapshot.ann is not None
+    query = matrix[17] + 0.001
+    assert snapshot.query([query.tolist()], n_results=1)[0][0].id == "chunk-17"
+
+
+def test_float16_snapshot(tmp_path):
+    matrix = vectors()
+    path = export_snapshot(
+        FakeCollection(matrix), str(tmp_path / "snap"), dtype="float16"
+    )
+    snapshot = VectorSnapshot(path)
+    assert snapshot.vectors.dtype == np.float16
+    assert snapshot.query([matrix[4].tolist()], n_results=1)[0][0].id == "chunk-4"
@@ -0,0 +1,119 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from src.cache import versioning
+from src.cache.versioning import UNVERSIONED, CacheVersion, read_build_id
+from src.config.settings import SETTINGS
+from src.utils.request_context import current_dataset
+
+
+def write_build(persist_dir, dataset, build_id):
+    path = versioning.build_stamp_path(
+        str(persist_dir), SETTINGS.collection_name(dataset)
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"build_id": build_id}, f)
+    os.replace(tmp_path, path)  # Như bump_collection_version của ingest
+
+
+@pytest.fixture
+def persist_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "CHROMA_PERSIST_DIR", str(tmp_path))
+    monkeypatch.setattr(SETTINGS, "AVAILABLE_DATASETS", ["a", "b"])
+    return tmp_path
+
+
+@pytest.fixture
+def opens(monkeypatch):
+    """Đếm số lần read_build_id mở file."""
+    calls = []
+
+    def counting_open(path, *args, **kwargs):
+        calls.append(path)
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr(versioning, "open", counting_open, raising=False)
+    return calls
+
+
+def test_read_build_id_reads_file_only_when_it_changes(persist_dir, opens):
+    name = SETTINGS.collection_name("a")
+    assert read_build_id(str(persist_dir), name) is None
+
+    write_build(persist_dir, "a", "build-1")
+    assert read_build_id(str(persist_dir), name) == "build-1"
+    assert read_build_id(str(persist_dir), name) == "build-1"
+    assert len(opens) == 1
+
+    write_build(persist_dir, "a", "build-2")
+    assert read_build_id(str(persist_dir), name) == "build-2"
+    assert len(opens) == 2
+
+
+def test_read_build_id_ignores_broken_file(persist_dir):
+    write_build(persist_dir, "a", "build-1")
+    path = versioning.build_stamp_path(str(persist_dir), SETTINGS.collection_name("a"))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[1, 2")
+    assert read_build_id(str(persist_dir), SETTINGS.collection_name("a")) is None
+
+
+def test_namespace_changes_with_each_component(persist_dir, monkeypatch):
+    version = CacheVersion(refresh_seconds=0)
+    write_build(persist_dir, "a", "build-1")
+    base = version.current("a")
+    assert base.startswith("a:v")
+    assert version.current("a") == base
+
+    assert version.current("b") != base  # Dataset khác
+
+    write_build(persist_dir, "a", "build-2")
+    rebuilt = version.current("a")
+    assert rebuilt != base  # Re-ingest
+
+    version.register_prompt("Generator", SimpleNamespace(version=3))
+    reprompted = version.current("a")
+    assert reprompted != rebuilt  # Generator nạp prompt mới
+
+    monkeypatch.setattr(SETTINGS, "LITELLM_MODEL", "another-model")
+    assert version.current("a") != reprompted  # Đổi model
+
+
+def test_components_follow_request_dataset(persist_dir):
+    version = CacheVersion(refresh_seconds=0)
+    write_build(persist_dir, "b", "build-b")
+    token = current_dataset.set("b")
+    try:
+        components = version.components()
+    finally:
+        current_dataset.reset(token)
+    assert components["dataset"] == "b"
+    assert components["collection_build"] == "build-b"
+    assert components["prompt_version"] == UNVERSIONED
+    assert components["model"] == SETTINGS.LITELLM_MODEL
+
+
+def test_prompt_versions_of_all_generators_are_combined():
+    version = CacheVersion()
+    version.register_prompt("SSEGenerator", SimpleNamespace(version=2))
+    version.register_prompt("RestGenerator", SimpleNamespace(version=1))
+    assert version.prompt_version() == "1,2"
+    version.register_prompt("RestGenerator", SimpleNamespace(version=2))
+    assert version.prompt_version() == "2"
+    version.register_prompt("Other", object())
+    assert version.prompt_version() == f"2,{UNVERSIONED}"
+
+
+def test_build_is_rechecked_only_after_refresh(persist_dir, opens):
+    version = CacheVersion(refresh_seconds=3600)
+    write_build(persist_dir, "a", "build-1")
+    assert version.collection_build("a") == "build-1"
+    write_build(persist_dir, "a", "build-2")
+    # Trong cửa sổ refresh: không stat / đọc file
+    assert version.collection_build("a") == "build-1"
+    assert len(opens) == 1
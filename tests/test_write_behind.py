@@ -0,0 +1,102 @@
+import asyncio
+from contextvars import ContextVar
+
+from src.cache.write_behind import WriteBehindQueue
+
+request_state: ContextVar = ContextVar("request_state", default=None)
+
+
+def test_batches_and_flush():
+    """Item được gom batch và flush() chờ ghi hết"""
+    batches = []
+
+    async def write(batch):
+        batches.append(list(batch))
+
+    async def main():
+        queue = WriteBehindQueue(write, batch_size=3, flush_interval_ms=10)
+        for i in range(7):
+            assert queue.submit(i)
+        await queue.flush()
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(main())
+    assert [i for batch in batches for i in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in batches)
+    assert stats["written"] == 7
+    assert stats["pending"] == 0
+
+
+def test_drops_when_full():
+    """Hàng đợi đầy thì submit() trả False, không chờ"""
+    written = []
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def write(batch):
+            await gate.wait()
+            written.extend(batch)
+
+        queue = WriteBehindQueue(write, max_size=2, batch_size=1)
+        assert queue.submit(0)
+        await asyncio.sleep(0)  # Worker lấy item 0 và chờ ở write
+        assert queue.submit(1)
+        assert queue.submit(2)
+        assert not queue.submit(3)
+        gate.set()
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(main())
+    assert written == [0, 1, 2]
+    assert stats["dropped"] == 1
+    assert stats["written"] == 3
+
+
+def test_retries_then_gives_up():
+    attempts = []
+
+    async def write(batch):
+        attempts.append(batch)
+        raise ConnectionError("down")
+
+    async def main():
+        queue = WriteBehindQueue(
+            write, batch_size=1, max_retries=2, retry_backoff=0.001
+        )
+        queue.submit("a")
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(main())
+    assert len(attempts) == 3
+    assert stats["retries"] == 2
+    assert stats["failed"] == 1
+    assert stats["written"] == 0
+
+
+def test_worker_does_not_inherit_request_context():
+    """
+    Worker được tạo trong request đầu tiên nhưng sống suốt process: nó không
+    được thấy ContextVar của request đó (vd: memo embedding theo request).
+    """
+    seen = []
+
+    async def write(batch):
+        seen.append(request_state.get())
+
+    async def main():
+        queue = WriteBehindQueue(write, flush_interval_ms=0)
+
+        async def request(name):
+            request_state.set({"request": name})
+            queue.submit(name)
+
+        await asyncio.create_task(request("first"))
+        await asyncio.create_task(request("second"))
+        await queue.close()
+
+    asyncio.run(main())
+    assert seen and all(state is None for state in seen)